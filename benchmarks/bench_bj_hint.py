@@ -0,0 +1,169 @@
+"""/bj hint の期待値計算のレイテンシを計測するベンチマーク
+
+    python -m benchmarks.bench_bj_hint --games 300
+    python -m benchmarks.bench_bj_hint --games 300 --no-table
+
+乱数で配ったゲームを「17未満ならヒット」で進め、判断のたびに出る盤面について
+ヒント1回分の計算時間を p50/p95/p99/最大 で比較する。
+
+    legacy   構成タプル全体をキーにした lru_cache の旧実装（同じプロセスで計算）
+    engine   問い合わせごとのメモを使う現在の expected_values（キャッシュなし・同じプロセス）
+    service  Botと同じ OddsService 経由（事前計算の表・スレッド・ゲームをまたぐキャッシュ）
+
+legacy はヒットした後の盤面が直前のヒントの計算でキャッシュに残っているため p50 がほぼ0になるが、
+新しく配ったゲームの盤面は毎回計算し直すので裾が長い。
+service ではイベントループの最大停止時間も測る（計算中もゲートウェイが止まらないこと）。
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from functools import lru_cache
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cogs.blackjack import BlackjackGame
+from utils import blackjack_odds
+from utils.blackjack_odds import add_value
+
+
+class LegacyOdds:
+    """ベースライン実装（構成タプルをそのままキーにした、プロセス全体で共有の lru_cache）"""
+
+    def __init__(self):
+        self.dealer_outcomes = lru_cache(maxsize=131_072)(self._dealer_outcomes)
+        self.stand_ev = lru_cache(maxsize=65_536)(self._stand_ev)
+        self.best_ev = lru_cache(maxsize=65_536)(self._best_ev)
+        self.hit_ev = lru_cache(maxsize=65_536)(self._hit_ev)
+
+    @staticmethod
+    def _draws(counts):
+        remaining = sum(counts)
+        for index, count in enumerate(counts):
+            if count:
+                yield index, count / remaining, counts[:index] + (count - 1,) + counts[index + 1:]
+
+    def _dealer_outcomes(self, counts, total, soft):
+        if total > 21:
+            return (0.0, 0.0, 0.0, 0.0, 0.0, 1.0)
+        if total >= 17:
+            probs = [0.0] * 6
+            probs[total - 17] = 1.0
+            return tuple(probs)
+        if not any(counts):
+            return (0.0,) * 6
+        probs = [0.0] * 6
+        for index, p, after in self._draws(counts):
+            for k, q in enumerate(self.dealer_outcomes(after, *add_value(total, soft, index))):
+                probs[k] += p * q
+        return tuple(probs)
+
+    def _stand_ev(self, counts, player_total, dealer_total, dealer_soft):
+        probs = self.dealer_outcomes(counts, dealer_total, dealer_soft)
+        ev = probs[5]
+        for outcome, p in zip((17, 18, 19, 20, 21), probs):
+            if player_total > outcome:
+                ev += p
+            elif player_total < outcome:
+                ev -= p
+        return ev
+
+    def _best_ev(self, counts, player_total, player_soft, dealer_total, dealer_soft):
+        if player_total > 21:
+            return -1.0
+        standing = self.stand_ev(counts, player_total, dealer_total, dealer_soft)
+        if player_total == 21:
+            return standing
+        return max(standing, self.hit_ev(counts, player_total, player_soft, dealer_total, dealer_soft))
+
+    def _hit_ev(self, counts, player_total, player_soft, dealer_total, dealer_soft):
+        ev = 0.0
+        for index, p, after in self._draws(counts):
+            ev += p * self.best_ev(after, *add_value(player_total, player_soft, index), dealer_total, dealer_soft)
+        return ev
+
+    def expected_values(self, counts, player_total, player_soft, dealer_total, dealer_soft):
+        return {
+            'hit': self.hit_ev(counts, player_total, player_soft, dealer_total, dealer_soft),
+            'stand': self.stand_ev(counts, player_total, dealer_total, dealer_soft),
+        }
+
+
+def hint_states(games, rng):
+    """ゲームを進めながら、ヒントを求められうる盤面を集める"""
+    states = []
+    for _ in range(games):
+        game = BlackjackGame(10, rng)
+        game.initial_deal()
+        while not game.is_finished:
+            states.append(game.odds_state())
+            if game.player_value >= 17 or game.player_hit():
+                break
+    return states
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    pick = lambda p: ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000
+    return f"{pick(0.5):>8.2f}{pick(0.95):>9.2f}{pick(0.99):>9.2f}{ordered[-1] * 1000:>9.2f}"
+
+
+def timed(func, states):
+    samples = []
+    for state in states:
+        start = time.perf_counter()
+        func(*state)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def timed_service(states, table):
+    service = blackjack_odds.OddsService()
+    if table:
+        service.load()
+    stall = 0.0
+    running = True
+
+    async def watchdog():
+        nonlocal stall
+        while running:
+            before = time.perf_counter()
+            await asyncio.sleep(0.001)
+            stall = max(stall, time.perf_counter() - before - 0.001)
+
+    watcher = asyncio.create_task(watchdog())
+    samples = []
+    for state in states:
+        start = time.perf_counter()
+        await service.expected_values(state)
+        samples.append(time.perf_counter() - start)
+    running = False
+    await watcher
+    stats = service.stats()
+    return samples, stall * 1000, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--games', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-table', dest='table', action='store_false',
+                        help='配り終えた直後の状態の表（data/blackjack_openings.json）を使わない')
+    parser.add_argument('--skip-legacy', action='store_true')
+    args = parser.parse_args()
+
+    states = hint_states(args.games, random.Random(args.seed))
+    print(f"games={args.games} hints={len(states)}")
+    print(f"  {'':<10}{'p50 ms':>8}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    if not args.skip_legacy:
+        print(f"  {'legacy':<10}{percentiles(timed(LegacyOdds().expected_values, states))}")
+    print(f"  {'engine':<10}{percentiles(timed(blackjack_odds.expected_values, states))}")
+    samples, stall, stats = asyncio.run(timed_service(states, args.table))
+    print(f"  {'service':<10}{percentiles(samples)}   max loop stall {stall:.2f} ms, "
+          f"cache hits {stats['hits']}/{len(states)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""BlackjackGame のメモリ使用量と手札評価速度のベンチマーク
+
+    python -m benchmarks.bench_blackjack --games 10000 --hands 200000
+
+文字列でカードを持つ旧実装と、整数カード・__slots__・合計の差分更新を使う
+現在の BlackjackGame で、進行中ゲーム1つあたりのメモリと
+1秒あたりに処理できる手札評価数・ゲーム数を比較する。
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cogs.blackjack import BlackjackGame
+
+
+class LegacyBlackjackGame:
+    """ベースライン実装（絵文字文字列のカード、毎回手札を解析）"""
+
+    SUITS = ['♠️', '♥️', '♦️', '♣️']
+    RANKS = ['A', '2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K']
+
+    def __init__(self, bet):
+        self.bet = bet
+        self.deck = [f"{rank}{suit}" for suit in self.SUITS for rank in self.RANKS]
+        random.shuffle(self.deck)
+        self.player_hand = []
+        self.dealer_hand = []
+        self.is_finished = False
+        self.result = None
+
+    def calculate_hand_value(self, hand):
+        value = 0
+        aces = 0
+        for card in hand:
+            rank = card[:-2]
+            if rank in ['J', 'Q', 'K']:
+                value += 10
+            elif rank == 'A':
+                aces += 1
+                value += 11
+            else:
+                value += int(rank)
+        while value > 21 and aces > 0:
+            value -= 10
+            aces -= 1
+        return value
+
+    def initial_deal(self):
+        self.player_hand = [self.deck.pop(), self.deck.pop()]
+        self.dealer_hand = [self.deck.pop(), self.deck.pop()]
+        if self.calculate_hand_value(self.player_hand) == 21:
+            self.is_finished = True
+            self.result = 'push' if self.calculate_hand_value(self.dealer_hand) == 21 else 'blackjack'
+
+    def player_hit(self):
+        self.player_hand.append(self.deck.pop())
+        player_value = self.calculate_hand_value(self.player_hand)
+        if player_value > 21:
+            self.is_finished = True
+            self.result = 'bust'
+            return True
+        return player_value == 21
+
+    def dealer_play(self):
+        while self.calculate_hand_value(self.dealer_hand) < 17:
+            self.dealer_hand.append(self.deck.pop())
+        player_value = self.calculate_hand_value(self.player_hand)
+        dealer_value = self.calculate_hand_value(self.dealer_hand)
+        if dealer_value > 21 or player_value > dealer_value:
+            self.result = 'win'
+        elif player_value < dealer_value:
+            self.result = 'lose'
+        else:
+            self.result = 'push'
+        self.is_finished = True
+
+
+def play_legacy(game):
+    """旧 create_game_embed と同じく、表示のたびに合計を計算し直す"""
+    game.initial_deal()
+    game.calculate_hand_value(game.player_hand)
+    while not game.is_finished and game.calculate_hand_value(game.player_hand) < 17:
+        game.player_hit()
+        game.calculate_hand_value(game.player_hand)
+    if not game.is_finished:
+        game.dealer_play()
+    return game.calculate_hand_value(game.player_hand), game.calculate_hand_value(game.dealer_hand)
+
+
+def play_current(game):
+    game.initial_deal()
+    game.player_value
+    while not game.is_finished and game.player_value < 17:
+        game.player_hit()
+        game.player_value
+    if not game.is_finished:
+        game.dealer_play()
+    return game.player_value, game.dealer_value
+
+
+def memory_per_game(factory, games):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    alive = []
+    for _ in range(games):
+        game = factory(10)
+        game.initial_deal()
+        alive.append(game)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    return size / games
+
+
+def per_second(count, func):
+    start = time.perf_counter()
+    func()
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--games', type=int, default=10_000)
+    parser.add_argument('--hands', type=int, default=200_000)
+    args = parser.parse_args()
+    random.seed(0)
+
+    legacy_mem = memory_per_game(LegacyBlackjackGame, args.games)
+    current_mem = memory_per_game(BlackjackGame, args.games)
+
+    # 3枚の手札の評価
+    legacy = LegacyBlackjackGame(10)
+    legacy_hands = [random.sample(legacy.deck, 3) for _ in range(1000)]
+    current_hands = [random.sample(range(52), 3) for _ in range(1000)]
+    rounds = args.hands // 1000
+
+    def eval_legacy():
+        for _ in range(rounds):
+            for hand in legacy_hands:
+                legacy.calculate_hand_value(hand)
+
+    def eval_current():
+        add = BlackjackGame.add_card_value
+        for _ in range(rounds):
+            for a, b, c in current_hands:
+                value, soft = add(0, 0, a)
+                value, soft = add(value, soft, b)
+                add(value, soft, c)
+
+    def games_legacy():
+        for _ in range(args.games):
+            play_legacy(LegacyBlackjackGame(10))
+
+    def games_current():
+        for _ in range(args.games):
+            play_current(BlackjackGame(10))
+
+    print(f"games={args.games:,} hands={rounds * 1000:,}")
+    print(f"  {'':<28}{'legacy':>14}{'current':>14}")
+    print(f"  {'memory per active game (B)':<28}{legacy_mem:>14,.0f}{current_mem:>14,.0f}")
+    print(f"  {'hands evaluated / s':<28}{per_second(rounds * 1000, eval_legacy):>14,.0f}"
+          f"{per_second(rounds * 1000, eval_current):>14,.0f}")
+    print(f"  {'full games / s':<28}{per_second(args.games, games_legacy):>14,.0f}"
+          f"{per_second(args.games, games_current):>14,.0f}")
+
+
+if __name__ == '__main__':
+    main()
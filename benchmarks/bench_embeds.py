@@ -0,0 +1,45 @@
+"""静的な埋め込みの組み立てコストのマイクロベンチマーク
+
+    python -m benchmarks.bench_embeds --calls 20000
+
+/slot help・/bj rules の埋め込みを毎回フィールドから組み立てる場合と、EmbedCache で
+1回だけ組み立てて使い回す場合の1回あたりの時間を比較する。
+送信時に discord.py が行う to_dict() も含めて計測する。
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cogs.blackjack import BlackjackGroup
+from cogs.slot import SlotGroup
+from utils.embed_cache import EmbedCache
+
+
+def timed(label, calls, func):
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<30}{elapsed / calls * 1e6:10.2f} us/call")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=20000)
+    args = parser.parse_args()
+
+    slot = SlotGroup(None, None, None, None, None, None)
+    bj = BlackjackGroup(None, None, None, None, None, None)
+    cache = EmbedCache()
+
+    print(f"calls={args.calls:,}")
+    for name, build in (('/slot help', slot._build_help), ('/bj rules', bj._build_rules)):
+        timed(f"{name} build", args.calls, lambda: build().to_dict())
+        timed(f"{name} cached", args.calls, lambda: cache.get(name, build).to_dict())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""/slot play のDB処理スループットを計測するベンチマーク
+
+    python -m benchmarks.bench_slot_db --spins 2000 --users 50
+    python -m benchmarks.bench_slot_db --storage memory
+
+旧実装（呼び出しごとに sqlite3.connect）と、共有 Database サービス経由の
+現在の実装で、1秒あたりのスピン数とイベントループの最大停止時間を比較する。
+本番の slot_bot.db には触れず、一時ディレクトリにDBを作成する。
+--storage memory では現在の実装をインメモリのストレージで動かし、
+ディスクI/Oを除いたゲーム処理だけのスループットを測る。
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cogs.slot import SlotGroup
+from utils.database import open_database
+from utils.leaderboard import Leaderboards
+from utils.ledger import CoinLedger
+from utils.economy import Economy
+from utils.migrations import MIGRATIONS, migrate
+from utils.stats_rollup import StatsRollup
+from utils.write_queue import WriteQueue
+
+
+class LegacySlot:
+    """ベースライン実装のDBアクセス（呼び出しごとに接続・コミット）"""
+
+    def __init__(self, path):
+        self.path = path
+        # ベースラインのスキーマ（ギルドごとの経済圏 v7 より前）のDBを別に作る
+        conn = sqlite3.connect(path)
+        for step in MIGRATIONS[:6]:
+            step(conn)
+        conn.commit()
+        conn.close()
+
+    def get_user(self, user_id):
+        conn = sqlite3.connect(self.path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT user_id, coins, total_wins, total_losses, biggest_win, bankruptcy_count
+            FROM users WHERE user_id = ?
+        ''', (str(user_id),))
+        user = cursor.fetchone()
+        if not user:
+            cursor.execute('INSERT INTO users (user_id, coins) VALUES (?, 1000)', (str(user_id),))
+            conn.commit()
+            cursor.execute('''
+                SELECT user_id, coins, total_wins, total_losses, biggest_win, bankruptcy_count
+                FROM users WHERE user_id = ?
+            ''', (str(user_id),))
+            user = cursor.fetchone()
+        conn.close()
+        return {'coins': user[1]}
+
+    def add_to_jackpot(self, amount):
+        conn = sqlite3.connect(self.path)
+        conn.execute('UPDATE jackpot SET amount = amount + ? WHERE id = 1', (amount,))
+        conn.commit()
+        conn.close()
+
+    def win_jackpot(self, username):
+        conn = sqlite3.connect(self.path)
+        cursor = conn.cursor()
+        cursor.execute('SELECT amount FROM jackpot WHERE id = 1')
+        amount = cursor.fetchone()[0]
+        cursor.execute('''
+            UPDATE jackpot SET amount = 10000, last_winner = ?, last_win_amount = ?,
+                last_win_date = CURRENT_TIMESTAMP WHERE id = 1
+        ''', (username, amount))
+        conn.commit()
+        conn.close()
+        return amount
+
+    def update_user(self, user_id, coins, is_win, win_amount):
+        conn = sqlite3.connect(self.path)
+        conn.execute('''
+            UPDATE users SET coins = ?, total_wins = total_wins + ?, total_losses = total_losses + ?,
+                biggest_win = MAX(biggest_win, ?), last_played = CURRENT_TIMESTAMP
+            WHERE user_id = ?
+        ''', (coins, 1 if is_win else 0, 0 if is_win else 1, win_amount, str(user_id)))
+        conn.commit()
+        conn.close()
+
+    def get_jackpot(self):
+        conn = sqlite3.connect(self.path)
+        amount = conn.execute('SELECT amount FROM jackpot WHERE id = 1').fetchone()[0]
+        conn.close()
+        return amount
+
+    async def play(self, group, user_id, bet):
+        user = self.get_user(user_id)
+        if user['coins'] < bet:
+            return
+        result = group.spin_slot()
+        win = group.calculate_win(result, bet)
+        if win == 0:
+            self.add_to_jackpot(int(bet * group.JACKPOT_CONTRIBUTION))
+        if win == 'JACKPOT':
+            win = self.win_jackpot(str(user_id))
+        self.update_user(user_id, user['coins'] - bet + win, win > 0, win)
+        self.get_jackpot()
+
+
+async def play_current(group, user_id, bet):
+    """SlotGroup.slot と同じく書き込みキュー経由で精算する"""
+    result = group.spin_slot()
+    await group.write_queue.submit(group._play_spin, Economy.GLOBAL, user_id, str(user_id), bet, result)
+
+
+async def measure(play, spins, users, bet):
+    """全ユーザー並行でスピンし、(spins/sec, ループ最大停止ms) を返す"""
+    stall = 0.0
+    running = True
+
+    async def watchdog():
+        nonlocal stall
+        while running:
+            before = time.perf_counter()
+            await asyncio.sleep(0.001)
+            stall = max(stall, time.perf_counter() - before - 0.001)
+
+    async def player(user_id, count):
+        for _ in range(count):
+            await play(user_id, bet)
+
+    watcher = asyncio.create_task(watchdog())
+    per_user = spins // users
+    start = time.perf_counter()
+    await asyncio.gather(*(player(uid, per_user) for uid in range(users)))
+    elapsed = time.perf_counter() - start
+    running = False
+    await watcher
+    return per_user * users / elapsed, stall * 1000
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--spins', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--bet', type=int, default=1)
+    parser.add_argument('--storage', choices=('sqlite', 'memory'), default='sqlite',
+                        help='現在の実装で使うストレージ（旧実装は常にSQLiteのファイル）')
+    args = parser.parse_args()
+    random.seed(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.storage == 'memory':
+            db = open_database('memory://')
+        else:
+            db = open_database(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        await db.connect()
+        await db.transaction(migrate)
+        queue = WriteQueue(db)
+        queue.start()
+        leaderboards = Leaderboards(db.storage)
+        ledger = CoinLedger(queue, leaderboards)
+        group = SlotGroup(db, queue, leaderboards, ledger, StatsRollup(), Economy(queue, ledger, leaderboards))
+        await group.init_database()
+
+        legacy = LegacySlot(os.path.join(tmp, 'legacy.db'))
+        before, before_stall = await measure(
+            lambda uid, bet: legacy.play(group, uid, bet), args.spins, args.users, args.bet
+        )
+        after, after_stall = await measure(
+            lambda uid, bet: play_current(group, uid, bet), args.spins, args.users, args.bet
+        )
+        await queue.close()
+        await db.close()
+
+    print(f"spins={args.spins} users={args.users} storage={args.storage}")
+    print(f"  before (connect per call): {before:10.1f} spins/s  max loop stall {before_stall:7.2f} ms")
+    print(f"  after  (current pipeline): {after:10.1f} spins/s  max loop stall {after_stall:7.2f} ms")
+    stats = queue.stats()
+    print(f"  write queue: {stats['batches']} commits, avg batch {stats['avg_batch']:.1f}, "
+          f"avg flush {stats['avg_flush_ms']:.2f} ms, max depth {stats['max_depth']}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
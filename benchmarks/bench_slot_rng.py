@@ -0,0 +1,75 @@
+"""スロットの抽選エンジンのマイクロベンチマーク
+
+    python -m benchmarks.bench_slot_rng --spins 1000000
+
+random.choices を1リールごとに呼ぶ旧実装と、エイリアス表を使う SlotEngine
+（1スピンずつ / spin_many でまとめて）の1秒あたりのスピン数を比較し、
+各シンボルの出現率が重みと一致しているかも表示する。
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cogs.slot import SlotGroup
+from utils.slot_engine import SlotEngine
+
+
+def legacy_spin():
+    """ベースライン実装の weighted_random × 3 と calculate_win"""
+    choose = lambda: random.choices(SlotGroup.SYMBOLS, weights=SlotGroup.SYMBOL_WEIGHTS, k=1)[0]
+    result = [choose(), choose(), choose()]
+    return SlotGroup.payout_multiplier(result)
+
+
+def timed(label, spins, func):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<28}{spins / elapsed:14,.0f} spins/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--spins', type=int, default=1_000_000)
+    parser.add_argument('--batch', type=int, default=10_000)
+    args = parser.parse_args()
+
+    engine = SlotEngine(SlotGroup.SYMBOLS, SlotGroup.SYMBOL_WEIGHTS, SlotGroup.payout_multiplier,
+                        rng=random.Random(0))
+    spins = args.spins
+
+    def run_legacy():
+        for _ in range(spins):
+            legacy_spin()
+
+    def run_engine():
+        spin, payout = engine.spin, engine.payout
+        for _ in range(spins):
+            payout(spin())
+
+    def run_batched():
+        payout = engine.payout
+        for _ in range(spins // args.batch):
+            for result in engine.spin_many(args.batch):
+                payout(result)
+
+    print(f"spins={spins:,}")
+    timed("random.choices per reel", spins, run_legacy)
+    timed("SlotEngine.spin", spins, run_engine)
+    timed(f"SlotEngine.spin_many({args.batch})", spins, run_batched)
+
+    counts = Counter(s for result in engine.spin_many(spins // 10) for s in result)
+    total = sum(counts.values())
+    weight_total = sum(SlotGroup.SYMBOL_WEIGHTS)
+    print("symbol frequency (observed / expected):")
+    for symbol, weight in zip(SlotGroup.SYMBOLS, SlotGroup.SYMBOL_WEIGHTS):
+        print(f"  {symbol}  {counts[symbol] / total:.4f} / {weight / weight_total:.4f}")
+
+
+if __name__ == '__main__':
+    main()
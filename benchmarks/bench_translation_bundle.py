@@ -0,0 +1,80 @@
+"""翻訳カタログの起動時の読み込みのベンチマーク
+
+    python -m benchmarks.bench_translation_bundle --languages 20 --keys 2000 --guilds 10000
+
+一時ディレクトリに大きな言語ファイルとギルド設定を作り、起動時の読み込みにかかる時間を
+YAMLを毎回パースする場合と、パース済みのバンドル（YamlBundle）を使う場合で比較する。
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.guild_settings import GuildSettings
+from utils.translations import TranslationCatalog
+
+
+def make_catalogs(folder, languages, keys):
+    """lang/*.yml と同じ形（セクション → キー → 文字列）の言語ファイルを作る"""
+    os.makedirs(folder)
+    for n in range(languages):
+        data = {
+            f"section{s}": {f"key{k}": f"テキスト {n}-{s}-{k} with some words" for k in range(50)}
+            for s in range(keys // 50)
+        }
+        with open(os.path.join(folder, f"l{n:02d}.yml"), 'w', encoding='utf-8') as f:
+            yaml.dump(data, f, allow_unicode=True)
+    with open(os.path.join(folder, 'en.yml'), 'w', encoding='utf-8') as f:
+        yaml.dump({'ping': {'title': 'Pong!'}}, f)
+
+
+def make_guild_settings(path, guilds):
+    with open(path, 'w', encoding='utf-8') as f:
+        yaml.dump({str(10 ** 17 + n): 'ja' if n % 3 else 'en' for n in range(guilds)}, f)
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<36}{elapsed * 1000:10.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--languages', type=int, default=20)
+    parser.add_argument('--keys', type=int, default=2000, help='1言語あたりのキー数')
+    parser.add_argument('--guilds', type=int, default=10000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        lang = os.path.join(tmp, 'lang')
+        settings = os.path.join(tmp, 'lang_guild_settings.yml')
+        bundle = os.path.join(tmp, 'cache', 'lang.json')
+        settings_bundle = os.path.join(tmp, 'cache', 'guild_settings.json')
+        make_catalogs(lang, args.languages, args.keys)
+        make_guild_settings(settings, args.guilds)
+
+        print(f"languages={args.languages} keys={args.keys:,} guilds={args.guilds:,}")
+        print("translations:")
+        timed("yaml", lambda: TranslationCatalog(lang).load())
+        timed("bundle (cold: compile + write)", lambda: TranslationCatalog(lang, bundle_path=bundle).load())
+        timed("bundle (warm)", lambda: TranslationCatalog(lang, bundle_path=bundle).load())
+        # デプロイで更新時刻だけが変わった場合（内容のハッシュで判定）
+        for name in os.listdir(lang):
+            os.utime(os.path.join(lang, name))
+        timed("bundle (mtime changed, same hash)", lambda: TranslationCatalog(lang, bundle_path=bundle).load())
+
+        print("guild settings:")
+        timed("yaml", lambda: GuildSettings(settings).load())
+        timed("bundle (cold: compile + write)", lambda: GuildSettings(settings, bundle_path=settings_bundle).load())
+        timed("bundle (warm)", lambda: GuildSettings(settings, bundle_path=settings_bundle).load())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""翻訳の参照コストのマイクロベンチマーク
+
+    python -m benchmarks.bench_translations --calls 2000
+
+/info server・/ping が1回ごとに言語ファイルをYAMLとして読み込んでいた旧実装と、
+起動時に1回だけ読み込む TranslationCatalog の、コマンド1回分の翻訳の参照にかかる時間を比較する。
+"""
+import argparse
+import os
+import sys
+import time
+
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.translations import TranslationCatalog
+
+LANG_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lang')
+# /info server の埋め込みで参照するキー
+INFO_KEYS = ('server_title', 'server_description', 'guild_name', 'guild_id',
+             'member_count', 'owner', 'created_at', 'channel_count')
+
+
+def legacy_info(lang):
+    """ベースライン実装の get_translation（言語ファイルを毎回読み込む）"""
+    path = os.path.join(LANG_FOLDER, f"{lang}.yml")
+    if not os.path.exists(path):
+        path = os.path.join(LANG_FOLDER, "en.yml")
+    with open(path, "r", encoding="utf-8") as f:
+        translation = yaml.safe_load(f)
+    return [translation["info"][key] for key in INFO_KEYS]
+
+
+def catalog_info(catalog, lang, locale):
+    translation = catalog.translation(lang, locale)
+    return [translation[f"info.{key}"] for key in INFO_KEYS]
+
+
+def timed(label, calls, func):
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<34}{elapsed / calls * 1e6:12.2f} us/call")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=2000)
+    args = parser.parse_args()
+
+    catalog = TranslationCatalog(LANG_FOLDER)
+    start = time.perf_counter()
+    catalog.load()
+    print(f"catalog load: {(time.perf_counter() - start) * 1000:.2f} ms ({', '.join(catalog.languages)})")
+    assert legacy_info('ja') == catalog_info(catalog, 'ja', None)
+
+    print(f"calls={args.calls:,}")
+    timed("yaml per call (/info)", args.calls, lambda: legacy_info('ja'))
+    timed("catalog (guild)", args.calls, lambda: catalog_info(catalog, 'ja', 'en-US'))
+    timed("catalog (locale fallback)", args.calls, lambda: catalog_info(catalog, None, 'ja'))
+    timed("catalog (en fallback)", args.calls, lambda: catalog_info(catalog, 'fr', 'de'))
+    timed("reload_if_changed (no change)", args.calls, catalog.reload_if_changed)
+
+
+if __name__ == '__main__':
+    main()
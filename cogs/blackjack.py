@@ -1,79 +1,109 @@
 import discord
 from discord import app_commands
-from discord.ext import commands
-import sqlite3
+from discord.ext import commands, tasks
+import asyncio
 import random
+import time
+from array import array
+from collections import OrderedDict
+from itertools import product
 from datetime import datetime
 import logging
+from utils import blackjack_odds
+from utils.embed_cache import EmbedCache
 
 class BlackjackGame:
-    """ブラックジャックのゲーム状態を管理するクラス"""
+    """ブラックジャックのゲーム状態を管理するクラス
+
+    カードは 0〜51 の整数（suit * 13 + rank）で持ち、山札は array で管理する。
+    手札の合計とソフトA（11として数えているA）の枚数は配るたびに更新するので、
+    合計の取得で手札を走査し直すことはない。文字列にするのは表示する時だけ。
+    """
     
     SUITS = ['♠️', '♥️', '♦️', '♣️']
     RANKS = ['A', '2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K']
+    VALUES = (11, 2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10)  # ランク番号ごとの点数（Aは11）
+    CARD_LABELS = tuple(f"{rank}{suit}" for suit, rank in product(SUITS, RANKS))
+    
+    __slots__ = (
+        'bet', 'deck', 'player_hand', 'dealer_hand', 'is_finished', 'result',
+        'player_value', 'player_soft_aces', 'dealer_value', 'dealer_soft_aces',
+    )
     
-    def __init__(self, bet):
+    def __init__(self, bet, rng=random):
         self.bet = bet
-        self.deck = self.create_deck()
+        self.deck = self.create_deck(rng)
         self.player_hand = []
         self.dealer_hand = []
         self.is_finished = False
         self.result = None
+        self.player_value = 0
+        self.player_soft_aces = 0
+        self.dealer_value = 0
+        self.dealer_soft_aces = 0
         
-    def create_deck(self):
+    def create_deck(self, rng=random):
         """デッキを作成してシャッフル"""
-        deck = []
-        for suit in self.SUITS:
-            for rank in self.RANKS:
-                deck.append(f"{rank}{suit}")
-        random.shuffle(deck)
+        deck = array('B', range(52))
+        rng.shuffle(deck)
         return deck
     
     def deal_card(self):
         """カードを1枚引く"""
         return self.deck.pop()
     
+    @classmethod
+    def add_card_value(cls, value, soft_aces, card):
+        """合計とソフトAの枚数にカード1枚を加える（21を超えたらAを1として扱う）"""
+        card_value = cls.VALUES[card % 13]
+        value += card_value
+        if card_value == 11:
+            soft_aces += 1
+        while value > 21 and soft_aces > 0:
+            value -= 10
+            soft_aces -= 1
+        return value, soft_aces
+    
+    def deal_to_player(self):
+        card = self.deck.pop()
+        self.player_hand.append(card)
+        self.player_value, self.player_soft_aces = self.add_card_value(
+            self.player_value, self.player_soft_aces, card
+        )
+    
+    def deal_to_dealer(self):
+        card = self.deck.pop()
+        self.dealer_hand.append(card)
+        self.dealer_value, self.dealer_soft_aces = self.add_card_value(
+            self.dealer_value, self.dealer_soft_aces, card
+        )
+    
     def calculate_hand_value(self, hand):
         """手札の合計値を計算（Aの処理含む）"""
-        value = 0
-        aces = 0
-        
+        value = soft_aces = 0
         for card in hand:
-            # 絵文字は2文字分なので、最後の2文字を削除してランクを取得
-            rank = card[:-2]
-            
-            if rank in ['J', 'Q', 'K']:
-                value += 10
-            elif rank == 'A':
-                aces += 1
-                value += 11
-            else:
-                value += int(rank)
-        
-        # Aの値を調整（21を超える場合は1として扱う）
-        while value > 21 and aces > 0:
-            value -= 10
-            aces -= 1
-        
+            value, soft_aces = self.add_card_value(value, soft_aces, card)
         return value
     
     def initial_deal(self):
         """初期カードを配る"""
-        self.player_hand = [self.deal_card(), self.deal_card()]
-        self.dealer_hand = [self.deal_card(), self.deal_card()]
+        self.deal_to_player()
+        self.deal_to_player()
+        self.deal_to_dealer()
+        self.deal_to_dealer()
         
         # プレイヤーがブラックジャックかチェック
-        if self.calculate_hand_value(self.player_hand) == 21:
+        if self.player_value == 21:
             self.is_finished = True
-            if self.calculate_hand_value(self.dealer_hand) == 21:
+            if self.dealer_value == 21:
                 self.result = 'push'
             else:
                 self.result = 'blackjack'
     
     def player_hit(self):
         """プレイヤーがヒット"""
-        self.player_hand.append(self.deal_card())
-        player_value = self.calculate_hand_value(self.player_hand)
+        self.deal_to_player()
+        player_value = self.player_value
         
         if player_value > 21:
             self.is_finished = True
@@ -85,11 +115,11 @@ class BlackjackGame:
     
     def dealer_play(self):
         """ディーラーのターン（17以上になるまで引く）"""
-        while self.calculate_hand_value(self.dealer_hand) < 17:
-            self.dealer_hand.append(self.deal_card())
+        while self.dealer_value < 17:
+            self.deal_to_dealer()
         
-        player_value = self.calculate_hand_value(self.player_hand)
-        dealer_value = self.calculate_hand_value(self.dealer_hand)
+        player_value = self.player_value
+        dealer_value = self.dealer_value
         
         if dealer_value > 21:
             self.result = 'win'
@@ -102,11 +132,56 @@ class BlackjackGame:
         
         self.is_finished = True
     
+    def odds_state(self):
+        """期待値計算に使う (残りカードの構成, プレイヤー合計, ソフトか, ディーラー合計, ソフトか)
+
+        プレイヤーから見えないディーラーの伏せ札（dealer_hand[0]）は山札と同じく未知のカードとして扱う。
+        """
+        unseen = self.deck.tolist()
+        unseen.append(self.dealer_hand[0])
+        return (
+            blackjack_odds.composition(unseen),
+            self.player_value,
+            self.player_soft_aces > 0,
+            *blackjack_odds.hand_state(self.dealer_hand[1:2]),
+        )
+    
+    def expected_values(self):
+        """ヒット・スタンドした場合の期待値（ベット1単位あたりの損益）"""
+        return blackjack_odds.expected_values(*self.odds_state())
+    
+    def to_state(self):
+        """保存用に (bet, 山札, プレイヤーの手札, ディーラーの手札) をバイト列で返す"""
+        return (
+            self.bet,
+            self.deck.tobytes(),
+            bytes(self.player_hand),
+            bytes(self.dealer_hand),
+        )
+    
+    @classmethod
+    def from_state(cls, bet, deck, player_hand, dealer_hand):
+        """to_state() の値からゲームを復元"""
+        game = cls(bet)
+        game.deck = array('B', deck)
+        for card in player_hand:
+            game.player_hand.append(card)
+            game.player_value, game.player_soft_aces = cls.add_card_value(
+                game.player_value, game.player_soft_aces, card
+            )
+        for card in dealer_hand:
+            game.dealer_hand.append(card)
+            game.dealer_value, game.dealer_soft_aces = cls.add_card_value(
+                game.dealer_value, game.dealer_soft_aces, card
+            )
+        return game
+    
     def get_hand_display(self, hand, hide_first=False):
         """手札を表示用文字列に変換"""
+        labels = self.CARD_LABELS
         if hide_first:
-            return f"🂠 {hand[1]}"
-        return " ".join(hand)
+            return f"🂠 {labels[hand[1]]}"
+        return " ".join(labels[card] for card in hand)
     
     def calculate_winnings(self):
         """勝敗に応じた獲得コインを計算"""
@@ -119,13 +194,258 @@ class BlackjackGame:
         else:
             return 0
 
-class BlackjackButtons(discord.ui.View):
-    """ブラックジャック用のボタン"""
+class GameSessionStore:
+    """進行中のブラックジャックを保持するセッションストア
+
+    最後の操作から ttl 秒経ったゲームは破棄し（ボタンはタイムアウトしないのでここで管理する）、
+    max_size を超えたら最も長く操作されていないゲームから追い出す。
+    ゲームの状態はSQLiteにも保存し、再起動後に続きから遊べるようにする。
+    ベットはゲーム開始時にセッションの保存と同じトランザクションで引き落とし、
+    精算せずに破棄したゲームはセッションの削除と同じトランザクションで払い戻す。
+    ゲームは key = (経済圏のID, ユーザーID) で管理する。
+    """
+
+    ALREADY_RUNNING = 'already_running'  # add() の戻り値（同じユーザーのゲームが進行中）
+
+    def __init__(self, write_queue, ledger, leaderboards, ttl=300, max_size=10000):
+        self.write_queue = write_queue
+        self.ledger = ledger
+        self.leaderboards = leaderboards
+        self.ttl = ttl
+        self.max_size = max_size
+        self._games = OrderedDict()  # (guild_id, user_id): (BlackjackGame, expires_at)
+        self._reserved = {}  # ベットの引き落としを待っているゲーム（コミットされるまで get/pop/save から見えない）
+        self._writes = set()  # 結果を待たずに積んだ書き込み（完了するまで参照を持つ）
+
+        # メトリクス
+        self.started = 0
+        self.expired = 0
+        self.evicted = 0
+        self.resumed = 0
+
+    def __len__(self):
+        return len(self._games)
+
+    def __contains__(self, key):
+        return key in self._reserved or self.get(key) is not None
+
+    def get(self, key):
+        """ゲームを取得（期限切れならNone）。取得するとTTLが延長され、DBの期限も更新する"""
+        entry = self._games.get(key)
+        if entry is None:
+            return None
+        game, expires_at = entry
+        if expires_at <= time.time():
+            self._discard(key)
+            self.expired += 1
+            return None
+        expires_at = time.time() + self.ttl
+        self._games[key] = (game, expires_at)
+        self._games.move_to_end(key)
+        # 再起動後の load() が古い期限で払い戻さないよう、延長した期限も保存する
+        self._write_later(self._touch, key, expires_at)
+        return game
+
+    async def add(self, key, game):
+        """ベットを引き落としてゲームを登録し、新しい残高を返す
+
+        残高不足ならNone、同じユーザーのゲームが進行中なら ALREADY_RUNNING を返す（上書きしない）。
+        """
+        # 確認と枠の確保は await を挟まずに行う（同時に来た /bj play の片方だけが通る）
+        if key in self:
+            return self.ALREADY_RUNNING
+        expires_at = time.time() + self.ttl
+        # 引き落としを待つ間に同じユーザーがゲームを重複して始めないよう、先に枠を確保する。
+        # 確保した枠は引き落としがコミットされるまで操作できない（未保存のゲームを保存・精算させない）
+        self._reserved[key] = game
+        try:
+            coins = await self.write_queue.submit(self._start, key, game.to_state(), expires_at)
+        finally:
+            self._reserved.pop(key, None)
+        if coins is None:
+            return None
+        
+        self._games[key] = (game, expires_at)
+        self._games.move_to_end(key)
+        self.started += 1
+        while len(self._games) > self.max_size:
+            oldest = next(iter(self._games))
+            self._discard(oldest)
+            self.evicted += 1
+        return coins
+
+    async def save(self, key):
+        """ゲームの現在の状態をDBに保存"""
+        entry = self._games.get(key)
+        if entry is not None:
+            game, expires_at = entry
+            await self.write_queue.submit(self._save, key, game.to_state(), expires_at)
+
+    def pop(self, key):
+        """精算するゲームを取り出す（期限切れならNone）
+
+        DB上のセッションは精算と同じトランザクションで settle() が削除する。
+        """
+        game = self.get(key)
+        if game is not None:
+            self._games.pop(key, None)
+        return game
+
+    def sweep(self):
+        """期限切れのゲームをまとめて破棄"""
+        now = time.time()
+        for key in [k for k, (_, expires_at) in self._games.items() if expires_at <= now]:
+            self._discard(key)
+            self.expired += 1
+
+    def archive_guild(self, guild_id):
+        """ギルドのアーカイブ前に呼ばれる（イベントループ）。払い戻しはアーカイブ側で行うのでメモリから外すだけ"""
+        for key in [k for k in self._games if k[0] == guild_id]:
+            self._games.pop(key, None)
+
+    def _discard(self, key):
+        """精算せずにゲームを破棄してベットを払い戻す"""
+        self._games.pop(key, None)
+        # DB側の処理はバッチに相乗りさせる（結果を待つ必要はない）
+        self._write_later(self._refund, key)
+
+    def _write_later(self, func, *args):
+        """結果を待たずに書き込みをキューに積む（失敗はログに残す）"""
+        task = asyncio.ensure_future(self.write_queue.submit(func, *args))
+        self._writes.add(task)
+        task.add_done_callback(self._written)
+
+    def _written(self, task):
+        self._writes.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logging.error("ブラックジャックのセッションの書き込みに失敗しました", exc_info=task.exception())
+
+    def load(self, conn):
+        """保存されているゲームを復元（DBスレッドで呼ぶ）。期限切れのゲームは払い戻す"""
+        now = time.time()
+        expired = conn.execute(
+            'SELECT guild_id, user_id FROM blackjack_sessions WHERE expires_at <= ?', (now,)
+        ).fetchall()
+        for guild_id, user_id in expired:
+            self._refund(conn, (guild_id, int(user_id)))
+        rows = conn.execute('''
+            SELECT guild_id, user_id, bet, deck, player_hand, dealer_hand, expires_at
+            FROM blackjack_sessions
+            ORDER BY expires_at
+        ''').fetchall()
+        for guild_id, user_id, bet, deck, player_hand, dealer_hand, expires_at in rows:
+            game = BlackjackGame.from_state(bet, deck, player_hand, dealer_hand)
+            self._games[(guild_id, int(user_id))] = (game, expires_at)
+        self.resumed += len(rows)
+        return len(rows)
+
+    def _start(self, conn, key, state, expires_at):
+        """ベットを引き落としてセッションを作り、新しい残高を返す（残高不足ならNone）
+
+        セッションの行を作るのはここだけ（行があれば必ず引き落とし済み）。
+        """
+        guild_id, user_id = key
+        bet, deck, player_hand, dealer_hand = state
+        coins = self.ledger.apply(conn, guild_id, user_id, -bet, 'blackjack_bet', required=bet)
+        if coins is None:
+            return None
+        conn.execute('''
+            INSERT INTO blackjack_sessions
+                (guild_id, user_id, bet, deck, player_hand, dealer_hand, expires_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (guild_id, str(user_id), bet, deck, player_hand, dealer_hand, expires_at))
+        self.leaderboards.user_changed(conn, guild_id, user_id)
+        return coins
+
+    def _refund(self, conn, key):
+        """セッションを削除してベットを払い戻す（既に精算済みなら何もしない）"""
+        guild_id, user_id = key
+        row = conn.execute(
+            'SELECT bet FROM blackjack_sessions WHERE guild_id = ? AND user_id = ?', (guild_id, str(user_id))
+        ).fetchone()
+        if row is None or not self.settle(conn, key):
+            return
+        self.ledger.apply(conn, guild_id, user_id, row[0], 'blackjack_refund')
+        self.leaderboards.user_changed(conn, guild_id, user_id)
+
+    @staticmethod
+    def settle(conn, key):
+        """精算するゲームのセッションを削除する。削除できた（未精算だった）ならTrue"""
+        guild_id, user_id = key
+        cursor = conn.execute(
+            'DELETE FROM blackjack_sessions WHERE guild_id = ? AND user_id = ?', (guild_id, str(user_id))
+        )
+        return cursor.rowcount > 0
+
+    @staticmethod
+    def _save(conn, key, state, expires_at):
+        """既存のセッションの行を更新する（精算・払い戻し済みで行がなければ何もしない）"""
+        guild_id, user_id = key
+        _, deck, player_hand, dealer_hand = state
+        conn.execute('''
+            UPDATE blackjack_sessions
+            SET deck = ?, player_hand = ?, dealer_hand = ?, expires_at = ?
+            WHERE guild_id = ? AND user_id = ?
+        ''', (deck, player_hand, dealer_hand, expires_at, guild_id, str(user_id)))
+
+    @staticmethod
+    def _touch(conn, key, expires_at):
+        """セッションの期限だけを更新する（行がなければ何もしない）"""
+        guild_id, user_id = key
+        conn.execute(
+            'UPDATE blackjack_sessions SET expires_at = ? WHERE guild_id = ? AND user_id = ?',
+            (expires_at, guild_id, str(user_id))
+        )
+
+    def stats(self):
+        return {
+            'active': len(self._games),
+            'max_size': self.max_size,
+            'started': self.started,
+            'expired': self.expired,
+            'evicted': self.evicted,
+            'resumed': self.resumed,
+        }
+
+class BlackjackButton(discord.ui.DynamicItem[discord.ui.Button], template=r'bj:(?P<action>hit|stand):(?P<user_id>[0-9]+)'):
+    """ブラックジャック用のボタン
+
+    custom_id に操作とプレイヤーのIDを埋め込み、起動時に一度だけ登録する。
+    押されたボタンは custom_id からゲームに振り分けるので、メッセージごとに
+    Viewを保持する必要がなく、再起動前のメッセージのボタンもそのまま使える。
+    放置されたゲームの破棄はセッションストアのTTLに任せる。
+    """
+    
+    BUTTONS = {
+        'hit': ('🎴 Hit', discord.ButtonStyle.primary),
+        'stand': ('✋ Stand', discord.ButtonStyle.secondary),
+    }
     
-    def __init__(self, user_id, blackjack_group):
-        super().__init__(timeout=300)  # 5分でタイムアウト
+    def __init__(self, action, user_id, disabled=False):
+        label, style = self.BUTTONS[action]
+        super().__init__(discord.ui.Button(
+            label=label,
+            style=style,
+            custom_id=f'bj:{action}:{user_id}',
+            disabled=disabled,
+        ))
+        self.action = action
         self.user_id = user_id
-        self.blackjack_group = blackjack_group
+    
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match['action'], int(match['user_id']))
+    
+    @classmethod
+    def view(cls, user_id, disabled=False):
+        """ゲームのメッセージに付けるボタン一式"""
+        view = discord.ui.View(timeout=None)
+        view.add_item(cls('hit', user_id, disabled))
+        view.add_item(cls('stand', user_id, disabled))
+        if disabled:
+            # 押せないボタンなのでViewStoreに登録させない
+            view.stop()
+        return view
     
     async def interaction_check(self, interaction: discord.Interaction) -> bool:
         """ボタンを押したのがゲームのプレイヤー本人かチェック"""
@@ -137,76 +457,74 @@ class BlackjackButtons(discord.ui.View):
             return False
         return True
     
-    @discord.ui.button(label='🎴 Hit', style=discord.ButtonStyle.primary)
-    async def hit_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        """Hitボタン"""
-        await self.blackjack_group.process_hit(interaction, self.user_id)
-    
-    @discord.ui.button(label='✋ Stand', style=discord.ButtonStyle.secondary)
-    async def stand_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        """Standボタン"""
-        await self.blackjack_group.process_stand(interaction, self.user_id)
-    
-    async def on_timeout(self):
-        """タイムアウト時の処理"""
-        # ボタンを無効化
-        for item in self.children:
-            item.disabled = True
+    async def callback(self, interaction: discord.Interaction):
+        cog = interaction.client.get_cog('BlackjackCog')
+        if cog is None:
+            await interaction.response.send_message('ブラックジャックは現在利用できません。', ephemeral=True)
+            return
+        if self.action == 'hit':
+            await cog.bj_group.process_hit(interaction, self.user_id)
+        else:
+            await cog.bj_group.process_stand(interaction, self.user_id)
 
 class BlackjackGroup(app_commands.Group):
     
-    def __init__(self):
+    def __init__(self, db, write_queue, leaderboards, ledger, game_stats, economy):
         super().__init__(name="bj", description="ブラックジャック関連コマンド")
-        self.active_games = {}  # user_id: BlackjackGame
+        self.db = db
+        self.write_queue = write_queue
+        self.leaderboards = leaderboards
+        self.ledger = ledger
+        self.game_stats = game_stats
+        self.economy = economy
+        self.active_games = GameSessionStore(write_queue, ledger, leaderboards)  # (guild_id, user_id): BlackjackGame
+        self.odds = blackjack_odds.OddsService()  # /bj hint の期待値（配り終えた直後は事前計算の表）
+        self.embeds = EmbedCache()  # ルールなど毎回同じ埋め込み
+    
+    async def init_database(self):
+        await self.db.transaction(self._init_database)
+    
+    def _init_database(self, conn):
+        # スキーマは起動時に utils.migrations で作成済み。期限切れのゲームを払い戻してから復元する
+        resumed = self.active_games.load(conn)
+        if resumed:
+            logging.info(f"🃏 進行中のブラックジャック {resumed} 件を復元しました")
     
-    def get_user(self, user_id):
+    async def get_user(self, guild_id, user_id):
         """ユーザー情報を取得（スロットと同じDB）"""
-        conn = sqlite3.connect('slot_bot.db')
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM users WHERE user_id = ?', (str(user_id),))
-        user = cursor.fetchone()
-
-        if not user:
-            cursor.execute(
-                'INSERT INTO users (user_id, coins) VALUES (?, 1000)', (str(user_id),)
-            )
-            conn.commit()
-            cursor.execute('SELECT * FROM users WHERE user_id = ?', (str(user_id),))
-            user = cursor.fetchone()
-
-        conn.close()
-        return {
-            'user_id': user[0],
-            'coins': user[1],
-            'total_wins': user[2],
-            'total_losses': user[3],
-            'biggest_win': user[4],
-            'bankruptcy_count': int(user[5]) if len(user) > 5 and user[5] is not None else 0
-        }
+        return await self.db.run(self.ledger.get_user, guild_id, user_id)
     
-    def update_user(self, user_id, coins, is_win, win_amount):
-        """ユーザー情報を更新"""
-        conn = sqlite3.connect('slot_bot.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE users 
-            SET coins = ?,
-                total_wins = total_wins + ?,
-                total_losses = total_losses + ?,
-                biggest_win = MAX(biggest_win, ?),
-                last_played = CURRENT_TIMESTAMP
-            WHERE user_id = ?
-        ''', (coins, 1 if is_win else 0, 0 if is_win else 1, win_amount, str(user_id)))
-        conn.commit()
-        conn.close()
+    async def settle(self, key, game, is_win, username, staked=True):
+        """ゲームを精算して新しい残高を返す
+
+        staked: ベットを開始時に引き落とし済みか（セッションを保存したゲーム）。
+        引き落とし前に決着したゲームはここでベットとの差分をまとめて反映し、
+        残高が足りなければNoneを返す。
+        """
+        return await self.write_queue.submit(self._settle, key, game.bet, game.calculate_winnings(), is_win, username, staked)
+
+    def _settle(self, conn, key, bet, winnings, is_win, username, staked):
+        guild_id, user_id = key
+        if staked:
+            if not self.active_games.settle(conn, key):
+                # 既に払い戻し済み（二重に精算しない）
+                return self.ledger.get_user(conn, guild_id, user_id)['coins']
+            coins = self.ledger.record_game(conn, guild_id, user_id, winnings, 'blackjack', is_win, winnings, username)
+        else:
+            coins = self.ledger.record_game(
+                conn, guild_id, user_id, winnings - bet, 'blackjack', is_win, winnings, username, required=bet
+            )
+        if coins is not None:
+            self.game_stats.record(conn, guild_id, user_id, 'blackjack', bet, winnings)
+        return coins
     
     def create_game_embed(self, game, user_name, show_dealer=False):
         """ゲーム状態の埋め込みメッセージを作成"""
-        player_value = game.calculate_hand_value(game.player_hand)
+        player_value = game.player_value
         
         if show_dealer or game.is_finished:
             dealer_display = game.get_hand_display(game.dealer_hand)
-            dealer_value = game.calculate_hand_value(game.dealer_hand)
+            dealer_value = game.dealer_value
             dealer_info = f"{dealer_display} (合計: {dealer_value})"
         else:
             dealer_display = game.get_hand_display(game.dealer_hand, hide_first=True)
@@ -263,94 +581,85 @@ class BlackjackGroup(app_commands.Group):
     
     async def process_hit(self, interaction: discord.Interaction, user_id: int):
         """Hit処理（ボタンとコマンド共通）"""
-        if user_id not in self.active_games:
+        key = (self.economy.scope(interaction), user_id)
+        game = self.active_games.get(key)
+        if game is None:
             await interaction.response.send_message(
                 'ゲームが開始されていません。`/bj play` でゲームを開始してください。',
                 ephemeral=True
             )
             return
         
-        game = self.active_games[user_id]
-        user = self.get_user(user_id)
-        
         # カードを引く
         should_auto_stand = game.player_hit()
         
         embed = self.create_game_embed(game, interaction.user.name)
         
         if game.is_finished or should_auto_stand:
+            # 連打で二重に精算しないよう、先にセッションから外す
+            self.active_games.pop(key)
             if should_auto_stand and not game.is_finished:
                 # 21になった場合は自動的にスタンド
                 game.dealer_play()
                 embed = self.create_game_embed(game, interaction.user.name, show_dealer=True)
             
             # ゲーム終了処理
-            winnings = game.calculate_winnings()
-            new_coins = user['coins'] - game.bet + winnings
-            self.update_user(user_id, new_coins, game.result in ['win', 'blackjack'], winnings)
+            new_coins = await self.settle(
+                key, game, game.result in ['win', 'blackjack'], interaction.user.name
+            )
             embed.add_field(name='現在のコイン', value=f'{new_coins:,} コイン', inline=True)
-            del self.active_games[user_id]
             
             # ボタンを無効化して更新
-            view = BlackjackButtons(user_id, self)
-            for item in view.children:
-                item.disabled = True
-            await interaction.response.edit_message(embed=embed, view=view)
+            await interaction.response.edit_message(embed=embed, view=BlackjackButton.view(user_id, disabled=True))
         else:
-            # ゲーム継続
-            view = BlackjackButtons(user_id, self)
-            await interaction.response.edit_message(embed=embed, view=view)
+            # ゲーム継続（ボタンはそのまま）
+            await self.active_games.save(key)
+            await interaction.response.edit_message(embed=embed)
     
     async def process_stand(self, interaction: discord.Interaction, user_id: int):
         """Stand処理（ボタンとコマンド共通）"""
-        if user_id not in self.active_games:
+        # 連打で二重に精算しないよう、先にセッションから外す
+        key = (self.economy.scope(interaction), user_id)
+        game = self.active_games.pop(key)
+        if game is None:
             await interaction.response.send_message(
                 'ゲームが開始されていません。`/bj play` でゲームを開始してください。',
                 ephemeral=True
             )
             return
         
-        game = self.active_games[user_id]
-        user = self.get_user(user_id)
-        
         # ディーラーのターン
         game.dealer_play()
         
         # 結果表示
         embed = self.create_game_embed(game, interaction.user.name, show_dealer=True)
         
-        winnings = game.calculate_winnings()
-        new_coins = user['coins'] - game.bet + winnings
-        self.update_user(user_id, new_coins, game.result in ['win', 'blackjack'], winnings)
+        new_coins = await self.settle(
+            key, game, game.result in ['win', 'blackjack'], interaction.user.name
+        )
         embed.add_field(name='現在のコイン', value=f'{new_coins:,} コイン', inline=True)
         
-        del self.active_games[user_id]
-        
         # ボタンを無効化して更新
-        view = BlackjackButtons(user_id, self)
-        for item in view.children:
-            item.disabled = True
-        await interaction.response.edit_message(embed=embed, view=view)
+        await interaction.response.edit_message(embed=embed, view=BlackjackButton.view(user_id, disabled=True))
     
     @app_commands.command(name="play", description="ブラックジャックを開始します")
     @app_commands.describe(bet="ベットするコイン数（デフォルト: 10）")
     async def play(self, interaction: discord.Interaction, bet: int = 10):
         """ブラックジャックを開始"""
         user_id = interaction.user.id
+        guild_id = self.economy.scope(interaction)
+        key = (guild_id, user_id)
         
-        # 既にゲーム中かチェック
-        if user_id in self.active_games:
-            await interaction.response.send_message(
-                '既にゲーム中です！先にゲームを終了してください。',
-                ephemeral=True
-            )
+        # 既にゲーム中かチェック（同時に来た場合は add() でもう一度確かめる）
+        if key in self.active_games:
+            await self._send_already_running(interaction)
             return
         
         if bet < 1:
             await interaction.response.send_message('ベット額は1以上にしてください！', ephemeral=True)
             return
         
-        user = self.get_user(user_id)
+        user = await self.get_user(guild_id, user_id)
         
         if user['coins'] < bet:
             if user['coins'] == 0:
@@ -368,22 +677,44 @@ class BlackjackGroup(app_commands.Group):
         # ゲーム開始
         game = BlackjackGame(bet)
         game.initial_deal()
-        self.active_games[user_id] = game
         
         embed = self.create_game_embed(game, interaction.user.name)
         
         if game.is_finished:
-            # ブラックジャックまたは両方21の場合
-            winnings = game.calculate_winnings()
-            new_coins = user['coins'] - bet + winnings
-            self.update_user(user_id, new_coins, game.result != 'lose', winnings)
+            # ブラックジャックまたは両方21の場合（ベットの引き落としと精算を同時に行う）
+            new_coins = await self.settle(
+                key, game, game.result != 'lose', interaction.user.name, staked=False
+            )
+            if new_coins is None:
+                await self._send_insufficient(interaction)
+                return
             embed.add_field(name='現在のコイン', value=f'{new_coins:,} コイン', inline=True)
-            del self.active_games[user_id]
             await interaction.response.send_message(embed=embed)
         else:
+            # ベットを引き落としてからゲームを登録（残高は他のゲームと並行して変わりうる）
+            coins = await self.active_games.add(key, game)
+            if coins is GameSessionStore.ALREADY_RUNNING:
+                await self._send_already_running(interaction)
+                return
+            if coins is None:
+                await self._send_insufficient(interaction)
+                return
+            
             # ボタンを追加
-            view = BlackjackButtons(user_id, self)
-            await interaction.response.send_message(embed=embed, view=view)
+            await interaction.response.send_message(embed=embed, view=BlackjackButton.view(user_id))
+    
+    async def _send_already_running(self, interaction):
+        await interaction.response.send_message(
+            '既にゲーム中です！先にゲームを終了してください。',
+            ephemeral=True
+        )
+    
+    async def _send_insufficient(self, interaction):
+        user = await self.get_user(self.economy.scope(interaction), interaction.user.id)
+        await interaction.response.send_message(
+            f"コインが足りません！現在のコイン: {user['coins']:,}",
+            ephemeral=True
+        )
     
     @app_commands.command(name="hit", description="カードを1枚引きます")
     async def hit(self, interaction: discord.Interaction):
@@ -395,9 +726,45 @@ class BlackjackGroup(app_commands.Group):
         """スタンド - コマンド版"""
         await self.process_stand(interaction, interaction.user.id)
     
-    @app_commands.command(name="rules", description="ブラックジャックのルールを表示します")
-    async def rules(self, interaction: discord.Interaction):
-        """ルール説明"""
+    @app_commands.command(name="hint", description="ヒットとスタンドの期待値を表示します")
+    async def hint(self, interaction: discord.Interaction):
+        """現在の手札でヒット・スタンドした場合の期待値を表示"""
+        game = self.active_games.get((self.economy.scope(interaction), interaction.user.id))
+        if game is None:
+            await interaction.response.send_message(
+                'ゲームが開始されていません。`/bj play` でゲームを開始してください。',
+                ephemeral=True
+            )
+            return
+        
+        # 盤面はイベントループ上で写し取り、計算は別プロセスで行う
+        state = game.odds_state()
+        start = time.perf_counter()
+        evs = await self.odds.expected_values(state)
+        elapsed = (time.perf_counter() - start) * 1000
+        
+        best = 'hit' if evs['hit'] > evs['stand'] else 'stand'
+        embed = discord.Embed(
+            title='💡 ヒント',
+            description=f"おすすめ: **{'🎴 Hit' if best == 'hit' else '✋ Stand'}**",
+            color=discord.Color.teal()
+        )
+        embed.add_field(
+            name='🎴 ヒットの期待値',
+            value=f"{evs['hit'] * game.bet:+.1f} コイン ({evs['hit']:+.3f}倍)",
+            inline=True
+        )
+        embed.add_field(
+            name='✋ スタンドの期待値',
+            value=f"{evs['stand'] * game.bet:+.1f} コイン ({evs['stand']:+.3f}倍)",
+            inline=True
+        )
+        embed.set_footer(text=f'残りの山札から厳密に計算 ({elapsed:.1f}ms)')
+        
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+    
+    def _build_rules(self):
+        """ルールの埋め込み（内容は変わらないので1回だけ作る）"""
         embed = discord.Embed(
             title='🃏 ブラックジャック ルール',
             description='21を目指すカードゲーム！',
@@ -415,7 +782,7 @@ class BlackjackGroup(app_commands.Group):
         )
         embed.add_field(
             name='🎮 コマンド',
-            value='`/bj play [ベット額]` - ゲーム開始\n`/bj hit` - カードを1枚引く\n`/bj stand` - これ以上引かずに勝負\n\n💡 ゲーム中はボタンでも操作できます！',
+            value='`/bj play [ベット額]` - ゲーム開始\n`/bj hit` - カードを1枚引く\n`/bj stand` - これ以上引かずに勝負\n`/bj hint` - ヒット・スタンドの期待値を表示\n\n💡 ゲーム中はボタンでも操作できます！',
             inline=False
         )
         embed.add_field(
@@ -429,15 +796,28 @@ class BlackjackGroup(app_commands.Group):
             inline=False
         )
         embed.set_footer(text='💎 スロットと同じコインを使用します')
+        return embed
+
+    @app_commands.command(name="rules", description="ブラックジャックのルールを表示します")
+    async def rules(self, interaction: discord.Interaction):
+        """ルール説明"""
+        embed = self.embeds.get('rules', self._build_rules)
         
         await interaction.response.send_message(embed=embed)
 
 class BlackjackCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.bj_group = BlackjackGroup()
+        self.bj_group = BlackjackGroup(
+            bot.db, bot.write_queue, bot.leaderboards, bot.ledger, bot.game_stats, bot.economy
+        )
 
     async def cog_load(self):
+        await self.bj_group.init_database()
+        self.bj_group.odds.load()
+        self.sweep_sessions.start()
+        self.bot.add_dynamic_items(BlackjackButton)
+        self.bot.economy.add_archive_hook(self.bj_group.active_games.archive_guild, in_loop=True)
         self.bot.tree.add_command(self.bj_group)
         logging.info(f"BlackjackGroup を追加しました (コマンド数: {len(self.bj_group.commands)})")
         for cmd in self.bj_group.commands:
@@ -445,8 +825,17 @@ class BlackjackCog(commands.Cog):
 
     async def cog_unload(self):
         self.bot.tree.remove_command("bj")
+        self.bot.remove_dynamic_items(BlackjackButton)
+        self.bot.economy.remove_archive_hook(self.bj_group.active_games.archive_guild, in_loop=True)
+        self.sweep_sessions.cancel()
+        await self.bot.write_queue.flush()
         logging.info("BlackjackGroup を削除しました")
 
+    @tasks.loop(seconds=60)
+    async def sweep_sessions(self):
+        """放置されたゲームを定期的に破棄"""
+        self.bj_group.active_games.sweep()
+
 async def setup(bot):
     await bot.add_cog(BlackjackCog(bot))
     logging.info("BlackjackCog をセットアップしました")
\ No newline at end of file
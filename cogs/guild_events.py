@@ -1,41 +1,29 @@
 import discord
 from discord.ext import commands
-import yaml
-import os
-
-LANG_FILE_PATH = "data/lang_guild_settings.yml"
-
-def load_guild_settings():
-    if not os.path.exists(LANG_FILE_PATH):
-        return {}
-    with open(LANG_FILE_PATH, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f) or {}
-
-def save_guild_settings(data):
-    with open(LANG_FILE_PATH, "w", encoding="utf-8") as f:
-        yaml.dump(data, f, allow_unicode=True)
 
 class GuildEvents(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # 停止中に参加・退出したギルドの設定を1回でまとめて反映する
+        added, removed = self.bot.guild_settings.reconcile(guild.id for guild in self.bot.guilds)
+        if added or removed:
+            print(f"🔄 ギルド設定を同期: 追加 {added} / 削除 {removed}")
+
     @commands.Cog.listener()
     async def on_guild_join(self, guild):
-        settings = load_guild_settings()
-        gid = str(guild.id)
-        if gid not in settings:
-            settings[gid] = "en"
-            save_guild_settings(settings)
-            print(f"✅ Joined: {guild.name} | 言語を en に設定")
+        if self.bot.guild_settings.add(guild.id):
+            print(f"✅ Joined: {guild.name} | 言語を {self.bot.guild_settings.default_language} に設定")
+        # 以前退出したギルドならアーカイブした経済圏を戻す
+        await self.bot.economy.restore_guild(guild.id)
 
     @commands.Cog.listener()
     async def on_guild_remove(self, guild):
-        settings = load_guild_settings()
-        gid = str(guild.id)
-        if gid in settings:
-            del settings[gid]
-            save_guild_settings(settings)
+        if self.bot.guild_settings.remove(guild.id):
             print(f"❌ Removed: {guild.name} | 設定削除")
+        await self.bot.economy.archive_guild(guild.id)
 
 async def setup(bot):
     await bot.add_cog(GuildEvents(bot))
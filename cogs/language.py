@@ -1,20 +1,6 @@
 import discord
 from discord import app_commands
 from discord.ext import commands
-import yaml
-import os
-
-LANG_FILE_PATH = "data/lang_guild_settings.yml"
-
-def load_guild_settings():
-    if not os.path.exists(LANG_FILE_PATH):
-        return {}
-    with open(LANG_FILE_PATH, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f) or {}
-    
-def save_guild_settings(data):
-    with open(LANG_FILE_PATH, "w", encoding="utf-8") as f:
-        yaml.dump(data, f, allow_unicode=True)
 
 class Language(commands.Cog):
     def __init__(self, bot):
@@ -25,14 +11,12 @@ class Language(commands.Cog):
     @app_commands.describe(language="Choose language ex: ja , en")
     @app_commands.checks.has_permissions(administrator=True)
     async def set_language(self, interaction: discord.Interaction, language: str):
-        supported_languages = ["ja", "en"]
+        supported_languages = self.bot.translations.languages
         if language not in supported_languages:
             await interaction.response.send_message(f"対応している言語は {', '.join(supported_languages)} のみです。", ephemeral=True)
             return
 
-        settings = load_guild_settings()
-        settings[str(interaction.guild.id)] = language
-        save_guild_settings(settings)
+        self.bot.guild_settings.set_language(interaction.guild.id, language)
 
         await interaction.response.send_message(f"✅ 言語が `{language}` に設定されました。")
 
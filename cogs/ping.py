@@ -2,25 +2,39 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 import time
-import yaml
-import os
-
-# 言語ファイル読み込み関数
-def load_translations(lang_code):
-    try:
-        with open(f'lang/{lang_code}.yml', 'r', encoding='utf-8') as f:
-            return yaml.safe_load(f)
-    except:
-        return {}
 
 class Utility(commands.Cog):
+    # /ping detail で表示するコマンド数（埋め込みのフィールドは1024文字まで）
+    DETAIL_COMMANDS = 8
+
     def __init__(self, bot):
         self.bot = bot
 
+    def latency_table(self, window):
+        """コマンドごとの p50/p95/p99（ミリ秒）と内訳の p95 の表"""
+        summary = self.bot.command_metrics.summary(window)
+        if not summary:
+            return None
+        lines = [f"{'command':<16}{'n':>5}{'p50':>8}{'p95':>8}{'p99':>8}"]
+        for name, stats in list(summary.items())[:self.DETAIL_COMMANDS]:
+            p50, p95, p99 = (value * 1000 for value in stats['total'])
+            lines.append(f"{name[:16]:<16}{stats['count']:>5}{p50:>8.1f}{p95:>8.1f}{p99:>8.1f}")
+            db, render, api = (stats[kind][1] * 1000 for kind in ('db', 'render', 'api'))
+            lines.append(f"  p95 db {db:.1f} / render {render:.1f} / api {api:.1f}")
+        return "```\n" + "\n".join(lines) + "\n```"
+
     @app_commands.command(name="ping", description="Botの応答速度を確認します")
-    async def ping(self, interaction: discord.Interaction):
-        lang = interaction.locale or "en-US"
-        translations = load_translations(lang[:2])  # 例: "ja", "en"
+    @app_commands.describe(detail="コマンドごとの処理時間 (p50/p95/p99) も表示します", window="集計する期間")
+    @app_commands.choices(window=[
+        app_commands.Choice(name="1分", value="1m"),
+        app_commands.Choice(name="5分", value="5m"),
+        app_commands.Choice(name="1時間", value="1h"),
+    ])
+    async def ping(self, interaction: discord.Interaction, detail: bool = False, window: str = "5m"):
+        # ギルドの言語 → ユーザーのロケール（例: "ja", "en-US" → "en"）→ en
+        translations = self.bot.translations.translation(
+            self.bot.guild_settings.language(interaction.guild_id), interaction.locale
+        )
 
         start = time.perf_counter()
         await interaction.response.defer(thinking=True)
@@ -41,6 +55,12 @@ class Utility(commands.Cog):
             name=translations.get("ping.response_time", "Response Time"),
             value=f"{response_time}ms"
         )
+        if detail:
+            embed.add_field(
+                name=translations.get("ping.command_latency", "Command latency (ms, {window})").format(window=window),
+                value=self.latency_table(window) or translations.get("ping.no_samples", "No commands yet"),
+                inline=False
+            )
 
         await interaction.followup.send(embed=embed)
 
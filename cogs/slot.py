@@ -1,10 +1,133 @@
 import discord
 from discord import app_commands
-from discord.ext import commands
-import sqlite3
-import random
-from datetime import datetime
+from discord.ext import commands, tasks
+import threading
+from datetime import datetime, timezone
 import logging
+from utils.embed_cache import EmbedCache
+from utils.slot_engine import SlotEngine
+
+class JackpotCounter:
+    """ジャックポット額をメモリ上で管理するクラス
+
+    メモリ上の値が正で、DBの jackpots 行は起動時の復元用チェックポイント。
+    積み立てはメモリだけを更新し、checkpoint() で定期的に書き戻す。
+    当選（claim）は賞金の支払いと同じトランザクションで即座に書き込むので、
+    クラッシュしても二重払いは起きず、失われるのは直近の積み立て分だけ。
+    メモリの変更はトランザクション内で行い、コミットに失敗したら db.on_rollback() で元に戻す。
+    """
+
+    BASE_AMOUNT = 10000
+
+    def __init__(self, db, guild_id=''):
+        self.guild_id = guild_id
+        self.db = db
+        self._lock = threading.Lock()
+        self.amount = self.BASE_AMOUNT
+        self.last_winner = None
+        self.last_win_amount = 0
+        self.last_win_date = None
+        self._dirty = False
+
+    def load(self, conn):
+        """DBのチェックポイントから復元（行がなければ最低額で作る）"""
+        row = self.db.storage.load_jackpot(conn, self.guild_id, self.BASE_AMOUNT)
+        with self._lock:
+            if row:
+                self.amount, self.last_winner, self.last_win_amount, self.last_win_date = row
+            self._dirty = False
+
+    def _remember(self):
+        """トランザクションが巻き戻されたら今の状態に戻す（ロック内で呼ぶ）"""
+        self.db.on_rollback(self._restore, (
+            self.amount, self.last_winner, self.last_win_amount, self.last_win_date, self._dirty
+        ))
+
+    def _restore(self, state):
+        with self._lock:
+            self.amount, self.last_winner, self.last_win_amount, self.last_win_date, self._dirty = state
+
+    def contribute(self, amount):
+        """ジャックポットに積み立てて新しい額を返す"""
+        with self._lock:
+            self._remember()
+            self.amount += amount
+            self._dirty = True
+            return self.amount
+
+    def claim(self, conn, username):
+        """ジャックポットを獲得して獲得額を返す（最低額にリセット）"""
+        with self._lock:
+            jackpot_amount = self.amount
+            win_date = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+            # DBへの書き込みが失敗した場合はメモリを変更しない
+            self.db.storage.record_jackpot_win(
+                conn, self.guild_id, self.BASE_AMOUNT, username, jackpot_amount, win_date
+            )
+            self._remember()
+            self.amount = self.BASE_AMOUNT
+            self.last_winner = username
+            self.last_win_amount = jackpot_amount
+            self.last_win_date = win_date
+            self._dirty = False
+            return jackpot_amount
+
+    def checkpoint(self, conn):
+        """現在の額をDBに書き戻す（変更がなければ何もしない）"""
+        with self._lock:
+            if not self._dirty:
+                return False
+            self.db.storage.save_jackpot(conn, self.guild_id, self.amount)
+            self._remember()
+            self._dirty = False
+            return True
+
+    def last_win(self):
+        """最後の当選者情報 (名前, 獲得額, 日時)。まだいなければNone"""
+        if self.last_winner is None:
+            return None
+        return self.last_winner, self.last_win_amount, self.last_win_date
+
+class JackpotPool:
+    """経済圏ごとの JackpotCounter（使われた経済圏の分だけDBから読み込む）"""
+
+    def __init__(self, db):
+        self.db = db
+        self._lock = threading.Lock()
+        self._counters = {}  # guild_id: JackpotCounter
+
+    def get(self, conn, guild_id):
+        """経済圏のジャックポットを返す（未読み込みならDBから読む。DBスレッドで呼ぶ）"""
+        with self._lock:
+            counter = self._counters.get(guild_id)
+        if counter is None:
+            counter = JackpotCounter(self.db, guild_id)
+            counter.load(conn)
+            with self._lock:
+                counter = self._counters.setdefault(guild_id, counter)
+            # 作ったばかりの行が巻き戻されたら、次に使う時に読み直す
+            self.db.on_rollback(self.discard, guild_id)
+        return counter
+
+    def loaded(self, guild_id):
+        """読み込み済みならそのジャックポット、なければNone"""
+        with self._lock:
+            return self._counters.get(guild_id)
+
+    def discard(self, guild_id):
+        with self._lock:
+            self._counters.pop(guild_id, None)
+
+    def amounts(self):
+        """読み込み済みの経済圏ごとの現在のジャックポット額"""
+        with self._lock:
+            return {guild_id: counter.amount for guild_id, counter in self._counters.items()}
+
+    def checkpoint(self, conn):
+        """変更のあったジャックポットをすべてDBに書き戻す"""
+        with self._lock:
+            counters = list(self._counters.values())
+        return sum(counter.checkpoint(conn) for counter in counters)
 
 class SlotGroup(app_commands.Group):
     
@@ -12,183 +135,117 @@ class SlotGroup(app_commands.Group):
     SYMBOL_WEIGHTS = [30, 25, 20, 15, 7, 3]
     JACKPOT_CONTRIBUTION = 1.00  # ベット額の5%がジャックポットに積み立て
 
-    def __init__(self):
+    def __init__(self, db, write_queue, leaderboards, ledger, game_stats, economy):
         super().__init__(name="slot", description="スロットマシン関連コマンド")
-        self.init_database()
-
-    def init_database(self):
-        conn = sqlite3.connect('slot_bot.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                user_id TEXT PRIMARY KEY,
-                coins INTEGER DEFAULT 1000,
-                total_wins INTEGER DEFAULT 0,
-                total_losses INTEGER DEFAULT 0,
-                biggest_win INTEGER DEFAULT 0,
-                bankruptcy_count INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_played TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # 既存のテーブルにbankruptcy_countカラムが存在しない場合は追加
-        cursor.execute("PRAGMA table_info(users)")
-        columns = [column[1] for column in cursor.fetchall()]
-        if 'bankruptcy_count' not in columns:
-            cursor.execute('ALTER TABLE users ADD COLUMN bankruptcy_count INTEGER DEFAULT 0')
-            conn.commit()
-        
-        # ジャックポット用テーブル
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS jackpot (
-                id INTEGER PRIMARY KEY CHECK (id = 1),
-                amount INTEGER DEFAULT 0,
-                last_winner TEXT,
-                last_win_amount INTEGER DEFAULT 0,
-                last_win_date TIMESTAMP
-            )
-        ''')
-        
-        # 初期ジャックポット額を設定
-        cursor.execute('INSERT OR IGNORE INTO jackpot (id, amount) VALUES (1, 10000)')
-        
-        conn.commit()
-        conn.close()
-
-    def get_jackpot(self):
-        """現在のジャックポット額を取得"""
-        conn = sqlite3.connect('slot_bot.db')
-        cursor = conn.cursor()
-        cursor.execute('SELECT amount FROM jackpot WHERE id = 1')
-        result = cursor.fetchone()
-        conn.close()
-        return result[0] if result else 0
-
-    def add_to_jackpot(self, amount):
-        """ジャックポットに積み立て"""
-        conn = sqlite3.connect('slot_bot.db')
-        cursor = conn.cursor()
-        cursor.execute('UPDATE jackpot SET amount = amount + ? WHERE id = 1', (amount,))
-        conn.commit()
-        conn.close()
-
-    def win_jackpot(self, user_id, username):
-        """ジャックポット獲得処理"""
-        conn = sqlite3.connect('slot_bot.db')
-        cursor = conn.cursor()
-        
-        # 現在のジャックポット額を取得
-        cursor.execute('SELECT amount FROM jackpot WHERE id = 1')
-        jackpot_amount = cursor.fetchone()[0]
-        
-        # ジャックポット情報を更新（最低額にリセット）
-        cursor.execute('''
-            UPDATE jackpot 
-            SET amount = 10000,
-                last_winner = ?,
-                last_win_amount = ?,
-                last_win_date = CURRENT_TIMESTAMP
-            WHERE id = 1
-        ''', (username, jackpot_amount))
-        
-        conn.commit()
-        conn.close()
-        return jackpot_amount
-
-    def get_last_jackpot_winner(self):
-        """最後のジャックポット勝者情報を取得"""
-        conn = sqlite3.connect('slot_bot.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT last_winner, last_win_amount, last_win_date 
-            FROM jackpot 
-            WHERE id = 1 AND last_winner IS NOT NULL
-        ''')
-        result = cursor.fetchone()
-        conn.close()
-        return result
-
-    def get_user(self, user_id):
-        conn = sqlite3.connect('slot_bot.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT user_id, coins, total_wins, total_losses, biggest_win, bankruptcy_count
-            FROM users WHERE user_id = ?
-        ''', (str(user_id),))
-        user = cursor.fetchone()
-
-        if not user:
-            cursor.execute(
-                'INSERT INTO users (user_id, coins) VALUES (?, 1000)', (str(user_id),)
-            )
-            conn.commit()
-            cursor.execute('''
-                SELECT user_id, coins, total_wins, total_losses, biggest_win, bankruptcy_count
-                FROM users WHERE user_id = ?
-            ''', (str(user_id),))
-            user = cursor.fetchone()
-
-        conn.close()
-        return {
-            'user_id': user[0],
-            'coins': user[1],
-            'total_wins': user[2],
-            'total_losses': user[3],
-            'biggest_win': user[4],
-            'bankruptcy_count': int(user[5]) if user[5] is not None else 0
-        }
+        self.db = db
+        self.write_queue = write_queue
+        self.leaderboards = leaderboards
+        self.ledger = ledger
+        self.game_stats = game_stats
+        self.economy = economy
+        self.jackpots = JackpotPool(db)  # 経済圏ごとのジャックポット
+        self.engine = SlotEngine(self.SYMBOLS, self.SYMBOL_WEIGHTS, self.payout_multiplier)
+        self.embeds = EmbedCache()  # ヘルプなど毎回同じ埋め込み
+
+    @property
+    def storage(self):
+        """ユーザーの読み書きに使う保存先（DBなしで作った場合に備えて使う時に引く）"""
+        return self.db.storage
+
+    async def init_database(self):
+        await self.db.run(self._init_database)
+
+    def _init_database(self, conn):
+        # スキーマは起動時に utils.migrations で作成済み。全サーバー共通のジャックポットは先に読み込む
+        self.jackpots.get(conn, self.economy.GLOBAL)
 
-    def update_user(self, user_id, coins, is_win, win_amount):
-        conn = sqlite3.connect('slot_bot.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE users 
-            SET coins = ?,
-                total_wins = total_wins + ?,
-                total_losses = total_losses + ?,
-                biggest_win = MAX(biggest_win, ?),
-                last_played = CURRENT_TIMESTAMP
-            WHERE user_id = ?
-        ''', (coins, 1 if is_win else 0, 0 if is_win else 1, win_amount, str(user_id)))
-        conn.commit()
-        conn.close()
-
-    def get_ranking(self, limit=10):
-        conn = sqlite3.connect('slot_bot.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT user_id, coins, total_wins, total_losses 
-            FROM users 
-            ORDER BY coins DESC 
-            LIMIT ?
-        ''', (limit,))
-        results = cursor.fetchall()
-        conn.close()
-        return results
+    async def get_user(self, guild_id, user_id):
+        return await self.db.run(self.ledger.get_user, guild_id, user_id)
+
+    async def update_user(self, guild_id, user_id, delta, is_win, win_amount, username=None):
+        return await self.write_queue.submit(
+            self.ledger.record_game, guild_id, user_id, delta, 'slot', is_win, win_amount, username
+        )
+
+    def _grant_bonus(self, conn, guild_id, user_id, bonus_amount):
+        """コインが0ならボーナスを付与して破産回数をカウントし、新しい残高を返す（0でなければNone）"""
+        if not self.storage.count_bankruptcy(conn, guild_id, user_id):
+            return None
+        coins = self.ledger.apply(conn, guild_id, user_id, bonus_amount, 'bonus')
+        self.leaderboards.user_changed(conn, guild_id, user_id)
+        return coins
+
+    async def get_ranking(self, guild_id, limit=10):
+        return await self.leaderboards.for_guild(guild_id).coins.get(self.db, limit)
     
-    def get_bankruptcy_ranking(self, limit=10):
+    async def get_bankruptcy_ranking(self, guild_id, limit=10):
         """破産回数ランキングを取得"""
-        conn = sqlite3.connect('slot_bot.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT user_id, bankruptcy_count, coins
-            FROM users 
-            WHERE bankruptcy_count > 0
-            ORDER BY bankruptcy_count DESC 
-            LIMIT ?
-        ''', (limit,))
-        results = cursor.fetchall()
-        conn.close()
-        return results
+        return await self.leaderboards.for_guild(guild_id).bankruptcy.get(self.db, limit)
+
+    async def get_jackpot(self, guild_id):
+        """経済圏のジャックポット（読み込み済みならDBに触れない）"""
+        jackpot = self.jackpots.loaded(guild_id)
+        if jackpot is None:
+            jackpot = await self.db.run(self.jackpots.get, guild_id)
+        return jackpot
+
+    def archive_guild(self, conn, guild_id):
+        """ギルドのアーカイブ前に呼ばれる（DBスレッド）。積み立て中の額を書き戻してメモリから外す"""
+        jackpot = self.jackpots.loaded(guild_id)
+        if jackpot is not None:
+            jackpot.checkpoint(conn)
+            self.jackpots.discard(guild_id)
+        self.leaderboards.discard(guild_id)
+
+    def _play_spin(self, conn, guild_id, user_id, username, bet, result):
+        """1回分のスピンの精算（残高確認〜ジャックポット再取得）をまとめて行う
+
+        write_queue.submit() 経由で呼び、1つのトランザクション内で処理する。
+        """
+        user = self.ledger.get_user(conn, guild_id, user_id)
+        jackpot = self.jackpots.get(conn, guild_id)
+        if user['coins'] < bet:
+            return {'played': False, 'coins': user['coins']}
+        
+        win = self.calculate_win(result, bet)
+        
+        # ジャックポット判定（メモリ上の額を獲得）
+        is_jackpot = (win == 'JACKPOT')
+        if is_jackpot:
+            win = jackpot.amount
+        
+        # 残高は差分で更新する（ブラックジャックの精算と並行しても上書きしない）
+        new_coins = self.ledger.record_game(
+            conn, guild_id, user_id, win - bet, 'slot', win > 0, win, username, required=bet
+        )
+        if new_coins is None:
+            return {'played': False, 'coins': user['coins']}
+        self.game_stats.record(conn, guild_id, user_id, 'slot', bet, win)
+        
+        # ジャックポットの更新はDB書き込みが成功した後に行う
+        if is_jackpot:
+            jackpot.claim(conn, username)
+        elif win == 0:
+            # 負けた時だけジャックポットに積み立て
+            jackpot.contribute(int(bet * self.JACKPOT_CONTRIBUTION))
+        
+        return {
+            'played': True,
+            'win': win,
+            'is_jackpot': is_jackpot,
+            'coins': new_coins,
+            'jackpot': jackpot.amount,
+        }
 
     def weighted_random(self):
-        return random.choices(self.SYMBOLS, weights=self.SYMBOL_WEIGHTS, k=1)[0]
+        return self.SYMBOLS[self.engine.draw_index()]
 
     def spin_slot(self):
-        return [self.weighted_random(), self.weighted_random(), self.weighted_random()]
+        return self.engine.spin()
 
-    def calculate_win(self, result, bet):
+    @staticmethod
+    def payout_multiplier(result):
+        """出目に対する配当倍率（エンジンの配当表の元になるルール）"""
         s1, s2, s3 = result
         
         # 3つ揃い
@@ -196,16 +253,22 @@ class SlotGroup(app_commands.Group):
             if s1 == '7️⃣':
                 return 'JACKPOT'  # ジャックポット当選
             elif s1 == '💎':
-                return bet * 20
+                return 20
             else:
-                return bet * 10
+                return 10
         
         # 2つ揃い
         if s1 == s2 or s2 == s3 or s1 == s3:
-            return bet * 2
+            return 2
         
         return 0
 
+    def calculate_win(self, result, bet):
+        multiplier = self.engine.payout(result)
+        if multiplier == 'JACKPOT':
+            return 'JACKPOT'
+        return bet * multiplier
+
     @app_commands.command(name="play", description="スロットを回します")
     @app_commands.describe(bet="ベットするコイン数（デフォルト: 10）")
     async def slot(self, interaction: discord.Interaction, bet: int = 10):
@@ -215,39 +278,29 @@ class SlotGroup(app_commands.Group):
             return
         
         user_id = interaction.user.id
-        user = self.get_user(user_id)
         
-        if user['coins'] < bet:
-            if user['coins'] == 0:
+        # スロットを回して、残高確認から精算までを1トランザクションで処理
+        result = self.spin_slot()
+        outcome = await self.write_queue.submit(
+            self._play_spin, self.economy.scope(interaction), user_id, interaction.user.name, bet, result
+        )
+        
+        if not outcome['played']:
+            if outcome['coins'] == 0:
                 await interaction.response.send_message(
                     f"💔 コインが0になってしまいました！\n\n`/slot bonus` コマンドで500コインを受け取ることができます。",
                     ephemeral=True
                 )
             else:
                 await interaction.response.send_message(
-                    f"コインが足りません！現在のコイン: {user['coins']}",
+                    f"コインが足りません！現在のコイン: {outcome['coins']}",
                     ephemeral=True
                 )
             return
         
-        # スロットを回す
-        result = self.spin_slot()
-        win = self.calculate_win(result, bet)
-        
-        # 負けた時だけジャックポットに積み立て
-        if win == 0:
-            jackpot_contribution = int(bet * self.JACKPOT_CONTRIBUTION)
-            self.add_to_jackpot(jackpot_contribution)
-        
-        # ジャックポット判定
-        is_jackpot = (win == 'JACKPOT')
-        if is_jackpot:
-            win = self.win_jackpot(user_id, interaction.user.name)
-        
-        new_coins = user['coins'] - bet + win
-        
-        # データベース更新
-        self.update_user(user_id, new_coins, win > 0, win)
+        win = outcome['win']
+        is_jackpot = outcome['is_jackpot']
+        new_coins = outcome['coins']
         
         # 結果を表示
         if is_jackpot:
@@ -282,10 +335,9 @@ class SlotGroup(app_commands.Group):
             embed.set_footer(text=f'{interaction.user.name} のスロット結果')
         
         # 現在のジャックポット額を表示
-        current_jackpot = self.get_jackpot()
         embed.add_field(
             name='💎 現在のジャックポット',
-            value=f'{current_jackpot:,} コイン',
+            value=f'{outcome["jackpot"]:,} コイン',
             inline=False
         )
         
@@ -294,8 +346,9 @@ class SlotGroup(app_commands.Group):
     @app_commands.command(name="jackpot", description="現在のジャックポット情報を表示します")
     async def jackpot_info(self, interaction: discord.Interaction):
         """ジャックポット情報を表示"""
-        current_jackpot = self.get_jackpot()
-        last_winner_info = self.get_last_jackpot_winner()
+        jackpot = await self.get_jackpot(self.economy.scope(interaction))
+        current_jackpot = jackpot.amount
+        last_winner_info = jackpot.last_win()
         
         embed = discord.Embed(
             title='💎 ジャックポット情報',
@@ -337,8 +390,7 @@ class SlotGroup(app_commands.Group):
     @app_commands.command(name="coins", description="所持コインと統計を確認します")
     async def coins(self, interaction: discord.Interaction):
         """所持コインと統計を確認"""
-        user_id = interaction.user.id
-        user = self.get_user(user_id)
+        user = await self.get_user(self.economy.scope(interaction), interaction.user.id)
         
         total_plays = user['total_wins'] + user['total_losses']
         win_rate = (user['total_wins'] / total_plays * 100) if total_plays > 0 else 0
@@ -357,23 +409,90 @@ class SlotGroup(app_commands.Group):
         
         await interaction.response.send_message(embed=embed)
 
+    HISTORY_PERIODS = {'day': '過去24時間', 'week': '過去7日間', 'month': '過去30日間'}
+    GAME_LABELS = {'slot': '🎰 スロット', 'blackjack': '🃏 ブラックジャック'}
+
+    @staticmethod
+    def net_chart(rows, width=12):
+        """[(ラベル, 収支), ...] を棒グラフのテキストにする（diff記法で勝ちは緑・負けは赤）"""
+        scale = max((abs(net) for _, net in rows), default=0) or 1
+        lines = []
+        for label, net in rows:
+            bar = '█' * round(abs(net) / scale * width) if net else ''
+            sign = '+' if net > 0 else '-' if net < 0 else ' '
+            lines.append(f"{sign} {label} {bar:<{width}} {f'{net:+,}' if net else '0'}")
+        return '```diff\n' + '\n'.join(lines) + '\n```'
+
+    @app_commands.command(name="history", description="期間ごとの成績をグラフで表示します")
+    @app_commands.describe(period="表示する期間（デフォルト: 過去7日間）")
+    @app_commands.choices(period=[
+        app_commands.Choice(name='過去24時間', value='day'),
+        app_commands.Choice(name='過去7日間', value='week'),
+        app_commands.Choice(name='過去30日間', value='month'),
+    ])
+    async def history(self, interaction: discord.Interaction, period: str = 'week'):
+        """集計済みの成績から期間ごとの推移を表示"""
+        buckets, games = await self.db.run(
+            self.game_stats.history, self.economy.scope(interaction), interaction.user.id, period
+        )
+        
+        plays = sum(row[1] for row in buckets)
+        if plays == 0:
+            await interaction.response.send_message(
+                f'{self.HISTORY_PERIODS[period]}のプレイ記録がありません',
+                ephemeral=True
+            )
+            return
+        
+        wins = sum(row[2] for row in buckets)
+        wagered = sum(row[3] for row in buckets)
+        won = sum(row[4] for row in buckets)
+        biggest_win = max(row[5] for row in buckets)
+        
+        chart = self.net_chart([
+            (self.game_stats.label(bucket, period), bucket_won - bucket_wagered)
+            for bucket, _, _, bucket_wagered, bucket_won, _ in buckets
+        ])
+        
+        embed = discord.Embed(
+            title=f'📈 {interaction.user.name} の成績（{self.HISTORY_PERIODS[period]}）',
+            description=f'**収支の推移**\n{chart}',
+            color=discord.Color.green() if won >= wagered else discord.Color.red(),
+            timestamp=datetime.now()
+        )
+        embed.add_field(name='プレイ回数', value=f'{plays:,}', inline=True)
+        embed.add_field(name='勝率', value=f'{wins / plays * 100:.1f}%', inline=True)
+        embed.add_field(name='収支', value=f'{won - wagered:+,} コイン', inline=True)
+        embed.add_field(name='ベット合計', value=f'{wagered:,} コイン', inline=True)
+        embed.add_field(name='獲得合計', value=f'{won:,} コイン', inline=True)
+        embed.add_field(name='最大勝利額', value=f'{biggest_win:,} コイン', inline=True)
+        embed.add_field(
+            name='ゲーム別',
+            value='\n'.join(
+                f'{self.GAME_LABELS.get(game, game)}: {game_plays:,}回 / 収支 {game_won - game_wagered:+,} コイン'
+                for game, (game_plays, _, game_wagered, game_won, _) in sorted(games.items())
+            ),
+            inline=False
+        )
+        
+        await interaction.response.send_message(embed=embed)
+
     @app_commands.command(name="ranking", description="コインランキングを表示します")
     async def ranking(self, interaction: discord.Interaction):
         """コインランキングを表示"""
-        top_players = self.get_ranking(10)
+        guild_id = self.economy.scope(interaction)
+        top_players = await self.get_ranking(guild_id, 10)
         
         if not top_players:
             await interaction.response.send_message('まだプレイヤーがいません', ephemeral=True)
             return
         
+        usernames = await interaction.client.user_names.resolve(
+            guild_id, ((row[0], row[4]) for row in top_players)
+        )
+        
         ranking_text = ''
-        for i, (user_id, coins, wins, losses) in enumerate(top_players, 1):
-            try:
-                user = await interaction.client.fetch_user(int(user_id))
-                username = user.name
-            except:
-                username = 'Unknown User'
-            
+        for i, ((user_id, coins, wins, losses, _), username) in enumerate(zip(top_players, usernames), 1):
             medal = '🥇' if i == 1 else '🥈' if i == 2 else '🥉' if i == 3 else f'{i}.'
             ranking_text += f'{medal} **{username}** - {coins:,} コイン\n'
         
@@ -389,20 +508,19 @@ class SlotGroup(app_commands.Group):
     @app_commands.command(name="bankruptcy", description="破産回数ランキングを表示します")
     async def bankruptcy_ranking(self, interaction: discord.Interaction):
         """破産回数ランキングを表示"""
-        top_bankrupts = self.get_bankruptcy_ranking(10)
+        guild_id = self.economy.scope(interaction)
+        top_bankrupts = await self.get_bankruptcy_ranking(guild_id, 10)
         
         if not top_bankrupts:
             await interaction.response.send_message('まだ破産したプレイヤーがいません', ephemeral=True)
             return
         
+        usernames = await interaction.client.user_names.resolve(
+            guild_id, ((row[0], row[3]) for row in top_bankrupts)
+        )
+        
         ranking_text = ''
-        for i, (user_id, bankruptcy_count, coins) in enumerate(top_bankrupts, 1):
-            try:
-                user = await interaction.client.fetch_user(int(user_id))
-                username = user.name
-            except:
-                username = 'Unknown User'
-            
+        for i, ((user_id, bankruptcy_count, coins, _), username) in enumerate(zip(top_bankrupts, usernames), 1):
             medal = '💀' if i == 1 else '👻' if i == 2 else '☠️' if i == 3 else f'{i}.'
             ranking_text += f'{medal} **{username}** - {bankruptcy_count}回破産 (現在: {coins:,}コイン)\n'
         
@@ -415,9 +533,8 @@ class SlotGroup(app_commands.Group):
         
         await interaction.response.send_message(embed=embed)
 
-    @app_commands.command(name="help", description="スロットボットの使い方を表示します")
-    async def help_command(self, interaction: discord.Interaction):
-        """ヘルプを表示"""
+    def _build_help(self):
+        """ヘルプの埋め込み（内容は変わらないので1回だけ作る）"""
         embed = discord.Embed(
             title='🎰 スロットボット ヘルプ',
             description='スロットマシンで遊ぼう！',
@@ -438,6 +555,11 @@ class SlotGroup(app_commands.Group):
             value='所持コインと統計を確認します',
             inline=False
         )
+        embed.add_field(
+            name='/slot history [期間]',
+            value='過去24時間・7日間・30日間の成績をグラフで表示します',
+            inline=False
+        )
         embed.add_field(
             name='/slot ranking',
             value='コインランキングを表示します',
@@ -469,14 +591,21 @@ class SlotGroup(app_commands.Group):
             inline=False
         )
         embed.set_footer(text='初期コイン: 1000 | 初期ジャックポット: 10,000')
+        return embed
+
+    @app_commands.command(name="help", description="スロットボットの使い方を表示します")
+    async def help_command(self, interaction: discord.Interaction):
+        """ヘルプを表示"""
+        embed = self.embeds.get('help', self._build_help)
         
         await interaction.response.send_message(embed=embed)
 
     @app_commands.command(name="bonus", description="コインが0の時に500コインを受け取ります")
     async def bonus(self, interaction: discord.Interaction):
         """ボーナスコインを受け取る"""
+        guild_id = self.economy.scope(interaction)
         user_id = interaction.user.id
-        user = self.get_user(user_id)
+        user = await self.get_user(guild_id, user_id)
         
         if user['coins'] > 0:
             await interaction.response.send_message(
@@ -485,18 +614,16 @@ class SlotGroup(app_commands.Group):
             )
             return
         
-        # 500コインを付与し、破産回数をカウント
+        # 500コインを付与し、破産回数をカウント（付与の直前にもう一度0か確認する）
         bonus_amount = 500
-        conn = sqlite3.connect('slot_bot.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE users 
-            SET coins = ?, 
-                bankruptcy_count = bankruptcy_count + 1 
-            WHERE user_id = ?
-        ''', (bonus_amount, str(user_id)))
-        conn.commit()
-        conn.close()
+        new_coins = await self.write_queue.submit(self._grant_bonus, guild_id, user_id, bonus_amount)
+        if new_coins is None:
+            user = await self.get_user(guild_id, user_id)
+            await interaction.response.send_message(
+                f'まだコインが残っています！（現在: {user["coins"]:,} コイン）\n\nボーナスはコインが0の時のみ受け取れます。',
+                ephemeral=True
+            )
+            return
         
         new_bankruptcy_count = user['bankruptcy_count'] + 1
         
@@ -507,7 +634,7 @@ class SlotGroup(app_commands.Group):
         )
         embed.add_field(
             name='💰 現在のコイン',
-            value=f'{bonus_amount} コイン',
+            value=f'{new_coins} コイン',
             inline=True
         )
         embed.add_field(
@@ -520,11 +647,18 @@ class SlotGroup(app_commands.Group):
         await interaction.response.send_message(embed=embed)
 
 class SlotCog(commands.Cog):
+    JACKPOT_CHECKPOINT_SECONDS = 30
+
     def __init__(self, bot):
         self.bot = bot
-        self.slot_group = SlotGroup()
+        self.slot_group = SlotGroup(
+            bot.db, bot.write_queue, bot.leaderboards, bot.ledger, bot.game_stats, bot.economy
+        )
 
     async def cog_load(self):
+        await self.slot_group.init_database()
+        self.checkpoint_jackpot.start()
+        self.bot.economy.add_archive_hook(self.slot_group.archive_guild)
         # Cogがロードされる時にGroupを追加
         self.bot.tree.add_command(self.slot_group)
         logging.info(f"SlotGroup を追加しました (コマンド数: {len(self.slot_group.commands)})")
@@ -534,14 +668,34 @@ class SlotCog(commands.Cog):
     async def cog_unload(self):
         # Cogがアンロードされる時にGroupを削除
         self.bot.tree.remove_command("slot")
+        self.checkpoint_jackpot.cancel()
+        self.bot.economy.remove_archive_hook(self.slot_group.archive_guild)
+        await self.bot.write_queue.submit(self.slot_group.jackpots.checkpoint)
+        await self.bot.write_queue.flush()
         logging.info("SlotGroup を削除しました")
 
+    @tasks.loop(seconds=JACKPOT_CHECKPOINT_SECONDS)
+    async def checkpoint_jackpot(self):
+        """メモリ上のジャックポット額を定期的にDBへ書き戻す"""
+        await self.bot.write_queue.submit(self.slot_group.jackpots.checkpoint)
+
 async def setup(bot):
     await bot.add_cog(SlotCog(bot))
     logging.info("SlotCog をセットアップしました")
 
 # テスト用（後で削除）
 if __name__ == "__main__":
-    import asyncio
-    group = SlotGroup()
+    from utils.database import open_database
+    from utils.economy import Economy
+    from utils.leaderboard import Leaderboards
+    from utils.ledger import CoinLedger
+    from utils.stats_rollup import StatsRollup
+    from utils.write_queue import WriteQueue
+    db = open_database()
+    write_queue = WriteQueue(db)
+    leaderboards = Leaderboards(db.storage)
+    ledger = CoinLedger(write_queue, leaderboards)
+    group = SlotGroup(
+        db, write_queue, leaderboards, ledger, StatsRollup(), Economy(write_queue, ledger, leaderboards)
+    )
     print(f"SlotGroup commands: {[cmd.name for cmd in group.commands]}")
\ No newline at end of file
@@ -1,10 +1,22 @@
 import discord
 import os
-import yaml
 from dotenv import load_dotenv
 from discord.ext import commands
 from discord import app_commands
 import logging
+from server import HealthServer
+from utils.command_metrics import CommandMetrics, InstrumentedTree
+from utils.database import open_database
+from utils.economy import Economy
+from utils.guild_settings import GuildSettings
+from utils.leaderboard import Leaderboards
+from utils.ledger import CoinLedger
+from utils.migrations import migrate
+from utils.prometheus import LoopLagMonitor
+from utils.stats_rollup import StatsRollup
+from utils.translations import TranslationCatalog
+from utils.user_names import UserNameResolver
+from utils.write_queue import WriteQueue
 
 intents = discord.Intents.default()
 intents.members = True  # メンバー情報取得に必要
@@ -15,20 +27,43 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
-def load_translations(lang_code):
-    try:
-        with open(f'lang/{lang_code}.yml', 'r', encoding='utf-8') as f:
-            return yaml.safe_load(f)
-    except FileNotFoundError:
-        logging.error(f"エラー: 言語ファイル {lang_code}.yml が見つかりませんでした")
-        return {}  # デフォルトで空の辞書を返す
-    except yaml.YAMLError as e:
-        logging.error(f"YAMLエラー: {e}")
-        return {}
-
 class MyBot(commands.Bot):
     def __init__(self):
-        super().__init__(command_prefix="!", intents=intents)
+        # スラッシュコマンドごとの処理時間（Discord APIの時間はHTTPのトレースで測る）
+        self.command_metrics = CommandMetrics()
+        super().__init__(
+            command_prefix="!",
+            intents=intents,
+            tree_cls=InstrumentedTree,
+            http_trace=self.command_metrics.trace_config(),
+        )
+        # 全Cogで共有するデータベース（DATABASE_URL で保存先を切り替え、既定は slot_bot.db）
+        self.db = open_database()
+        # ゲーム結果はまとめてコミット（既定: 最大5ms / 64件ごと）
+        self.write_queue = WriteQueue(
+            self.db,
+            max_delay=float(os.getenv("WRITE_QUEUE_DELAY_MS", "5")) / 1000,
+            max_batch=int(os.getenv("WRITE_QUEUE_MAX_BATCH", "64")),
+        )
+        self.leaderboards = Leaderboards(self.db.storage)
+        # コインの増減は台帳経由で差分として書き込む
+        self.ledger = CoinLedger(self.write_queue, self.leaderboards)
+        # /slot history 用の時間・日単位の成績集計
+        self.game_stats = StatsRollup()
+        # 全サーバー共通（既定）またはギルドごとの経済圏（ECONOMY_MODE=guild）
+        self.economy = Economy(self.write_queue, self.ledger, self.leaderboards)
+        self.user_names = UserNameResolver(self, self.write_queue)
+        # lang/*.yml は最初の参照時に1回だけ読み込み、変更があれば読み直す
+        # （パース済みのYAMLは .cache/ のバンドルに保存してコールドスタートを短くする）
+        self.translations = TranslationCatalog('lang', bundle_path='.cache/lang.json')
+        # ギルドの言語設定はメモリに持ち、変更はまとめて保存する
+        self.guild_settings = GuildSettings(
+            'data/lang_guild_settings.yml', bundle_path='.cache/guild_settings.json'
+        )
+        # /metrics 用のイベントループの遅延
+        self.loop_lag = LoopLagMonitor()
+        # /healthz・/readyz・/metrics のHTTPサーバー（同じイベントループで動かす）
+        self.health_server = HealthServer(self, port=int(os.getenv("PORT", "8080")))
         self.initial_extensions = [
             "cogs.info",
             "cogs.guild_events",
@@ -40,6 +75,16 @@ class MyBot(commands.Bot):
         ]
 
     async def setup_hook(self):
+        self.loop_lag.start()
+        self.health_server.start()
+        self.translations.start()
+        self.guild_settings.load()
+        await self.db.connect()
+        # 全Cogのスキーマをまとめて最新にする（適用済みならバージョンを確認するだけ）
+        await self.db.transaction(migrate)
+        self.write_queue.start()
+        self.ledger.start()
+
         # 拡張機能の読み込み
         for ext in self.initial_extensions:
             try:
@@ -78,11 +123,25 @@ class MyBot(commands.Bot):
         except Exception as e:
             logging.error(f"❌ コマンドの同期に失敗しました: {e}", exc_info=True)
 
+    async def close(self):
+        # Cogのアンロードが終わってからDBを閉じる
+        await super().close()
+        await self.health_server.close()
+        await self.loop_lag.close()
+        await self.translations.close()
+        await self.guild_settings.close()
+        await self.ledger.close()
+        await self.write_queue.close()
+        await self.db.close()
+
     async def on_ready(self):
         logging.info(f"🤖 {self.user} でログインしました")
         logging.info(f"📊 {len(self.guilds)} サーバーに接続中")
         logging.info(f"🆔 Bot ID: {self.user.id}")
 
+    async def on_app_command_completion(self, interaction, command):
+        self.command_metrics.finish(interaction, command)
+
     async def on_command_error(self, ctx, error):
         """コマンドエラーハンドリング"""
         if isinstance(error, commands.CommandNotFound):
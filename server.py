@@ -1,17 +1,81 @@
-from threading import Thread
+import asyncio
+import contextlib
+import logging
+import math
 
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 import uvicorn
 
-app = FastAPI()
+from utils.prometheus import MetricsWriter, collect
 
-@app.get("/")
-async def root():
-	return {"message": "Server is Online."}
+def create_app(bot):
+	"""ヘルスチェックと /metrics のアプリ（Botと同じイベントループで動かす）"""
+	app = FastAPI()
 
-def start():
-	uvicorn.run(app, host="0.0.0.0", port=8080)
+	@app.get("/")
+	async def root():
+		return {"message": "Server is Online."}
 
-def server_thread():
-	t = Thread(target=start)
-	t.start()
\ No newline at end of file
+	@app.get("/healthz")
+	async def healthz():
+		"""生存確認（イベントループが止まっていれば応答自体が返らない）"""
+		if bot.is_closed():
+			return JSONResponse({"status": "closed"}, status_code=503)
+		return {"status": "ok", "loop_lag": bot.loop_lag.lag}
+
+	@app.get("/readyz")
+	async def readyz():
+		"""Gatewayに接続済みで、ハートビートが返ってきていれば準備完了"""
+		latency = bot.latency
+		ready = bot.is_ready() and not bot.is_closed() and math.isfinite(latency)
+		body = {
+			"ready": ready,
+			"guilds": len(bot.guilds),
+			"latency": latency if math.isfinite(latency) else None,
+		}
+		return JSONResponse(body, status_code=200 if ready else 503)
+
+	@app.get("/metrics")
+	async def metrics():
+		"""Prometheus形式のメトリクス"""
+		return PlainTextResponse(collect(bot), media_type=MetricsWriter.CONTENT_TYPE)
+
+	return app
+
+
+class _EmbeddedServer(uvicorn.Server):
+	"""Ctrl+C などのシグナルはBot側の終了処理に任せる"""
+
+	@contextlib.contextmanager
+	def capture_signals(self):
+		yield
+
+
+class HealthServer:
+	"""Botのイベントループ上で動くHTTPサーバー（setup_hook で開始し、close で止める）"""
+
+	def __init__(self, bot, host="0.0.0.0", port=8080):
+		config = uvicorn.Config(
+			create_app(bot), host=host, port=port,
+			lifespan="off", access_log=False, log_config=None,
+		)
+		self.server = _EmbeddedServer(config)
+		self._task = None
+
+	def start(self):
+		if self._task is None:
+			self._task = asyncio.create_task(self._serve(), name="health-server")
+
+	async def _serve(self):
+		try:
+			await self.server.serve()
+		except SystemExit:
+			# uvicorn はポートを開けないと sys.exit する。Botは止めずにログだけ残す
+			logging.error(f"❌ HTTPサーバーを起動できませんでした (ポート {self.server.config.port})")
+
+	async def close(self):
+		if self._task is not None:
+			self.server.should_exit = True
+			await self._task
+			self._task = None
@@ -0,0 +1,158 @@
+"""ブラックジャックのハウスエッジをシミュレーションするツール
+
+    python -m tools.blackjack_simulator --hands 20000000 --strategy basic --workers 8
+    python -m tools.blackjack_simulator --hands 200000 --strategy ev
+
+BlackjackGame をそのまま使って1ゲームずつ遊ぶので、配当（ブラックジャック2.5倍・
+勝ち2倍・引き分け返却）やディーラーのルール（17以上でスタンド）は本番と同じになる。
+プロセスごとに独立したシードの乱数を使い、複数プロセスで並列に実行する。
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cogs.blackjack import BlackjackGame
+from utils import blackjack_odds
+
+RESULTS = ('blackjack', 'win', 'push', 'lose', 'bust')
+
+
+def _upcard(game):
+    """ディーラーの表向きのカードの点数（Aは11）"""
+    return BlackjackGame.VALUES[game.dealer_hand[1] % 13]
+
+
+def basic_strategy(game):
+    """ヒット/スタンドのみのベーシックストラテジー（ダブルダウン・スプリットなし）"""
+    total, upcard = game.player_value, _upcard(game)
+    if game.player_soft_aces:
+        if total >= 19:
+            return False
+        if total == 18:
+            return upcard >= 9
+        return True
+    if total >= 17:
+        return False
+    if total >= 13:
+        return upcard >= 7
+    if total == 12:
+        return not 4 <= upcard <= 6
+    return True
+
+
+def dealer_strategy(game):
+    """ディーラーと同じく17以上になるまで引く"""
+    return game.player_value < 17
+
+
+def never_bust_strategy(game):
+    """バストする可能性があれば引かない"""
+    return game.player_value <= 11 or (game.player_soft_aces > 0 and game.player_value < 17)
+
+
+def ev_strategy(game):
+    """残りの山札から期待値を厳密に計算して選ぶ（/bj hint と同じ計算）"""
+    evs = blackjack_odds.expected_values(*game.odds_state())
+    return evs['hit'] > evs['stand']
+
+
+STRATEGIES = {
+    'basic': basic_strategy,
+    'dealer': dealer_strategy,
+    'never-bust': never_bust_strategy,
+    'ev': ev_strategy,
+}
+
+
+def play_hand(game, strategy):
+    """/bj play → /bj hit → /bj stand と同じ流れで1ゲーム遊ぶ"""
+    game.initial_deal()
+    if game.is_finished:
+        return
+    while strategy(game):
+        if game.player_hit():
+            # バスト、または21で自動スタンド
+            break
+    if not game.is_finished:
+        game.dealer_play()
+
+
+def _simulate_worker(args):
+    """1プロセス分のシミュレーション"""
+    hands, bet, strategy_name, seed = args
+    rng = random.Random(seed)
+    strategy = STRATEGIES[strategy_name]
+    counts = dict.fromkeys(RESULTS, 0)
+    net_sum = net_sq = 0
+    for _ in range(hands):
+        game = BlackjackGame(bet, rng)
+        play_hand(game, strategy)
+        net = game.calculate_winnings() - bet
+        net_sum += net
+        net_sq += net * net
+        counts[game.result] += 1
+    return hands, net_sum, net_sq, counts
+
+
+def simulate(hands, bet, strategy, workers, seed):
+    # 親の乱数から各プロセスのシードを作る（--seed を指定すれば再現できる）
+    seeder = random.Random(seed)
+    seeds = [seeder.getrandbits(128) for _ in range(workers)]
+    shares = [hands // workers + (1 if i < hands % workers else 0) for i in range(workers)]
+    jobs = [(share, bet, strategy, s) for share, s in zip(shares, seeds) if share]
+    with ProcessPoolExecutor(max_workers=len(jobs)) as pool:
+        results = list(pool.map(_simulate_worker, jobs))
+
+    total = sum(r[0] for r in results)
+    net_sum = sum(r[1] for r in results)
+    net_sq = sum(r[2] for r in results)
+    counts = dict.fromkeys(RESULTS, 0)
+    for r in results:
+        for result, count in r[3].items():
+            counts[result] += count
+
+    # ベット1単位あたりの損益の平均と標準誤差
+    mean = net_sum / total / bet
+    variance = net_sq / total / bet ** 2 - mean ** 2
+    return {
+        'hands': total,
+        'house_edge': -mean,
+        'stderr': math.sqrt(variance / total),
+        'stddev': math.sqrt(variance),
+        'frequencies': {result: count / total for result, count in counts.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hands', type=int, default=10_000_000)
+    parser.add_argument('--bet', type=int, default=100, help='2.5倍の配当は切り捨てなので小さいベットでは不利になる')
+    parser.add_argument('--strategy', choices=sorted(STRATEGIES), default='basic',
+                        help='ev は1手ごとに厳密計算するので数百ハンド/秒程度と遅い')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    result = simulate(args.hands, args.bet, args.strategy, args.workers, args.seed)
+    elapsed = time.perf_counter() - start
+
+    edge, stderr = result['house_edge'], result['stderr']
+    print(f"strategy={args.strategy}  bet={args.bet}  hands={result['hands']:,}  workers={args.workers}  "
+          f"{elapsed:.1f}s ({result['hands'] / elapsed:,.0f} hands/s)")
+    print(f"  house edge            {edge:+.4%}  (player return {1 - edge:.4%})")
+    for label, z in (('95%', 1.959964), ('99%', 2.575829)):
+        print(f"  {label} CI               [{edge - z * stderr:+.4%}, {edge + z * stderr:+.4%}]")
+    print(f"  std dev per hand      {result['stddev']:.4f} x bet")
+    for outcome, frequency in result['frequencies'].items():
+        print(f"  {outcome:<22}{frequency:.4%}")
+
+
+if __name__ == '__main__':
+    main()
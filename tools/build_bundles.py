@@ -0,0 +1,27 @@
+"""翻訳とギルド設定のバンドル（.cache/）を事前に作るツール
+
+    python -m tools.build_bundles
+
+Botは起動時に古くなったバンドルを自動で作り直すが、デプロイのビルド時に
+実行しておけばコールドスタートでYAMLをパースせずに済む。
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from main import MyBot
+
+
+def main():
+    os.chdir(ROOT)  # Botと同じ相対パスで読み書きする
+    bot = MyBot()
+    bot.translations.load()
+    bot.guild_settings.load()
+    for name, bundle in (('lang', bot.translations.bundle), ('guild settings', bot.guild_settings.bundle)):
+        print(f"{name:<16}{bundle.path}  compiled={bundle.compiled} cached={bundle.hits}")
+
+
+if __name__ == '__main__':
+    main()
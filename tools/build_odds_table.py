@@ -0,0 +1,39 @@
+"""/bj hint 用に、配り終えた直後の状態の期待値の表を作るツール
+
+    python -m tools.build_odds_table --workers 8
+
+540通りの状態を utils.blackjack_odds.expected_values で計算し、
+data/blackjack_openings.json に保存する。Botは起動時にこの表を読むだけなので、
+ルールや計算を変えた時は作り直してコミットする。
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils import blackjack_odds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--batch', type=int, default=10)
+    parser.add_argument('--output', default=os.path.join(ROOT, blackjack_odds.OPENINGS_PATH))
+    args = parser.parse_args()
+
+    states = list(blackjack_odds.opening_states())
+    batches = [states[start:start + args.batch] for start in range(0, len(states), args.batch)]
+    started = time.perf_counter()
+    with ProcessPoolExecutor(args.workers) as pool:
+        results = [evs for batch in pool.map(blackjack_odds.evaluate_many, batches) for evs in batch]
+    blackjack_odds.save_openings(args.output, dict(zip(states, results)))
+    print(f"{len(states)} states -> {os.path.relpath(args.output)} "
+          f"({os.path.getsize(args.output):,} bytes, {time.perf_counter() - started:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+"""スキーマ移行で既存のデータが失われないことを確かめるツール
+
+    python -m tools.check_migrations
+    python -m tools.check_migrations backups/slot_bot.db
+
+移行前のDB（既定はリポジトリの slot_bot.db と、移行の仕組みを入れる前の
+スキーマを再現したDB）を一時ディレクトリにコピーして migrate() を実行し、
+ユーザーの残高・戦績とジャックポットの行が変わっていないこと、
+2回目の migrate() が何もしないこと（バージョン・スキーマ・データがそのまま）を確かめる。
+元のファイルには触れない。1つでも問題があれば終了コード1で終わる。
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.migrations import LATEST_VERSION, migrate
+
+USER_COLUMNS = ('coins', 'total_wins', 'total_losses', 'biggest_win', 'bankruptcy_count')
+JACKPOT_COLUMNS = ('amount', 'last_winner', 'last_win_amount', 'last_win_date')
+
+# 移行の仕組みを入れる前のDB（起動のたびに CREATE TABLE IF NOT EXISTS とカラムの追加をしていた）
+V0_USERS = '''
+    CREATE TABLE users (
+        user_id TEXT PRIMARY KEY,
+        coins INTEGER DEFAULT 1000,
+        total_wins INTEGER DEFAULT 0,
+        total_losses INTEGER DEFAULT 0,
+        biggest_win INTEGER DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_played TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+V0_JACKPOT = '''
+    CREATE TABLE jackpot (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        amount INTEGER DEFAULT 0,
+        last_winner TEXT,
+        last_win_amount INTEGER DEFAULT 0,
+        last_win_date TIMESTAMP
+    )
+'''
+# (名前, users に後から追加されていたカラム)
+V0_VARIANTS = (
+    ('v0 (初期)', ()),
+    ('v0 (+bankruptcy_count)', ('bankruptcy_count INTEGER DEFAULT 0',)),
+    ('v0 (+bankruptcy_count, username)', ('bankruptcy_count INTEGER DEFAULT 0', 'username TEXT')),
+)
+
+
+def build_v0(path, extra_columns):
+    """v0 のDBを作り、境界値を含むユーザーと当選記録のあるジャックポットを入れる"""
+    conn = sqlite3.connect(path)
+    conn.execute(V0_USERS)
+    for column in extra_columns:
+        conn.execute(f'ALTER TABLE users ADD COLUMN {column}')
+    conn.execute(V0_JACKPOT)
+    conn.execute('''
+        INSERT INTO jackpot (id, amount, last_winner, last_win_amount, last_win_date)
+        VALUES (1, 48210, 'winner', 123456, '2025-01-02 03:04:05')
+    ''')
+    users = [
+        ('100000000000000001', 1000, 0, 0, 0),
+        ('100000000000000002', 0, 12, 40, 500),
+        ('100000000000000003', 9_876_543_210, 3_000, 2_999, 1_000_000),
+    ]
+    conn.executemany(
+        'INSERT INTO users (user_id, coins, total_wins, total_losses, biggest_win) VALUES (?, ?, ?, ?, ?)', users
+    )
+    if extra_columns:
+        conn.execute("UPDATE users SET bankruptcy_count = 7 WHERE user_id = '100000000000000002'")
+    conn.commit()
+    conn.close()
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+
+
+def snapshot(conn):
+    """全サーバー共通の経済圏のユーザーとジャックポット（どのバージョンのスキーマからでも読む）"""
+    columns = _columns(conn, 'users')
+    selected = ', '.join(c if c in columns else 'NULL' for c in USER_COLUMNS)
+    scope = " WHERE guild_id = ''" if 'guild_id' in columns else ''
+    users = {
+        row[0]: row[1:]
+        for row in conn.execute(f'SELECT user_id, {selected} FROM users{scope}')
+    }
+    if 'guild_id' in columns:
+        jackpot = conn.execute(
+            f"SELECT {', '.join(JACKPOT_COLUMNS)} FROM jackpots WHERE guild_id = ''"
+        ).fetchone()
+    else:
+        jackpot = conn.execute(f"SELECT {', '.join(JACKPOT_COLUMNS)} FROM jackpot WHERE id = 1").fetchone()
+    return users, jackpot
+
+
+def schema(conn):
+    return sorted(conn.execute('SELECT type, name, sql FROM sqlite_master').fetchall(), key=str)
+
+
+def run_migrate(path):
+    """Bot の起動時と同じく1つのトランザクションで migrate() を実行して (移行前, 移行後, 変更行数) を返す"""
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        before, after = migrate(conn)
+        changes = conn.total_changes
+        conn.execute('COMMIT')
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+    return before, after, changes
+
+
+def _same_user(before, after):
+    # v2 より前のDBには破産回数がないので、移行後は既定値の0になる
+    return before[:4] == after[:4] and (before[4] or 0) == (after[4] or 0)
+
+
+def check(name, path):
+    """path のDBを移行して問題のリストを返す（空なら成功）"""
+    problems = []
+    conn = sqlite3.connect(path)
+    users, jackpot = snapshot(conn)
+    conn.close()
+
+    version, latest, _ = run_migrate(path)
+    conn = sqlite3.connect(path)
+    migrated_users, migrated_jackpot = snapshot(conn)
+    migrated_schema = schema(conn)
+    conn.close()
+
+    if latest != LATEST_VERSION:
+        problems.append(f"移行後のバージョンが v{latest} です（期待値 v{LATEST_VERSION}）")
+    if set(users) != set(migrated_users):
+        problems.append(f"ユーザーが {len(users)} 人から {len(migrated_users)} 人になりました")
+    for user_id, row in users.items():
+        if user_id in migrated_users and not _same_user(row, migrated_users[user_id]):
+            problems.append(f"ユーザー {user_id} が変わりました: {row} → {migrated_users[user_id]}")
+    if jackpot != migrated_jackpot:
+        problems.append(f"ジャックポットが変わりました: {jackpot} → {migrated_jackpot}")
+
+    # 2回目は何もしないこと
+    again_before, again_after, changes = run_migrate(path)
+    conn = sqlite3.connect(path)
+    if (again_before, again_after) != (LATEST_VERSION, LATEST_VERSION):
+        problems.append(f"2回目の移行で v{again_before} → v{again_after} になりました")
+    if changes:
+        problems.append(f"2回目の移行で {changes} 行が変更されました")
+    if schema(conn) != migrated_schema:
+        problems.append("2回目の移行でスキーマが変わりました")
+    if snapshot(conn) != (migrated_users, migrated_jackpot):
+        problems.append("2回目の移行でデータが変わりました")
+    conn.close()
+
+    status = '✅' if not problems else '❌'
+    print(f"{status} {name}: v{version} → v{latest}  users={len(users)} jackpot={jackpot[0] if jackpot else None}")
+    for problem in problems:
+        print(f"    {problem}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('paths', nargs='*', help='確かめるDB（既定: リポジトリの slot_bot.db）')
+    parser.add_argument('--no-fixtures', dest='fixtures', action='store_false',
+                        help='v0 のスキーマを再現したDBを確かめない')
+    args = parser.parse_args()
+    paths = args.paths or [os.path.join(ROOT, 'slot_bot.db')]
+
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        for index, source in enumerate(paths):
+            if not os.path.exists(source):
+                print(f"❌ {source}: ファイルがありません")
+                failed = True
+                continue
+            # WALモードのDBでも元のファイルを変えないよう、バックアップAPIでコピーする
+            copy = os.path.join(tmp, f'copy{index}.db')
+            src = sqlite3.connect(f'file:{source}?mode=ro', uri=True)
+            dst = sqlite3.connect(copy)
+            src.backup(dst)
+            src.close()
+            dst.close()
+            failed |= bool(check(os.path.relpath(source), copy))
+        if args.fixtures:
+            for index, (name, extra_columns) in enumerate(V0_VARIANTS):
+                path = os.path.join(tmp, f'fixture{index}.db')
+                build_v0(path, extra_columns)
+                failed |= bool(check(name, path))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+"""スロットの配当率（RTP）とジャックポットの成長をシミュレーションするツール
+
+    python -m tools.slot_simulator --spins 200000000 --bet 10 --workers 8
+    python -m tools.slot_simulator --exact-only
+
+SlotGroup.SYMBOL_WEIGHTS と配当表から厳密な確率計算を行い、
+NumPyでベクトル化したモンテカルロ（複数プロセスで並列実行）の結果と突き合わせる。
+ジャックポットは「負けたスピンのベット額 × JACKPOT_CONTRIBUTION を積み立て、
+7️⃣7️⃣7️⃣ で全額獲得して BASE_AMOUNT に戻る」という本番と同じルールで扱う。
+シミュレーションには numpy が必要（pip install numpy）。
+"""
+import argparse
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cogs.slot import JackpotCounter, SlotGroup
+from utils.slot_engine import SlotEngine
+
+JACKPOT = -1  # 配当倍率の配列でジャックポットを表す値
+
+
+def paytable():
+    """(シンボルごとの確率, 出目番号 a*n*n + b*n + c ごとの配当倍率) を返す"""
+    engine = SlotEngine(SlotGroup.SYMBOLS, SlotGroup.SYMBOL_WEIGHTS, SlotGroup.payout_multiplier)
+    total = sum(SlotGroup.SYMBOL_WEIGHTS)
+    probs = [w / total for w in SlotGroup.SYMBOL_WEIGHTS]
+    n = len(engine.symbols)
+    multipliers = [0] * n ** engine.reels
+    for combo, multiplier in engine.paytable.items():
+        index = 0
+        for symbol in combo:
+            index = index * n + engine.symbols.index(symbol)
+        multipliers[index] = JACKPOT if multiplier == 'JACKPOT' else multiplier
+    return probs, multipliers
+
+
+def exact(bet):
+    """配当表から厳密に計算した統計"""
+    probs, multipliers = paytable()
+    n = len(probs)
+    p_jackpot = p_lose = p_hit = mean = second = 0.0
+    for index, multiplier in enumerate(multipliers):
+        a, b, c = index // (n * n), (index // n) % n, index % n
+        p = probs[a] * probs[b] * probs[c]
+        if multiplier == JACKPOT:
+            p_jackpot += p
+            p_hit += p
+        elif multiplier == 0:
+            p_lose += p
+        else:
+            p_hit += p
+            mean += p * multiplier
+            second += p * multiplier ** 2
+
+    contribution = int(bet * SlotGroup.JACKPOT_CONTRIBUTION)
+    # 当選までの平均スピン数は 1/p、その間の負けは平均 p_lose/p 回
+    cycle = 1 / p_jackpot
+    jackpot_at_claim = JackpotCounter.BASE_AMOUNT + contribution * p_lose / p_jackpot
+    return {
+        'rtp': mean + p_jackpot * jackpot_at_claim / bet,
+        'base_rtp': mean,
+        'base_variance': second - mean ** 2,
+        'hit_frequency': p_hit,
+        'p_jackpot': p_jackpot,
+        'cycle_length': cycle,
+        'jackpot_at_claim': jackpot_at_claim,
+    }
+
+
+def _simulate_worker(args):
+    """1プロセス分のシミュレーション（独立したジャックポットの系列）"""
+    spins, chunk, bet, seed = args
+    import numpy as np
+
+    probs, multipliers = paytable()
+    n = len(probs)
+    cumulative = np.cumsum(probs)
+    cumulative[-1] = 1.0
+    table = np.array(multipliers, dtype=np.int64)
+    rng = np.random.default_rng(seed)
+    contribution = int(bet * SlotGroup.JACKPOT_CONTRIBUTION)
+
+    base_sum = base_sq = hits = claims = claimed = cycles = 0
+    losses_since_claim = spins_since_claim = 0
+    remaining = spins
+    while remaining > 0:
+        size = min(chunk, remaining)
+        remaining -= size
+        reels = np.searchsorted(cumulative, rng.random((size, 3)), side='right')
+        multiplier = table[reels[:, 0] * n * n + reels[:, 1] * n + reels[:, 2]]
+
+        is_jackpot = multiplier == JACKPOT
+        base = np.where(is_jackpot, 0, multiplier)
+        base_sum += int(base.sum())
+        base_sq += int((base * base).sum())
+        hits += int(np.count_nonzero(multiplier))
+
+        # 負けの累積数から、各当選時点までに積み立てられた額を求める
+        lost = np.cumsum(multiplier == 0)
+        positions = np.flatnonzero(is_jackpot)
+        if len(positions):
+            at_claim = lost[positions]
+            previous = np.concatenate(([0], at_claim[:-1]))
+            grown = at_claim - previous
+            grown[0] += losses_since_claim
+            claimed += int((JackpotCounter.BASE_AMOUNT + contribution * grown).sum())
+            gaps = np.diff(np.concatenate(([-1], positions)))
+            gaps[0] += spins_since_claim
+            cycles += int(gaps.sum())
+            claims += len(positions)
+            losses_since_claim = int(lost[-1] - at_claim[-1])
+            spins_since_claim = size - 1 - int(positions[-1])
+        else:
+            losses_since_claim += int(lost[-1])
+            spins_since_claim += size
+
+    return spins, base_sum, base_sq, hits, claims, claimed, cycles
+
+
+def simulate(spins, bet, workers, chunk, seed):
+    import numpy as np
+
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    shares = [spins // workers + (1 if i < spins % workers else 0) for i in range(workers)]
+    jobs = [(share, chunk, bet, s) for share, s in zip(shares, seeds)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_simulate_worker, jobs))
+
+    total, base_sum, base_sq, hits, claims, claimed, cycles = (sum(col) for col in zip(*results))
+    base_rtp = base_sum / total
+    base_variance = base_sq / total - base_rtp ** 2
+    return {
+        'rtp': (base_sum * bet + claimed) / (total * bet),
+        'base_rtp': base_rtp,
+        'base_rtp_stderr': math.sqrt(base_variance / total),
+        'base_variance': base_variance,
+        'hit_frequency': hits / total,
+        'p_jackpot': claims / total,
+        'claims': claims,
+        'cycle_length': cycles / claims if claims else float('nan'),
+        'jackpot_at_claim': claimed / claims if claims else float('nan'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--spins', type=int, default=100_000_000)
+    parser.add_argument('--bet', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk', type=int, default=1_000_000, help='1回のベクトル演算で処理するスピン数')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--exact-only', action='store_true', help='厳密計算のみ行う')
+    args = parser.parse_args()
+
+    expected = exact(args.bet)
+    rows = [
+        ('RTP (jackpot included)', 'rtp', '{:.4%}'),
+        ('RTP (excluding jackpot)', 'base_rtp', '{:.4%}'),
+        ('payout variance (x bet^2)', 'base_variance', '{:.4f}'),
+        ('hit frequency', 'hit_frequency', '{:.4%}'),
+        ('P(jackpot)', 'p_jackpot', '{:.3e}'),
+        ('jackpot cycle (spins)', 'cycle_length', '{:,.0f}'),
+        ('jackpot at claim', 'jackpot_at_claim', '{:,.0f}'),
+    ]
+
+    print(f"bet={args.bet}  contribution={SlotGroup.JACKPOT_CONTRIBUTION:.0%} of losing bets  "
+          f"base jackpot={JackpotCounter.BASE_AMOUNT:,}")
+    if args.exact_only:
+        for label, key, fmt in rows:
+            print(f"  {label:<28}{fmt.format(expected[key]):>16}")
+        return
+
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        sys.exit("シミュレーションには numpy が必要です: pip install numpy")
+
+    start = time.perf_counter()
+    simulated = simulate(args.spins, args.bet, args.workers, args.chunk, args.seed)
+    elapsed = time.perf_counter() - start
+
+    print(f"spins={args.spins:,}  workers={args.workers}  "
+          f"{elapsed:.1f}s ({args.spins / elapsed:,.0f} spins/s)  jackpots={simulated['claims']:,}")
+    print(f"  {'':<28}{'simulated':>16}{'exact':>16}")
+    for label, key, fmt in rows:
+        print(f"  {label:<28}{fmt.format(simulated[key]):>16}{fmt.format(expected[key]):>16}")
+    z = (simulated['base_rtp'] - expected['base_rtp']) / simulated['base_rtp_stderr']
+    print(f"  base RTP z-score vs exact: {z:+.2f}")
+
+
+if __name__ == '__main__':
+    main()
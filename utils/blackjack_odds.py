@@ -0,0 +1,272 @@
+"""ブラックジャックの期待値計算
+
+残りカードの構成を「点数ごとの枚数」のタプル（A, 2〜9, 10点札 の10要素）で表し、
+プレイヤーの期待値とディーラーの結果をメモ化しながら厳密に求める。
+ルールは BlackjackGame と同じ（ディーラーはソフト17を含む17以上でスタンド、
+プレイヤーは21になったら自動スタンド、勝ちは+1・引き分け0・負け-1）。
+
+メモは問い合わせ1回ごとに作り、キーは「問い合わせ時点の構成から取り除いたカード」を
+混合基数の整数にしたものと手札の状態にする。引いた順番が違っても同じ状態を共有でき、
+キャッシュがあふれて追い出されることもない。スタンドの期待値はディーラーの結果の分布の
+重み付きの和なので、分布ではなく「プレイヤーの合計の区分（16以下・17〜21）」ごとの
+期待値を直接1つの数として再帰で求める。
+
+Botからは OddsService 経由で呼ぶ（配り終えた直後の状態は事前計算した表から答える）。
+"""
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+
+VALUES = (11, 2, 3, 4, 5, 6, 7, 8, 9, 10)  # 構成タプルの各要素の点数
+RANK_INDEX = (0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 9, 9, 9)  # ランク番号(A〜K) → 構成タプルの位置
+FULL_DECK = (4, 4, 4, 4, 4, 4, 4, 4, 4, 16)
+
+
+def composition(cards):
+    """カード（0〜51の整数）の並びを構成タプルに変換"""
+    counts = [0] * 10
+    for card in cards:
+        counts[RANK_INDEX[card % 13]] += 1
+    return tuple(counts)
+
+
+def add_value(total, soft, index):
+    """合計 total（soft: 11として数えているAがあるか）に1枚加える"""
+    value = VALUES[index]
+    total += value
+    soft_aces = soft + (value == 11)
+    while total > 21 and soft_aces:
+        total -= 10
+        soft_aces -= 1
+    return total, soft_aces > 0
+
+
+def hand_state(cards):
+    """カードの並びから (合計, ソフトか) を求める"""
+    total, soft = 0, False
+    for card in cards:
+        total, soft = add_value(total, soft, RANK_INDEX[card % 13])
+    return total, soft
+
+
+# 手札の状態 (合計, ソフトか) は 合計 * 2 + ソフト の整数で表す（バストは合計22にまとめる）
+_BUSTED = 44
+_STANDING = 34  # 17以上（ディーラーはここでスタンド）
+
+
+def _code(total, soft):
+    return _BUSTED if total > 21 else total * 2 + bool(soft)
+
+
+def _build_tables():
+    """状態ごとの1枚引いた後の状態と、ディーラーが引いた時点で決着するカードの損益"""
+    next_code = [0] * (_BUSTED * 10)
+    for code in range(_BUSTED):
+        for index in range(10):
+            total, soft = add_value(code >> 1, bool(code & 1), index)
+            next_code[code * 10 + index] = _code(total, soft)
+
+    # プレイヤーの区分 0: 16以下（ディーラーがバストした時だけ勝ち）、1〜5: 17〜21
+    def payoff(klass, dealer_code):
+        if dealer_code >= _BUSTED:
+            return 1.0
+        if klass == 0:
+            return -1.0
+        player, dealer = 16 + klass, dealer_code >> 1
+        return 1.0 if player > dealer else -1.0 if player < dealer else 0.0
+
+    draws = []     # ディーラーの状態ごとの、引いても決着しないカード (位置, 引いた後の状態)
+    settled = {}   # 区分 * 64 + ディーラーの状態: ((損益, 決着するカードの位置), ...)
+    for code in range(_STANDING):
+        draws.append(tuple(
+            (index, next_code[code * 10 + index])
+            for index in range(10) if next_code[code * 10 + index] < _STANDING
+        ))
+        for klass in range(6):
+            groups = {}
+            for index in range(10):
+                after = next_code[code * 10 + index]
+                if after >= _STANDING and payoff(klass, after):
+                    groups.setdefault(payoff(klass, after), []).append(index)
+            settled[klass * 64 + code] = tuple((value, tuple(indexes)) for value, indexes in groups.items())
+    return next_code, tuple(draws), settled
+
+
+_NEXT, _DEALER_DRAWS, _DEALER_SETTLED = _build_tables()
+
+
+def expected_values(counts, player_total, player_soft, dealer_total, dealer_soft):
+    """ヒット・スタンドそれぞれの期待値（ベット1単位あたりの損益）"""
+    counts = list(counts)
+    # 取り除いたカードは 位置ごとの枚数 * weights[位置] の和で1つの整数にする
+    weights = []
+    weight = 1
+    for count in counts:
+        weights.append(weight)
+        weight *= count + 1
+    dealer_start = _code(dealer_total, dealer_soft)
+    next_code = _NEXT
+    dealer_memo = {}
+    best_memo = {}
+
+    def dealer(removed, remaining, code, klass):
+        """区分 klass のプレイヤーがスタンドした場合の期待値（ディーラーの状態 code から）"""
+        key = (removed * 8 + klass) * 64 + code
+        cached = dealer_memo.get(key)
+        if cached is not None:
+            return cached
+        ev = 0.0
+        for value, indexes in _DEALER_SETTLED[klass * 64 + code]:
+            for index in indexes:
+                ev += value * counts[index]
+        for index, after in _DEALER_DRAWS[code]:
+            count = counts[index]
+            if count:
+                counts[index] = count - 1
+                ev += count * dealer(removed + weights[index], remaining - 1, after, klass)
+                counts[index] = count
+        ev /= remaining
+        dealer_memo[key] = ev
+        return ev
+
+    def stand(removed, remaining, total):
+        return dealer(removed, remaining, dealer_start, total - 16 if total > 16 else 0)
+
+    def best(removed, remaining, code):
+        """この手札から最善に打った場合の期待値"""
+        if code >= _BUSTED:
+            return -1.0
+        key = removed * 64 + code
+        cached = best_memo.get(key)
+        if cached is not None:
+            return cached
+        standing = stand(removed, remaining, code >> 1)
+        # 21は自動スタンド
+        ev = standing if code >> 1 == 21 else max(standing, hit(removed, remaining, code))
+        best_memo[key] = ev
+        return ev
+
+    def hit(removed, remaining, code):
+        """1枚引いた場合の期待値（その後は最善手を選ぶ）"""
+        row = code * 10
+        ev = 0.0
+        for index in range(10):
+            count = counts[index]
+            if count:
+                counts[index] = count - 1
+                ev += count * best(removed + weights[index], remaining - 1, next_code[row + index])
+                counts[index] = count
+        return ev / remaining
+
+    remaining = sum(counts)
+    return {
+        'hit': hit(0, remaining, _code(player_total, player_soft)),
+        'stand': stand(0, remaining, player_total),
+    }
+
+
+def opening_states():
+    """配り終えた直後にありうるすべての状態（540通り）
+
+    未知のカードは山札とディーラーの伏せ札で、BlackjackGame.odds_state() と同じ形。
+    ブラックジャック（配った時点で決着）は含めない。
+    """
+    for upcard in range(10):
+        for first in range(10):
+            for second in range(first, 10):
+                counts = list(FULL_DECK)
+                for index in (first, second, upcard):
+                    counts[index] -= 1
+                total, soft = add_value(*add_value(0, False, first), second)
+                if total == 21:
+                    continue
+                yield (tuple(counts), total, soft, *add_value(0, False, upcard))
+
+
+def evaluate_many(states):
+    """複数の状態の期待値をまとめて計算する（tools.build_odds_table のワーカープロセスで呼ぶ）"""
+    return [expected_values(*state) for state in states]
+
+
+OPENINGS_PATH = 'data/blackjack_openings.json'
+OPENINGS_FORMAT = 1
+
+
+def save_openings(path, table):
+    """{状態: 期待値} を JSON に保存する（python -m tools.build_odds_table で作る）"""
+    rows = [[list(state[0]), *state[1:], evs['hit'], evs['stand']] for state, evs in table.items()]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'format': OPENINGS_FORMAT, 'states': rows}, f, separators=(',', ':'))
+
+
+def load_openings(path):
+    """save_openings() のファイルを {状態: 期待値} にして返す"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get('format') != OPENINGS_FORMAT:
+        raise ValueError(f"期待値の表の形式が違います: {data.get('format')}")
+    return {
+        (tuple(counts), player_total, player_soft, dealer_total, dealer_soft): {'hit': hit, 'stand': stand}
+        for counts, player_total, player_soft, dealer_total, dealer_soft, hit, stand in data['states']
+    }
+
+
+class OddsService:
+    """/bj hint の期待値を返すサービス
+
+    計算に時間のかかる配り終えた直後の状態（540通り）は事前に計算した表
+    （data/blackjack_openings.json）から答え、それ以外はスレッドで計算して
+    ゲームをまたいで LRU にキャッシュする。ヒットした後の盤面は残りのカードが少ないので
+    1回の計算は数十ミリ秒で済み、別プロセスや起動時の先読みは要らない。
+    表がなければ配り終えた直後の状態もスレッドで計算する。
+    """
+
+    def __init__(self, openings_path=OPENINGS_PATH, cache_size=8192):
+        self.openings_path = openings_path
+        self.cache_size = cache_size
+        self._openings = {}  # 配り終えた直後の状態: 期待値（事前計算）
+        self._cache = OrderedDict()  # odds_state(): {'hit': ..., 'stand': ...}
+
+        # メトリクス
+        self.hits = 0
+        self.computed = 0
+
+    def load(self):
+        """事前計算した表を読み込む（Cog の読み込み時に呼ぶ）"""
+        try:
+            self._openings = load_openings(self.openings_path)
+        except FileNotFoundError:
+            logging.warning(f"⚠️ 期待値の表 {self.openings_path} がないので、配り終えた直後の状態も都度計算します")
+        except (ValueError, KeyError, TypeError):
+            logging.error(f"期待値の表 {self.openings_path} を読み込めませんでした", exc_info=True)
+        return len(self._openings)
+
+    def _remember(self, state, evs):
+        self._cache[state] = evs
+        self._cache.move_to_end(state)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def expected_values(self, state):
+        """odds_state() の形の状態からヒット・スタンドの期待値を返す"""
+        evs = self._openings.get(state)
+        if evs is None:
+            evs = self._cache.get(state)
+            if evs is not None:
+                self._cache.move_to_end(state)
+        if evs is not None:
+            self.hits += 1
+            return evs
+        evs = await asyncio.to_thread(expected_values, *state)
+        self.computed += 1
+        self._remember(state, evs)
+        return evs
+
+    def stats(self):
+        return {
+            'openings': len(self._openings),
+            'cached': len(self._cache),
+            'hits': self.hits,
+            'computed': self.computed,
+        }
@@ -0,0 +1,138 @@
+import contextvars
+import math
+import time
+from collections import Counter, deque
+
+import aiohttp
+from discord import app_commands
+
+from utils.prometheus import Histogram
+
+# 処理中のコマンドの計測（コマンドのタスクと、そこから await した処理から見える）
+_current = contextvars.ContextVar('command_timing', default=None)
+
+
+class CommandTiming:
+    """コマンド1回分の処理時間の内訳（秒）"""
+
+    __slots__ = ('start', 'db', 'api')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.db = 0.0   # DBスレッド・書き込みキューを待った時間
+        self.api = 0.0  # Discord API（応答・フォローアップなど）を待った時間
+
+
+def record_db(elapsed):
+    """処理中のコマンドにDBの待ち時間を加算する（コマンド外からの呼び出しは無視）"""
+    timing = _current.get()
+    if timing is not None:
+        timing.db += elapsed
+
+
+def record_api(elapsed):
+    timing = _current.get()
+    if timing is not None:
+        timing.api += elapsed
+
+
+class CommandMetrics:
+    """スラッシュコマンドごとの処理時間の記録
+
+    コマンドごとに直近 max_age 秒（最大 max_samples 件）の (合計, DB, 描画, API) を保持し、
+    /ping detail で期間ごとの p50/p95/p99 を計算する。描画は合計からDBとAPIを引いた残り
+    （Python側の処理時間）。起動からの累積は /metrics 用のヒストグラムにも数える。
+    ボタンなどコマンド以外の操作は対象外。
+    """
+
+    KINDS = ('total', 'db', 'render', 'api')
+    WINDOWS = {'1m': 60, '5m': 300, '1h': 3600}
+    PERCENTILES = (50, 95, 99)
+
+    def __init__(self, max_samples=5000, max_age=3600):
+        self.max_samples = max_samples
+        self.max_age = max_age
+        self._samples = {}  # qualified_name: deque[(monotonic, total, db, render, api)]
+        self.histograms = {}  # (qualified_name, kind): Histogram
+
+        # メトリクス
+        self.calls = Counter()
+        self.failures = Counter()
+
+    def begin(self, interaction):
+        timing = CommandTiming()
+        _current.set(timing)
+        interaction.extras['timing'] = timing
+
+    def finish(self, interaction, command, failed=False):
+        timing = interaction.extras.pop('timing', None)
+        if timing is None or command is None:
+            return
+        total = time.perf_counter() - timing.start
+        name = command.qualified_name
+        samples = self._samples.get(name)
+        if samples is None:
+            samples = self._samples[name] = deque(maxlen=self.max_samples)
+        now = time.monotonic()
+        sample = (total, timing.db, max(total - timing.db - timing.api, 0.0), timing.api)
+        samples.append((now, *sample))
+        for kind, value in zip(self.KINDS, sample):
+            histogram = self.histograms.get((name, kind))
+            if histogram is None:
+                histogram = self.histograms[(name, kind)] = Histogram()
+            histogram.observe(value)
+        while samples and samples[0][0] < now - self.max_age:
+            samples.popleft()
+        self.calls[name] += 1
+        if failed:
+            self.failures[name] += 1
+
+    @classmethod
+    def _percentile(cls, ordered, p):
+        """最近順位法のパーセンタイル"""
+        return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+    def summary(self, window='5m'):
+        """期間内のコマンドごとの {'count': 件数, kind: (p50, p95, p99)}（件数の多い順）"""
+        since = time.monotonic() - self.WINDOWS[window]
+        result = {}
+        for name, samples in self._samples.items():
+            recent = [sample for sample in samples if sample[0] >= since]
+            if not recent:
+                continue
+            stats = {'count': len(recent)}
+            for index, kind in enumerate(self.KINDS, start=1):
+                ordered = sorted(sample[index] for sample in recent)
+                stats[kind] = tuple(self._percentile(ordered, p) for p in self.PERCENTILES)
+            result[name] = stats
+        return dict(sorted(result.items(), key=lambda item: -item[1]['count']))
+
+    @staticmethod
+    def trace_config():
+        """Discord APIへのリクエストの時間を測る aiohttp のトレース設定（Botの http_trace に渡す）"""
+        async def on_request_start(session, context, params):
+            context.start = time.perf_counter()
+
+        async def on_request_end(session, context, params):
+            record_api(time.perf_counter() - context.start)
+
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(on_request_start)
+        trace.on_request_end.append(on_request_end)
+        trace.on_request_exception.append(on_request_end)
+        return trace
+
+
+class InstrumentedTree(app_commands.CommandTree):
+    """すべてのスラッシュコマンドの処理時間を client.command_metrics に記録するコマンドツリー
+
+    成功時の記録は Bot の on_app_command_completion で行う。
+    """
+
+    async def interaction_check(self, interaction):
+        self.client.command_metrics.begin(interaction)
+        return True
+
+    async def on_error(self, interaction, error):
+        self.client.command_metrics.finish(interaction, interaction.command, failed=True)
+        await super().on_error(interaction, error)
@@ -0,0 +1,164 @@
+import asyncio
+import functools
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.command_metrics import record_db
+from utils.prometheus import Histogram
+from utils.storage import MemoryStorage, SQLiteStorage
+
+DEFAULT_URL = 'sqlite:///slot_bot.db'
+
+class Database:
+    """Bot全体で共有するSQLiteサービス
+
+    接続は1本を使い回し、すべてのクエリを専用スレッドで実行することで
+    イベントループ（ゲートウェイのハートビート）をブロックしないようにする。
+    同じSQL文字列はsqlite3側のステートメントキャッシュで再利用される。
+    トランザクション内でメモリ上の状態を変える処理は on_rollback() で戻し方を登録しておくと、
+    コミットに失敗した時にDBと一緒に元に戻る。
+    ユーザー・ジャックポット・台帳・ランキングは SQL を直接書かず storage（utils.storage）経由で読み書きする。
+    """
+
+    def __init__(self, path='slot_bot.db', cached_statements=256):
+        self.path = path
+        self.cached_statements = cached_statements
+        self._conn = None
+        self.call_time = Histogram()  # 呼び出しごとの待ち時間（/metrics 用）
+        self._undo = []  # 実行中のトランザクションの (callback, args)（DBスレッドだけが触る）
+        self._in_transaction = False
+        self.storage = SQLiteStorage()
+        # SQLiteの接続はスレッドをまたいで同時に使えないので、ワーカーは1本に固定
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sqlite')
+
+    async def connect(self):
+        """データベースに接続（Bot起動時に1回だけ呼ぶ）"""
+        if self._conn is None:
+            await self._call(self._open)
+            logging.info(f"🗄️ データベースに接続しました ({self.path})")
+
+    def _open(self):
+        conn = sqlite3.connect(
+            self.path,
+            check_same_thread=False,
+            isolation_level=None,  # トランザクションは transaction() で明示的に張る
+            cached_statements=self.cached_statements,
+        )
+        self._configure(conn)
+        self._conn = conn
+
+    def _configure(self, conn):
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA busy_timeout=5000')
+
+    async def close(self):
+        """接続を閉じてワーカースレッドを停止"""
+        if self._conn is not None:
+            await self._call(self._conn.close)
+            self._conn = None
+            logging.info("🗄️ データベース接続を閉じました")
+        self._executor.shutdown(wait=True)
+
+    async def _call(self, func, *args):
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+        finally:
+            elapsed = time.perf_counter() - start
+            self.call_time.observe(elapsed)
+            # コマンドの処理時間の内訳（コマンド外の呼び出しでは何もしない）
+            record_db(elapsed)
+
+    def _transaction(self, func, *args):
+        conn = self._conn
+        conn.execute('BEGIN IMMEDIATE')
+        self._in_transaction = True
+        try:
+            result = func(conn, *args)
+            conn.execute('COMMIT')
+        except BaseException:
+            # COMMIT に失敗した場合もトランザクションは残っているので巻き戻す
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            self.undo()
+            raise
+        finally:
+            self._in_transaction = False
+            self._undo.clear()
+        return result
+
+    def on_rollback(self, callback, *args):
+        """実行中のトランザクションが巻き戻されたら callback(*args) を呼ぶ（DBスレッドで呼ぶ）
+
+        巻き戻す時は登録と逆の順番で呼ぶ。トランザクションの外（run など）では何もしない。
+        """
+        if self._in_transaction:
+            self._undo.append((callback, args))
+
+    def undo_mark(self):
+        """セーブポイントを張る時の目印（undo(mark) でそれ以降に登録した分だけを戻す）"""
+        return len(self._undo)
+
+    def undo(self, mark=0):
+        """mark 以降に登録した巻き戻し処理を新しい順に呼ぶ"""
+        while len(self._undo) > mark:
+            callback, args = self._undo.pop()
+            try:
+                callback(*args)
+            except Exception:
+                logging.error("メモリ上の状態の巻き戻しに失敗しました", exc_info=True)
+
+    async def run(self, func, *args):
+        """func(conn, *args) をDBスレッドで実行（読み取り用・自動コミット）"""
+        return await self._call(lambda: func(self._conn, *args))
+
+    async def transaction(self, func, *args):
+        """func(conn, *args) を1つのトランザクションとして実行"""
+        return await self._call(self._transaction, func, *args)
+
+
+class MemoryDatabase(Database):
+    """ディスクに書かないインメモリのストレージ（負荷試験・ベンチマーク用）
+
+    ユーザー・ジャックポット・台帳・ランキングは MemoryStorage のdictに持ち、
+    それ以外（ブラックジャックのセッション・成績の集計など）は :memory: のSQLiteに置く。
+    ゲームの処理は変えずにディスクI/Oの分だけを除いて計測できる。接続を閉じると中身は消える。
+    """
+
+    def __init__(self, cached_statements=256):
+        super().__init__(':memory:', cached_statements)
+        self.storage = MemoryStorage(self)
+
+    def _configure(self, conn):
+        conn.execute('PRAGMA journal_mode=MEMORY')
+        conn.execute('PRAGMA synchronous=OFF')
+
+
+def open_database(url=None):
+    """設定の URL からストレージを選ぶ（未指定なら環境変数 DATABASE_URL）
+
+        sqlite:///slot_bot.db        SQLiteのファイル（既定）
+        sqlite:////var/data/bot.db   絶対パスのファイル
+        memory://                    インメモリ（再起動で消える）
+
+    ゲームは db.storage（utils.storage）のメソッドに conn を渡して読み書きするので、
+    別のデータベースに移る時は同じメソッドを持つ実装を追加してここで選ぶ。
+    """
+    url = url or os.getenv('DATABASE_URL', DEFAULT_URL)
+    scheme, sep, rest = url.partition('://')
+    if not sep:
+        # スキームのない値はSQLiteのファイルパスとして扱う
+        return Database(url)
+    if scheme == 'sqlite':
+        path = rest[1:] if rest.startswith('/') else rest
+        if not path:
+            raise ValueError(f"SQLiteのファイルパスが指定されていません: {url}")
+        return Database(path)
+    if scheme == 'memory':
+        return MemoryDatabase()
+    raise ValueError(f"未対応のデータベースURLです: {url}")
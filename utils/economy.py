@@ -0,0 +1,116 @@
+import json
+import logging
+import os
+import time
+
+class Economy:
+    """コインの経済圏の切り替え
+
+    既定では全サーバー共通の経済圏（guild_id = ''）を使う。
+    ECONOMY_MODE=guild の場合はギルドごとに残高・ジャックポット・ランキングを分け、
+    DMなどギルド外での操作だけ共通の経済圏を使う。
+    ギルドから退出した時はそのギルドのデータをアーカイブに移し、再参加時に戻す。
+    """
+
+    GLOBAL = ''
+    # storage のテーブル（ユーザー・ジャックポット・台帳）に加えてアーカイブするテーブル
+    # （ブラックジャックのセッションは払い戻してから削除する）
+    ARCHIVED_TABLES = ('user_stats_daily',)
+    PURGED_TABLES = ARCHIVED_TABLES + ('user_stats_hourly',)
+
+    def __init__(self, write_queue, ledger, leaderboards, per_guild=None):
+        self.write_queue = write_queue
+        self.storage = write_queue.db.storage
+        self.ledger = ledger
+        self.leaderboards = leaderboards
+        if per_guild is None:
+            per_guild = os.getenv('ECONOMY_MODE', 'global').lower() == 'guild'
+        self.per_guild = per_guild
+        self._archive_hooks = []  # hook(conn, guild_id): アーカイブ直前にDBスレッドで呼ぶ
+        self._loop_hooks = []  # hook(guild_id): アーカイブを投入する前にイベントループで呼ぶ
+
+    def add_archive_hook(self, hook, in_loop=False):
+        """メモリ上の状態の書き戻し・破棄をアーカイブと同じトランザクションで行うためのフック
+
+        in_loop=True のフックはDBスレッドではなくイベントループで、アーカイブの投入前に呼ぶ
+        （イベントループだけが触るメモリ上の状態を破棄する場合）。
+        """
+        (self._loop_hooks if in_loop else self._archive_hooks).append(hook)
+
+    def remove_archive_hook(self, hook, in_loop=False):
+        hooks = self._loop_hooks if in_loop else self._archive_hooks
+        if hook in hooks:
+            hooks.remove(hook)
+
+    def scope(self, interaction):
+        """操作の対象になる経済圏のID"""
+        if self.per_guild and interaction.guild_id is not None:
+            return str(interaction.guild_id)
+        return self.GLOBAL
+
+    async def archive_guild(self, guild_id):
+        """ギルドのデータをアーカイブに移す（退出時）。ギルドごとの経済圏でなければ何もしない"""
+        if not self.per_guild:
+            return 0
+        for hook in self._loop_hooks:
+            hook(str(guild_id))
+        users = await self.write_queue.submit(self._archive, str(guild_id))
+        if users:
+            logging.info(f"📦 ギルド {guild_id} のデータ（{users} 人分）をアーカイブしました")
+        return users
+
+    async def restore_guild(self, guild_id):
+        """アーカイブしたギルドのデータを戻す（再参加時）"""
+        if not self.per_guild:
+            return 0
+        users = await self.write_queue.submit(self._restore, str(guild_id))
+        if users:
+            logging.info(f"📦 ギルド {guild_id} のデータ（{users} 人分）をアーカイブから復元しました")
+        return users
+
+    def _archive(self, conn, guild_id):
+        for hook in self._archive_hooks:
+            hook(conn, guild_id)
+
+        # 進行中のブラックジャックはベットを台帳経由で払い戻してから消す
+        sessions = conn.execute(
+            'SELECT user_id, bet FROM blackjack_sessions WHERE guild_id = ?', (guild_id,)
+        ).fetchall()
+        conn.execute('DELETE FROM blackjack_sessions WHERE guild_id = ?', (guild_id,))
+        for user_id, bet in sessions:
+            self.ledger.apply(conn, guild_id, user_id, bet, 'blackjack_refund')
+            self.leaderboards.user_changed(conn, guild_id, user_id)
+
+        data = self.storage.export_guild(conn, guild_id)
+        for table in self.ARCHIVED_TABLES:
+            cursor = conn.execute(f'SELECT * FROM {table} WHERE guild_id = ?', (guild_id,))
+            columns = [c[0] for c in cursor.description]
+            data[table] = {'columns': columns, 'rows': cursor.fetchall()}
+        if not any(table['rows'] for table in data.values()):
+            return 0
+
+        conn.execute('''
+            INSERT OR REPLACE INTO guild_archives (guild_id, archived_at, data)
+            VALUES (?, ?, ?)
+        ''', (guild_id, time.time(), json.dumps(data)))
+        self.storage.delete_guild(conn, guild_id)
+        for table in self.PURGED_TABLES:
+            conn.execute(f'DELETE FROM {table} WHERE guild_id = ?', (guild_id,))
+        return len(data['users']['rows'])
+
+    def _restore(self, conn, guild_id):
+        row = conn.execute('SELECT data FROM guild_archives WHERE guild_id = ?', (guild_id,)).fetchone()
+        if row is None:
+            return 0
+        data = json.loads(row[0])
+        for table, archived in data.items():
+            columns = archived['columns']
+            if table in self.storage.TABLES:
+                self.storage.import_rows(conn, table, columns, archived['rows'])
+                continue
+            conn.executemany(
+                f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                archived['rows']
+            )
+        conn.execute('DELETE FROM guild_archives WHERE guild_id = ?', (guild_id,))
+        return len(data['users']['rows'])
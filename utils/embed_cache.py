@@ -0,0 +1,30 @@
+class EmbedCache:
+    """内容が変わらない埋め込み（ヘルプ・ルールなど）のキャッシュ
+
+    key ごとに初回だけ build() で組み立て、以降は同じ discord.Embed を返す。
+    送信は to_dict() で読むだけなので共有してよいが、受け取った側で変更してはいけない。
+    額やユーザー名のような値を含む埋め込みは毎回組み立てる（discord.Embed の組み立ては
+    数マイクロ秒で、テンプレートをコピーして値を埋める方が遅かった）。
+    """
+
+    def __init__(self):
+        self._embeds = {}
+
+        # メトリクス
+        self.hits = 0
+        self.builds = 0
+
+    def __len__(self):
+        return len(self._embeds)
+
+    def get(self, key, build):
+        embed = self._embeds.get(key)
+        if embed is None:
+            embed = self._embeds[key] = build()
+            self.builds += 1
+        else:
+            self.hits += 1
+        return embed
+
+    def clear(self):
+        self._embeds.clear()
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import os
+import tempfile
+
+import yaml
+
+from utils.yaml_bundle import YamlBundle
+
+class GuildSettings:
+    """ギルドごとの言語設定（data/lang_guild_settings.yml）を共有するサービス
+
+    起動時に1回だけ読み込んでメモリ上で読み書きし、変更は flush_delay 秒まとめてから
+    一時ファイルへの書き込みと os.replace でアトミックに保存する。
+    参加・退出が続いてもファイルの書き直しは1回にまとまり、Cog同士で上書きし合うこともない。
+    bundle_path を指定すると起動時の読み込みにパース済みのJSON（YamlBundle）を使う。
+    ファイルを読み込めなかった時は読み取り専用になり、load() をやり直して成功するまで保存しない
+    （空の設定で全ギルドの設定を上書きしないため）。
+    """
+
+    def __init__(self, path='data/lang_guild_settings.yml', default_language='en', flush_delay=2.0,
+                 bundle_path=None):
+        self.path = path
+        self.bundle = YamlBundle(bundle_path)
+        self.default_language = default_language  # 参加時に設定する言語
+        self.flush_delay = flush_delay
+        self._languages = {}  # guild_id(str): lang
+        self._dirty = False
+        self._flush_task = None
+        self._lock = asyncio.Lock()
+        self.read_only = False  # 読み込みに失敗したらTrue（ファイルを上書きしない）
+
+        # メトリクス
+        self.writes = 0
+
+    def load(self):
+        """設定ファイルを読み込み、読み込めたかを返す（起動時に呼ぶ。失敗したらファイルを直して呼び直す）"""
+        if not os.path.exists(self.path):
+            self.read_only = False
+            return True
+        try:
+            loaded = self.bundle.load({'languages': self.path})
+        except (OSError, ValueError) as e:
+            logging.error(f"ギルド設定 {self.path} を読み込めませんでした: {e}")
+            loaded = {}
+        # パースエラーなら YamlBundle がログに出して結果から除く。空のファイルはNoneになる
+        data = (loaded['languages'] or {}) if 'languages' in loaded else None
+        if not isinstance(data, dict):
+            logging.error(f"❌ ギルド設定 {self.path} を読み込めなかったので、直して読み込み直すまで保存しません")
+            self.read_only = True
+            return False
+        self._languages = {str(guild_id): lang for guild_id, lang in data.items()}
+        # 読み取り専用の間の変更は読み込んだファイルの内容で置き換える
+        self._dirty = False
+        self.read_only = False
+        return True
+
+    def __contains__(self, guild_id):
+        return str(guild_id) in self._languages
+
+    def language(self, guild_id):
+        """ギルドに設定された言語（ギルド外・未設定ならNone）"""
+        if guild_id is None:
+            return None
+        return self._languages.get(str(guild_id))
+
+    def set_language(self, guild_id, lang):
+        self._languages[str(guild_id)] = lang
+        self._changed()
+
+    def add(self, guild_id):
+        """未設定のギルドに既定の言語を設定し、設定したかを返す"""
+        if guild_id in self:
+            return False
+        self.set_language(guild_id, self.default_language)
+        return True
+
+    def remove(self, guild_id):
+        """ギルドの設定を削除し、削除したかを返す"""
+        if self._languages.pop(str(guild_id), None) is None:
+            return False
+        self._changed()
+        return True
+
+    def reconcile(self, guild_ids):
+        """参加中のギルドに合わせて設定を1回でまとめて追加・削除し、(追加数, 削除数) を返す"""
+        current = {str(guild_id) for guild_id in guild_ids}
+        added = [guild_id for guild_id in current if guild_id not in self._languages]
+        removed = [guild_id for guild_id in self._languages if guild_id not in current]
+        for guild_id in added:
+            self._languages[guild_id] = self.default_language
+        for guild_id in removed:
+            del self._languages[guild_id]
+        if added or removed:
+            self._changed()
+        return len(added), len(removed)
+
+    def _changed(self):
+        self._dirty = True
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later(), name='guild-settings-flush')
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_delay)
+        self._flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        """未保存の変更があればファイルに書き込む"""
+        async with self._lock:
+            if not self._dirty:
+                return
+            if self.read_only:
+                logging.warning(f"⚠️ ギルド設定 {self.path} を読み込めていないので保存しません")
+                return
+            self._dirty = False
+            snapshot = dict(self._languages)
+            try:
+                await asyncio.to_thread(self._write, snapshot)
+                self.writes += 1
+            except Exception:
+                self._dirty = True
+                logging.error("ギルド設定の保存に失敗しました", exc_info=True)
+
+    def _write(self, data):
+        folder = os.path.dirname(self.path) or '.'
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=folder, prefix='.guild_settings-', suffix='.yml')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                yaml.dump(data, f, allow_unicode=True)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        if self.bundle.path is not None:
+            # 次のコールドスタートでYAMLをパースせずに済むよう、バンドルも更新しておく
+            self.bundle.load({'languages': self.path})
+
+    async def close(self):
+        """待機中の保存を取り消して、残っている変更をすぐに書き込む"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
@@ -0,0 +1,114 @@
+import threading
+
+class Leaderboard:
+    """上位N件のランキングをメモリ上に保持するキャッシュ
+
+    loader(conn, ギルドID, 件数) は (user_id, スコア, ...) の行をスコア降順で返すこと
+    （utils.storage の top_coins / top_bankruptcy）。
+    キャッシュ内の行はすべて cutoff 以上、キャッシュ外のユーザーはすべて
+    cutoff 以下、という不変条件を保ちながら update() で差分更新する。
+    表示に必要な件数を保証できなくなった時だけDBから読み直す。
+    """
+
+    def __init__(self, loader, guild_id='', size=50, min_score=None):
+        self.loader = loader
+        self.guild_id = guild_id
+        self.size = size
+        self.min_score = min_score  # これ未満のスコアはランキング対象外
+        self._lock = threading.Lock()
+        self._entries = {}  # user_id: row
+        self._cutoff = None  # Noneなら対象ユーザーが全員キャッシュに入っている
+        self._loaded = False
+
+    def load(self, conn):
+        """上位 size 件を読み込む（DBスレッドで呼ぶ）"""
+        rows = self.loader(conn, self.guild_id, self.size)
+        with self._lock:
+            self._entries = {row[0]: tuple(row) for row in rows}
+            self._cutoff = rows[-1][1] if len(rows) >= self.size else None
+            self._loaded = True
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded = False
+
+    def update(self, row):
+        """ユーザーの最新の行を反映する"""
+        user_id, score = row[0], row[1]
+        with self._lock:
+            if not self._loaded:
+                return
+            qualifies = self.min_score is None or score >= self.min_score
+            if user_id in self._entries:
+                if qualifies and (self._cutoff is None or score >= self._cutoff):
+                    self._entries[user_id] = tuple(row)
+                else:
+                    # キャッシュ外のユーザーに抜かれている可能性があるので外す
+                    del self._entries[user_id]
+            elif qualifies and (self._cutoff is None or score > self._cutoff):
+                self._entries[user_id] = tuple(row)
+                if len(self._entries) > self.size:
+                    lowest = min(self._entries.values(), key=lambda r: r[1])
+                    del self._entries[lowest[0]]
+                    self._cutoff = lowest[1]
+
+    def top(self, limit):
+        """上位 limit 件（最大 size 件）を返す。キャッシュだけで答えられない場合はNone"""
+        limit = min(limit, self.size)
+        with self._lock:
+            if not self._loaded:
+                return None
+            if len(self._entries) < limit and self._cutoff is not None:
+                return None
+            rows = sorted(self._entries.values(), key=lambda r: (-r[1], r[0]))
+        return rows[:limit]
+
+    async def get(self, db, limit):
+        rows = self.top(limit)
+        if rows is None:
+            await db.run(self.load)
+            rows = self.top(limit)
+        return rows
+
+
+class GuildLeaderboards:
+    """1つの経済圏（ギルドまたは全サーバー共通）のコイン・破産回数ランキング"""
+
+    def __init__(self, guild_id, storage, size=50):
+        self.coins = Leaderboard(storage.top_coins, guild_id, size)
+        self.bankruptcy = Leaderboard(storage.top_bankruptcy, guild_id, size, min_score=1)
+
+
+class Leaderboards:
+    """経済圏ごとのランキングのキャッシュ（スロットとブラックジャックで共有）"""
+
+    def __init__(self, storage, size=50):
+        self.storage = storage
+        self.size = size
+        self._guilds = {}  # guild_id: GuildLeaderboards
+        self._lock = threading.Lock()
+
+    def for_guild(self, guild_id):
+        with self._lock:
+            boards = self._guilds.get(guild_id)
+            if boards is None:
+                boards = self._guilds[guild_id] = GuildLeaderboards(guild_id, self.storage, self.size)
+            return boards
+
+    def discard(self, guild_id):
+        with self._lock:
+            self._guilds.pop(guild_id, None)
+
+    def user_changed(self, conn, guild_id, user_id):
+        """残高・破産回数が変わったユーザーをキャッシュに反映（DBスレッドで呼ぶ）"""
+        with self._lock:
+            boards = self._guilds.get(guild_id)
+        if boards is None:
+            # まだ表示されていない経済圏は、表示する時に読み込む
+            return
+        user = self.storage.get_user(conn, guild_id, user_id)
+        if user:
+            boards.coins.update(
+                (user['user_id'], user['coins'], user['total_wins'], user['total_losses'], user['username'])
+            )
+            boards.bankruptcy.update((user['user_id'], user['bankruptcy_count'], user['coins'], user['username']))
@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import time
+
+class CoinLedger:
+    """スロットとブラックジャックで共有するコインの台帳
+
+    残高は storage.add_coins() で差分として加算し、同じトランザクションで
+    台帳に (差分, 適用後の残高, 理由) を追記する。読んだ残高から計算した値で
+    上書きしないので、同じユーザーのゲームが並行して精算されても結果が失われない。
+    書き込みはすべて WriteQueue（DBスレッド1本）経由なので、ユーザーごとのロックは要らない。
+
+    ゲームの精算は record_game() で残高・戦績・ランキングをまとめて更新する（スロットとブラックジャックで共通）。
+    古い台帳の行は compact() でユーザーごとの最終残高（coin_snapshots）に畳んで削除する。
+    """
+
+    INITIAL_COINS = 1000  # 新しいユーザーの初期コイン
+
+    def __init__(self, write_queue, leaderboards, retention=7 * 24 * 3600, compact_interval=3600,
+                 compact_batch=50000):
+        self.write_queue = write_queue
+        self.storage = write_queue.db.storage
+        self.leaderboards = leaderboards
+        self.retention = retention  # これより古い台帳の行はスナップショットに畳む
+        self.compact_interval = compact_interval
+        self.compact_batch = compact_batch
+        self._task = None
+
+        # メトリクス
+        self.entries = 0
+        self.rejected = 0
+        self.compacted = 0
+
+    def apply(self, conn, guild_id, user_id, delta, reason, required=0):
+        """経済圏 guild_id の残高に delta を加算して新しい残高を返す（DBスレッドで呼ぶ）
+
+        残高が required 未満なら何もせずNoneを返す。
+        """
+        balance = self.storage.add_coins(conn, guild_id, user_id, delta, required)
+        if balance is None:
+            self.rejected += 1
+            return None
+        if delta:
+            self.storage.append_ledger(conn, guild_id, user_id, delta, balance, reason, time.time())
+            self.entries += 1
+        return balance
+
+    def get_user(self, conn, guild_id, user_id):
+        """経済圏 guild_id のユーザー（USER_FIELDS のdict）を返す。いなければ初期コインで作る（DBスレッドで呼ぶ）"""
+        user = self.storage.get_user(conn, guild_id, user_id)
+        if not user:
+            self.storage.create_user(conn, guild_id, user_id, self.INITIAL_COINS)
+            self.leaderboards.user_changed(conn, guild_id, user_id)
+            user = self.storage.get_user(conn, guild_id, user_id)
+        return user
+
+    def record_game(self, conn, guild_id, user_id, delta, reason, is_win, win_amount, username=None, required=0):
+        """残高に delta を加算して戦績を更新し、新しい残高を返す（残高が required 未満ならNone）"""
+        coins = self.apply(conn, guild_id, user_id, delta, reason, required)
+        if coins is None:
+            return None
+        self.storage.record_result(conn, guild_id, user_id, is_win, win_amount, username)
+        self.leaderboards.user_changed(conn, guild_id, user_id)
+        return coins
+
+    def compact(self, conn):
+        """retention より古い行をユーザーごとの最終残高に畳んで削除し、削除した行数を返す"""
+        # 1回のトランザクションが長くならないよう compact_batch 行ずつ処理する
+        deleted = self.storage.compact_ledger(conn, time.time() - self.retention, self.compact_batch)
+        self.compacted += deleted
+        return deleted
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._compact_loop(), name='coin-ledger-compaction')
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _compact_loop(self):
+        while True:
+            try:
+                total = 0
+                while True:
+                    deleted = await self.write_queue.submit(self.compact)
+                    total += deleted
+                    if deleted < self.compact_batch:
+                        break
+                if total:
+                    logging.info(f"📒 コイン台帳の古い行 {total} 件をスナップショットに畳みました")
+            except Exception:
+                logging.error("コイン台帳の圧縮に失敗しました", exc_info=True)
+            await asyncio.sleep(self.compact_interval)
+
+    def stats(self):
+        return {
+            'entries': self.entries,
+            'rejected': self.rejected,
+            'compacted': self.compacted,
+        }
@@ -0,0 +1,263 @@
+"""データベースのスキーマ移行
+
+スキーマのバージョンは PRAGMA user_version に保存し、起動時に1回だけ
+migrate() で未適用のステップを順番に適用する。適用済みなら user_version を
+読むだけで終わる。スキーマを変える時は MIGRATIONS の末尾にステップを追加する
+（適用済みのステップは書き換えない）。
+
+v0 は移行の仕組みを入れる前のDBで、当時は起動のたびに CREATE TABLE IF NOT EXISTS と
+カラムの有無の確認をしていたため、途中までのカラムやテーブルが既にある場合がある。
+v1〜v3 はそうしたDBにもそのまま適用できるように書いてある。
+"""
+import logging
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+
+
+def _add_column(conn, table, column, definition):
+    """カラムがなければ追加（v0 のDBに途中まで追加済みのカラムがあるため）"""
+    if column not in _columns(conn, table):
+        conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+
+def _v1_initial(conn):
+    """ユーザーとジャックポット"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            user_id TEXT PRIMARY KEY,
+            coins INTEGER DEFAULT 1000,
+            total_wins INTEGER DEFAULT 0,
+            total_losses INTEGER DEFAULT 0,
+            biggest_win INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_played TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS jackpot (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            amount INTEGER DEFAULT 0,
+            last_winner TEXT,
+            last_win_amount INTEGER DEFAULT 0,
+            last_win_date TIMESTAMP
+        )
+    ''')
+    conn.execute('INSERT OR IGNORE INTO jackpot (id, amount) VALUES (1, 10000)')
+
+
+def _v2_bankruptcy_count(conn):
+    """破産回数"""
+    _add_column(conn, 'users', 'bankruptcy_count', 'INTEGER DEFAULT 0')
+
+
+def _v3_rankings(conn):
+    """ランキング用のインデックスと、表示用に最後に確認したユーザー名"""
+    _add_column(conn, 'users', 'username', 'TEXT')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_users_coins ON users (coins)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_users_bankruptcy_count ON users (bankruptcy_count)')
+
+
+def _v4_blackjack_sessions(conn):
+    """進行中のブラックジャック（再起動後の再開用）"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS blackjack_sessions (
+            user_id TEXT PRIMARY KEY,
+            bet INTEGER NOT NULL,
+            deck BLOB NOT NULL,
+            player_hand BLOB NOT NULL,
+            dealer_hand BLOB NOT NULL,
+            expires_at REAL NOT NULL
+        )
+    ''')
+
+
+def _v5_coin_ledger(conn):
+    """コインの増減の台帳と、圧縮した台帳のスナップショット"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS coin_ledger (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            delta INTEGER NOT NULL,
+            balance INTEGER NOT NULL,
+            reason TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_coin_ledger_user ON coin_ledger (user_id, id)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS coin_snapshots (
+            user_id TEXT PRIMARY KEY,
+            balance INTEGER NOT NULL,
+            ledger_id INTEGER NOT NULL,
+            taken_at REAL NOT NULL
+        )
+    ''')
+
+
+def _v6_stats_rollups(conn):
+    """/slot history 用の時間単位・日単位の成績集計"""
+    for table in ('user_stats_hourly', 'user_stats_daily'):
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                user_id TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                game TEXT NOT NULL,
+                plays INTEGER NOT NULL DEFAULT 0,
+                wins INTEGER NOT NULL DEFAULT 0,
+                wagered INTEGER NOT NULL DEFAULT 0,
+                won INTEGER NOT NULL DEFAULT 0,
+                biggest_win INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, bucket, game)
+            )
+        ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_user_stats_hourly_bucket ON user_stats_hourly (bucket)')
+
+
+def _v7_guild_economies(conn):
+    """ギルドごとの経済圏（残高・ジャックポット・集計をギルドIDとの複合キーにする）"""
+    # 既存のデータはすべて全サーバー共通の経済圏 guild_id = '' に入れる
+    conn.execute('''
+        CREATE TABLE users_new (
+            guild_id TEXT NOT NULL DEFAULT '',
+            user_id TEXT NOT NULL,
+            coins INTEGER DEFAULT 1000,
+            total_wins INTEGER DEFAULT 0,
+            total_losses INTEGER DEFAULT 0,
+            biggest_win INTEGER DEFAULT 0,
+            bankruptcy_count INTEGER DEFAULT 0,
+            username TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_played TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (guild_id, user_id)
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO users_new (guild_id, user_id, coins, total_wins, total_losses, biggest_win,
+                               bankruptcy_count, username, created_at, last_played)
+        SELECT '', user_id, coins, total_wins, total_losses, biggest_win,
+               bankruptcy_count, username, created_at, last_played
+        FROM users
+    ''')
+    conn.execute('DROP TABLE users')
+    conn.execute('ALTER TABLE users_new RENAME TO users')
+    conn.execute('CREATE INDEX idx_users_coins ON users (guild_id, coins)')
+    conn.execute('CREATE INDEX idx_users_bankruptcy_count ON users (guild_id, bankruptcy_count)')
+
+    conn.execute('''
+        CREATE TABLE jackpots (
+            guild_id TEXT PRIMARY KEY,
+            amount INTEGER DEFAULT 0,
+            last_winner TEXT,
+            last_win_amount INTEGER DEFAULT 0,
+            last_win_date TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO jackpots (guild_id, amount, last_winner, last_win_amount, last_win_date)
+        SELECT '', amount, last_winner, last_win_amount, last_win_date FROM jackpot WHERE id = 1
+    ''')
+    conn.execute('DROP TABLE jackpot')
+
+    conn.execute('''
+        CREATE TABLE blackjack_sessions_new (
+            guild_id TEXT NOT NULL DEFAULT '',
+            user_id TEXT NOT NULL,
+            bet INTEGER NOT NULL,
+            deck BLOB NOT NULL,
+            player_hand BLOB NOT NULL,
+            dealer_hand BLOB NOT NULL,
+            expires_at REAL NOT NULL,
+            PRIMARY KEY (guild_id, user_id)
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO blackjack_sessions_new (user_id, bet, deck, player_hand, dealer_hand, expires_at)
+        SELECT user_id, bet, deck, player_hand, dealer_hand, expires_at FROM blackjack_sessions
+    ''')
+    conn.execute('DROP TABLE blackjack_sessions')
+    conn.execute('ALTER TABLE blackjack_sessions_new RENAME TO blackjack_sessions')
+
+    conn.execute("ALTER TABLE coin_ledger ADD COLUMN guild_id TEXT NOT NULL DEFAULT ''")
+    conn.execute('DROP INDEX idx_coin_ledger_user')
+    conn.execute('CREATE INDEX idx_coin_ledger_user ON coin_ledger (guild_id, user_id, id)')
+
+    conn.execute('''
+        CREATE TABLE coin_snapshots_new (
+            guild_id TEXT NOT NULL DEFAULT '',
+            user_id TEXT NOT NULL,
+            balance INTEGER NOT NULL,
+            ledger_id INTEGER NOT NULL,
+            taken_at REAL NOT NULL,
+            PRIMARY KEY (guild_id, user_id)
+        )
+    ''')
+    conn.execute('''
+        INSERT INTO coin_snapshots_new (user_id, balance, ledger_id, taken_at)
+        SELECT user_id, balance, ledger_id, taken_at FROM coin_snapshots
+    ''')
+    conn.execute('DROP TABLE coin_snapshots')
+    conn.execute('ALTER TABLE coin_snapshots_new RENAME TO coin_snapshots')
+
+    for table in ('user_stats_hourly', 'user_stats_daily'):
+        conn.execute(f'''
+            CREATE TABLE {table}_new (
+                guild_id TEXT NOT NULL DEFAULT '',
+                user_id TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                game TEXT NOT NULL,
+                plays INTEGER NOT NULL DEFAULT 0,
+                wins INTEGER NOT NULL DEFAULT 0,
+                wagered INTEGER NOT NULL DEFAULT 0,
+                won INTEGER NOT NULL DEFAULT 0,
+                biggest_win INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (guild_id, user_id, bucket, game)
+            )
+        ''')
+        conn.execute(f'''
+            INSERT INTO {table}_new (user_id, bucket, game, plays, wins, wagered, won, biggest_win)
+            SELECT user_id, bucket, game, plays, wins, wagered, won, biggest_win FROM {table}
+        ''')
+        conn.execute(f'DROP TABLE {table}')
+        conn.execute(f'ALTER TABLE {table}_new RENAME TO {table}')
+    conn.execute('CREATE INDEX idx_user_stats_hourly_bucket ON user_stats_hourly (bucket)')
+
+    # Botが退出したギルドのデータ（再参加時に復元する）
+    conn.execute('''
+        CREATE TABLE guild_archives (
+            guild_id TEXT PRIMARY KEY,
+            archived_at REAL NOT NULL,
+            data TEXT NOT NULL
+        )
+    ''')
+
+
+# 適用順。インデックス + 1 がそのステップを適用した後のバージョン
+MIGRATIONS = [
+    _v1_initial,
+    _v2_bankruptcy_count,
+    _v3_rankings,
+    _v4_blackjack_sessions,
+    _v5_coin_ledger,
+    _v6_stats_rollups,
+    _v7_guild_economies,
+]
+
+LATEST_VERSION = len(MIGRATIONS)
+
+
+def migrate(conn):
+    """未適用のステップを適用して (移行前, 移行後) のバージョンを返す（Database.transaction で呼ぶ）"""
+    current = conn.execute('PRAGMA user_version').fetchone()[0]
+    if current > LATEST_VERSION:
+        raise RuntimeError(
+            f"データベースのスキーマ (v{current}) がこのバージョンのBot (v{LATEST_VERSION}) より新しいです"
+        )
+    for version in range(current + 1, LATEST_VERSION + 1):
+        step = MIGRATIONS[version - 1]
+        step(conn)
+        # user_version もトランザクションに含まれるので、失敗すれば一緒に巻き戻る
+        conn.execute(f'PRAGMA user_version = {version}')
+        logging.info(f"🗄️ スキーマを v{version} に更新しました ({step.__doc__})")
+    return current, LATEST_VERSION
@@ -0,0 +1,177 @@
+import asyncio
+import math
+import time
+from bisect import bisect_left
+
+# 秒単位のバケット（1ms〜5s）
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram:
+    """Prometheus形式の累積ヒストグラム用のカウンタ（observe はバケットの加算1回だけ）"""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最後は +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class LoopLagMonitor:
+    """イベントループの遅延（sleep が予定よりどれだけ遅れて戻ったか）を測る"""
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.lag = 0.0
+        self.histogram = Histogram()
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name='loop-lag-monitor')
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            before = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lag = max(time.perf_counter() - before - self.interval, 0.0)
+            self.histogram.observe(self.lag)
+
+
+class MetricsWriter:
+    """テキスト形式（Prometheus exposition format 0.0.4）の組み立て"""
+
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self, prefix='noctis_'):
+        self.prefix = prefix
+        self._lines = []
+
+    @staticmethod
+    def _escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    @classmethod
+    def _labels(cls, labels):
+        if not labels:
+            return ''
+        return '{' + ','.join(f'{key}="{cls._escape(value)}"' for key, value in labels.items()) + '}'
+
+    @staticmethod
+    def _number(value):
+        if not isinstance(value, float):
+            return str(value)
+        if math.isnan(value):
+            return 'NaN'
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+        return repr(value)
+
+    def _header(self, name, kind, help_text):
+        self._lines.append(f'# HELP {self.prefix}{name} {help_text}')
+        self._lines.append(f'# TYPE {self.prefix}{name} {kind}')
+
+    def metric(self, name, kind, help_text, samples):
+        """counter / gauge。samples は [(ラベルの辞書, 値), ...] または値1つ"""
+        if not isinstance(samples, list):
+            samples = [({}, samples)]
+        self._header(name, kind, help_text)
+        for labels, value in samples:
+            self._lines.append(f'{self.prefix}{name}{self._labels(labels)} {self._number(value)}')
+
+    def histogram(self, name, help_text, series):
+        """series は [(ラベルの辞書, Histogram), ...]"""
+        self._header(name, 'histogram', help_text)
+        for labels, histogram in series:
+            cumulative = 0
+            for bound, count in zip((*histogram.buckets, math.inf), list(histogram.counts)):
+                cumulative += count
+                le = self._labels({**labels, 'le': self._number(float(bound))})
+                self._lines.append(f'{self.prefix}{name}_bucket{le} {cumulative}')
+            self._lines.append(f'{self.prefix}{name}_sum{self._labels(labels)} {self._number(histogram.sum)}')
+            self._lines.append(f'{self.prefix}{name}_count{self._labels(labels)} {histogram.count}')
+
+    def text(self):
+        return '\n'.join(self._lines) + '\n'
+
+
+def collect(bot):
+    """Botの各サービスのカウンタをテキスト形式にまとめる（Botのイベントループ上で呼ぶ）"""
+    out = MetricsWriter()
+    commands = bot.command_metrics
+    out.metric('command_calls_total', 'counter', 'Slash command invocations',
+               [({'command': name}, count) for name, count in sorted(commands.calls.items())])
+    out.metric('command_failures_total', 'counter', 'Slash commands that raised an error',
+               [({'command': name}, count) for name, count in sorted(commands.failures.items())])
+    out.histogram('command_duration_seconds', 'Slash command latency by component (total, db, render, api)',
+                  [({'command': name, 'component': kind}, histogram)
+                   for (name, kind), histogram in sorted(commands.histograms.items())])
+
+    out.histogram('db_call_duration_seconds', 'Time awaited per database call, including executor queueing',
+                  [({}, bot.db.call_time)])
+    queue = bot.write_queue.stats()
+    out.metric('write_queue_depth', 'gauge', 'Writes waiting for the next group commit', queue['depth'])
+    out.metric('write_queue_commits_total', 'counter', 'Group commits', queue['batches'])
+    out.metric('write_queue_writes_total', 'counter', 'Writes committed through the queue', queue['flushed'])
+    out.metric('write_queue_flush_seconds_max', 'gauge', 'Slowest group commit', queue['max_flush_ms'] / 1000)
+
+    ledger = bot.ledger.stats()
+    out.metric('coin_ledger_entries_total', 'counter', 'Coin ledger rows appended', ledger['entries'])
+    out.metric('coin_ledger_rejected_total', 'counter', 'Debits refused for insufficient balance', ledger['rejected'])
+    out.metric('coin_ledger_compacted_total', 'counter', 'Ledger rows folded into snapshots', ledger['compacted'])
+
+    embeds = []
+    blackjack = bot.get_cog('BlackjackCog')
+    if blackjack is not None:
+        group = blackjack.bj_group
+        sessions = group.active_games.stats()
+        out.metric('blackjack_active_sessions', 'gauge', 'Blackjack games in progress', sessions['active'])
+        out.metric('blackjack_sessions_total', 'counter', 'Blackjack sessions by outcome',
+                   [({'event': event}, sessions[event]) for event in ('started', 'expired', 'evicted', 'resumed')])
+        odds = group.odds.stats()
+        out.metric('blackjack_odds_openings', 'gauge', 'Opening states loaded from the precomputed table',
+                   odds['openings'])
+        out.metric('blackjack_odds_cached', 'gauge', 'Later states in the hint LRU cache', odds['cached'])
+        out.metric('blackjack_odds_lookups_total', 'counter',
+                   'Hint lookups answered from the table or cache (hit) or computed in a thread',
+                   [({'result': 'hit'}, odds['hits']), ({'result': 'computed'}, odds['computed'])])
+        embeds.append(('blackjack', group.embeds))
+    slot = bot.get_cog('SlotCog')
+    if slot is not None:
+        out.metric('jackpot_coins', 'gauge', 'Current jackpot per economy (guild "" is the global economy)',
+                   [({'guild': guild_id}, amount)
+                    for guild_id, amount in sorted(slot.slot_group.jackpots.amounts().items())])
+        embeds.append(('slot', slot.slot_group.embeds))
+    out.metric('embed_cache_lookups_total', 'counter', 'Static embed lookups by result',
+               [({'cog': name, 'result': result}, count)
+                for name, cache in embeds for result, count in (('hit', cache.hits), ('build', cache.builds))])
+
+    out.metric('username_fetches_total', 'counter', 'Users fetched over REST for rankings',
+               bot.user_names.rest_calls)
+    out.metric('guild_settings_writes_total', 'counter', 'Guild settings file writes', bot.guild_settings.writes)
+    out.metric('translation_reloads_total', 'counter', 'Reloads of changed lang/*.yml files',
+               bot.translations.reloads)
+
+    out.metric('guilds', 'gauge', 'Guilds the bot is in', len(bot.guilds))
+    latency = bot.latency
+    out.metric('gateway_latency_seconds', 'gauge', 'Gateway heartbeat latency',
+               latency if math.isfinite(latency) else float('nan'))
+    out.metric('event_loop_lag_last_seconds', 'gauge', 'Last measured event loop lag', bot.loop_lag.lag)
+    out.histogram('event_loop_lag_seconds', 'Event loop lag samples', [({}, bot.loop_lag.histogram)])
+    return out.text()
@@ -0,0 +1,70 @@
+import itertools
+import random
+
+class SlotEngine:
+    """重み付きリール抽選と配当表を事前計算したスロットの抽選エンジン
+
+    重みからウォーカーのエイリアス表を1回だけ作るので、1リールの抽選は
+    乱数1個と配列参照2回で済む（random.choices のように毎回累積和を作らない）。
+    配当も全出目の組み合わせについて事前に計算しておき、辞書引きで求める。
+    """
+
+    def __init__(self, symbols, weights, rule, reels=3, rng=None):
+        self.symbols = list(symbols)
+        self.weights = list(weights)
+        self.reels = reels
+        self._random = (rng or random.Random()).random
+        self.prob, self.alias = self.build_alias_table(self.weights)
+        # 出目（シンボルのタプル）: 配当倍率 または 'JACKPOT'
+        self.paytable = {
+            combo: rule(combo)
+            for combo in itertools.product(self.symbols, repeat=reels)
+        }
+
+    @staticmethod
+    def build_alias_table(weights):
+        """Voseの方法でエイリアス表 (prob, alias) を作る"""
+        n = len(weights)
+        total = sum(weights)
+        scaled = [w * n / total for w in weights]
+        prob = [1.0] * n
+        alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            prob[s] = scaled[s]
+            alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        # 残りは誤差を除けば確率1
+        return prob, alias
+
+    def draw_index(self):
+        """1リール分を抽選してシンボルの番号を返す"""
+        u = self._random() * len(self.prob)
+        i = int(u)
+        return i if u - i < self.prob[i] else self.alias[i]
+
+    def spin(self):
+        """1スピン分のシンボルのリストを返す"""
+        symbols = self.symbols
+        return [symbols[self.draw_index()] for _ in range(self.reels)]
+
+    def spin_many(self, count):
+        """count 回分のスピンをまとめて生成し、出目のタプルのリストを返す"""
+        rand = self._random
+        prob, alias, symbols = self.prob, self.alias, self.symbols
+        n = len(prob)
+        draws = []
+        append = draws.append
+        for _ in range(count * self.reels):
+            u = rand() * n
+            i = int(u)
+            append(symbols[i if u - i < prob[i] else alias[i]])
+        return list(zip(*[iter(draws)] * self.reels))
+
+    def payout(self, result):
+        """出目の配当倍率（または 'JACKPOT'）"""
+        return self.paytable[tuple(result)]
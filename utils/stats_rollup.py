@@ -0,0 +1,91 @@
+import time
+from datetime import datetime, timezone
+
+class StatsRollup:
+    """ユーザーごとのゲーム成績を時間単位・日単位で集計しておくテーブル
+
+    ゲームを精算するたびに、その時間帯と日付の行へ UPSERT で加算する。
+    履歴の表示はこの小さな集計行だけを読み、ゲームごとのログは持たない。
+    時間単位の行は hourly_retention 秒で削除し、日単位の行は残す。
+    """
+
+    HOUR = 3600
+    DAY = 86400
+    # 表示期間: (テーブル, バケットの幅, バケット数)
+    PERIODS = {
+        'day': ('user_stats_hourly', HOUR, 24),
+        'week': ('user_stats_daily', DAY, 7),
+        'month': ('user_stats_daily', DAY, 30),
+    }
+
+    def __init__(self, utc_offset=9 * 3600, hourly_retention=7 * 86400):
+        self.utc_offset = utc_offset  # 日の区切り（既定は日本時間の0時）
+        self.hourly_retention = hourly_retention
+        self._pruned_hour = None
+
+    def hour_bucket(self, ts):
+        return int(ts // self.HOUR * self.HOUR)
+
+    def day_bucket(self, ts):
+        return int((ts + self.utc_offset) // self.DAY * self.DAY - self.utc_offset)
+
+    def record(self, conn, guild_id, user_id, game, wagered, won, now=None):
+        """精算した1ゲーム分を加算する（DBスレッドで、精算と同じトランザクション内で呼ぶ）"""
+        now = time.time() if now is None else now
+        hour = self.hour_bucket(now)
+        params = (1 if won > wagered else 0, wagered, won, won)
+        for table, bucket in (('user_stats_hourly', hour), ('user_stats_daily', self.day_bucket(now))):
+            conn.execute(f'''
+                INSERT INTO {table} (guild_id, user_id, bucket, game, plays, wins, wagered, won, biggest_win)
+                VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?)
+                ON CONFLICT(guild_id, user_id, bucket, game) DO UPDATE SET
+                    plays = plays + 1,
+                    wins = wins + excluded.wins,
+                    wagered = wagered + excluded.wagered,
+                    won = won + excluded.won,
+                    biggest_win = MAX(biggest_win, excluded.biggest_win)
+            ''', (guild_id, str(user_id), bucket, game, *params))
+
+        # 時間が切り替わった最初の記録で、古い時間単位の行を削除する
+        if self._pruned_hour != hour:
+            conn.execute('DELETE FROM user_stats_hourly WHERE bucket < ?', (hour - self.hourly_retention,))
+            self._pruned_hour = hour
+
+    def history(self, conn, guild_id, user_id, period, now=None):
+        """期間内のバケットごとの集計と、ゲームごとの合計を返す
+
+        buckets: [(バケット開始時刻, plays, wins, wagered, won, biggest_win), ...]（古い順・空のバケットも含む）
+        games: {game: (plays, wins, wagered, won, biggest_win)}
+        """
+        table, width, count = self.PERIODS[period]
+        now = time.time() if now is None else now
+        last = self.hour_bucket(now) if width == self.HOUR else self.day_bucket(now)
+        first = last - width * (count - 1)
+
+        rows = conn.execute(f'''
+            SELECT bucket, SUM(plays), SUM(wins), SUM(wagered), SUM(won), MAX(biggest_win)
+            FROM {table}
+            WHERE guild_id = ? AND user_id = ? AND bucket >= ?
+            GROUP BY bucket
+        ''', (guild_id, str(user_id), first)).fetchall()
+        by_bucket = {row[0]: row[1:] for row in rows}
+        buckets = [
+            (bucket, *by_bucket.get(bucket, (0, 0, 0, 0, 0)))
+            for bucket in range(first, last + 1, width)
+        ]
+
+        games = {
+            row[0]: row[1:]
+            for row in conn.execute(f'''
+                SELECT game, SUM(plays), SUM(wins), SUM(wagered), SUM(won), MAX(biggest_win)
+                FROM {table}
+                WHERE guild_id = ? AND user_id = ? AND bucket >= ?
+                GROUP BY game
+            ''', (guild_id, str(user_id), first))
+        }
+        return buckets, games
+
+    def label(self, bucket, period):
+        """バケットの表示用ラベル（日本時間など utc_offset の時刻で表示）"""
+        local = datetime.fromtimestamp(bucket + self.utc_offset, timezone.utc)
+        return local.strftime('%H:00' if period == 'day' else '%m/%d')
@@ -0,0 +1,423 @@
+"""コイン・ジャックポット・台帳・ランキングの保存先
+
+ゲームの処理は Database.run / transaction / WriteQueue から受け取った conn を
+db.storage のメソッドに渡して読み書きし、SQLを直接書かない。
+保存先は open_database() が DATABASE_URL から選ぶ。
+
+    SQLiteStorage   SQLiteのテーブル（本番。スキーマは utils.migrations）
+    MemoryStorage   Pythonのdict（負荷試験・ベンチマーク用。conn は使わない）
+
+どちらのメソッドもDBスレッドで呼ぶ。MemoryStorage は変更のたびに
+Database.on_rollback() に戻し方を登録するので、トランザクション
+（WriteQueue のセーブポイントを含む）が巻き戻されればdictも一緒に戻る。
+ブラックジャックのセッションと成績の集計はどちらの場合もSQLiteのテーブルに置く。
+"""
+import heapq
+import time
+from collections import deque
+
+USER_FIELDS = ('user_id', 'coins', 'total_wins', 'total_losses', 'biggest_win', 'bankruptcy_count', 'username')
+
+
+def _user_dict(row):
+    user = dict(zip(USER_FIELDS, row))
+    user['bankruptcy_count'] = int(user['bankruptcy_count']) if user['bankruptcy_count'] is not None else 0
+    return user
+
+
+class SQLiteStorage:
+    """SQLiteのテーブルに保存する実装"""
+
+    # 経済圏ごとにアーカイブ・復元するテーブル（Economy が使う）
+    TABLES = ('users', 'jackpots', 'coin_ledger', 'coin_snapshots')
+
+    # ユーザー
+
+    def get_user(self, conn, guild_id, user_id):
+        """ユーザーの残高と戦績（USER_FIELDS のdict）。いなければNone"""
+        row = conn.execute('''
+            SELECT user_id, coins, total_wins, total_losses, biggest_win, bankruptcy_count, username
+            FROM users WHERE guild_id = ? AND user_id = ?
+        ''', (guild_id, str(user_id))).fetchone()
+        return _user_dict(row) if row else None
+
+    def create_user(self, conn, guild_id, user_id, coins):
+        conn.execute(
+            'INSERT INTO users (guild_id, user_id, coins) VALUES (?, ?, ?)', (guild_id, str(user_id), coins)
+        )
+
+    def add_coins(self, conn, guild_id, user_id, delta, required=0):
+        """残高に delta を加算して新しい残高を返す（残高が required 未満なら何もせずNone）"""
+        cursor = conn.execute(
+            'UPDATE users SET coins = coins + ? WHERE guild_id = ? AND user_id = ? AND coins >= ?',
+            (delta, guild_id, str(user_id), required)
+        )
+        if cursor.rowcount == 0:
+            return None
+        return conn.execute(
+            'SELECT coins FROM users WHERE guild_id = ? AND user_id = ?', (guild_id, str(user_id))
+        ).fetchone()[0]
+
+    def record_result(self, conn, guild_id, user_id, is_win, win_amount, username=None):
+        """勝敗・最大勝利額・最後に遊んだ日時を更新"""
+        conn.execute('''
+            UPDATE users
+            SET total_wins = total_wins + ?,
+                total_losses = total_losses + ?,
+                biggest_win = MAX(biggest_win, ?),
+                username = COALESCE(?, username),
+                last_played = CURRENT_TIMESTAMP
+            WHERE guild_id = ? AND user_id = ?
+        ''', (1 if is_win else 0, 0 if is_win else 1, win_amount, username, guild_id, str(user_id)))
+
+    def count_bankruptcy(self, conn, guild_id, user_id):
+        """残高が0なら破産回数を1増やしてTrue（0でなければFalse）"""
+        cursor = conn.execute('''
+            UPDATE users
+            SET bankruptcy_count = bankruptcy_count + 1
+            WHERE guild_id = ? AND user_id = ? AND coins = 0
+        ''', (guild_id, str(user_id)))
+        return cursor.rowcount > 0
+
+    def set_usernames(self, conn, guild_id, names):
+        """{user_id: 名前} を guild_id の経済圏のユーザーに保存（主キーで引く）"""
+        conn.executemany(
+            'UPDATE users SET username = ? WHERE guild_id = ? AND user_id = ?',
+            [(name, guild_id, str(user_id)) for user_id, name in names.items()]
+        )
+
+    # ジャックポット
+
+    def load_jackpot(self, conn, guild_id, base_amount):
+        """(額, 最後の当選者, 獲得額, 当選日時)。行がなければ base_amount で作る"""
+        conn.execute(
+            'INSERT OR IGNORE INTO jackpots (guild_id, amount) VALUES (?, ?)', (guild_id, base_amount)
+        )
+        return conn.execute('''
+            SELECT amount, last_winner, last_win_amount, last_win_date
+            FROM jackpots WHERE guild_id = ?
+        ''', (guild_id,)).fetchone()
+
+    def save_jackpot(self, conn, guild_id, amount):
+        conn.execute('UPDATE jackpots SET amount = ? WHERE guild_id = ?', (amount, guild_id))
+
+    def record_jackpot_win(self, conn, guild_id, amount, winner, win_amount, win_date):
+        """当選を記録して額を amount に戻す"""
+        conn.execute('''
+            UPDATE jackpots
+            SET amount = ?,
+                last_winner = ?,
+                last_win_amount = ?,
+                last_win_date = ?
+            WHERE guild_id = ?
+        ''', (amount, winner, win_amount, win_date, guild_id))
+
+    # 台帳
+
+    def append_ledger(self, conn, guild_id, user_id, delta, balance, reason, created_at):
+        conn.execute('''
+            INSERT INTO coin_ledger (guild_id, user_id, delta, balance, reason, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (guild_id, str(user_id), delta, balance, reason, created_at))
+
+    def compact_ledger(self, conn, before, batch):
+        """before より古い行を最大 batch 行、ユーザーごとの最終残高に畳んで削除し、削除した行数を返す"""
+        # id は created_at の順に増えるので、主キーの順に先頭から読んで before に達したら止める
+        # （created_at で絞り込むと表全体を読むことになり、その間ゲームのコミットが待たされる）。
+        # 読みながらユーザーごとの最後の行を覚えておき、スナップショットにする
+        cursor = conn.execute('''
+            SELECT id, guild_id, user_id, balance, created_at FROM coin_ledger ORDER BY id LIMIT ?
+        ''', (batch,))
+        upto = None
+        latest = {}  # (guild_id, user_id): (balance, id)
+        for ledger_id, guild_id, user_id, balance, created_at in cursor:
+            if created_at >= before:
+                break
+            upto = ledger_id
+            latest[(guild_id, user_id)] = (balance, ledger_id)
+        cursor.close()
+        if upto is None:
+            return 0
+        taken_at = time.time()
+        conn.executemany('''
+            INSERT INTO coin_snapshots (guild_id, user_id, balance, ledger_id, taken_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(guild_id, user_id) DO UPDATE SET
+                balance = excluded.balance,
+                ledger_id = excluded.ledger_id,
+                taken_at = excluded.taken_at
+        ''', [(*key, balance, ledger_id, taken_at) for key, (balance, ledger_id) in latest.items()])
+        return conn.execute('DELETE FROM coin_ledger WHERE id <= ?', (upto,)).rowcount
+
+    # ランキング
+
+    def top_coins(self, conn, guild_id, limit):
+        """(user_id, コイン, 勝利数, 敗北数, 名前) をコインの多い順に limit 件"""
+        return conn.execute('''
+            SELECT user_id, coins, total_wins, total_losses, username
+            FROM users
+            WHERE guild_id = ?
+            ORDER BY coins DESC
+            LIMIT ?
+        ''', (guild_id, limit)).fetchall()
+
+    def top_bankruptcy(self, conn, guild_id, limit):
+        """(user_id, 破産回数, コイン, 名前) を破産回数の多い順に limit 件（0回のユーザーは除く）"""
+        return conn.execute('''
+            SELECT user_id, bankruptcy_count, coins, username
+            FROM users
+            WHERE guild_id = ? AND bankruptcy_count > 0
+            ORDER BY bankruptcy_count DESC
+            LIMIT ?
+        ''', (guild_id, limit)).fetchall()
+
+    # アーカイブ
+
+    def export_guild(self, conn, guild_id):
+        """経済圏の行を {テーブル: {'columns': [...], 'rows': [...]}} で返す"""
+        data = {}
+        for table in self.TABLES:
+            cursor = conn.execute(f'SELECT * FROM {table} WHERE guild_id = ?', (guild_id,))
+            data[table] = {'columns': [c[0] for c in cursor.description], 'rows': cursor.fetchall()}
+        return data
+
+    def import_rows(self, conn, table, columns, rows):
+        """export_guild() の行を戻す（既にある行はそのまま）"""
+        conn.executemany(
+            f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            rows
+        )
+
+    def delete_guild(self, conn, guild_id):
+        for table in self.TABLES:
+            conn.execute(f'DELETE FROM {table} WHERE guild_id = ?', (guild_id,))
+
+
+class MemoryStorage:
+    """Pythonのdictに保存する実装（プロセスを終了すると消える）
+
+    db を渡すと変更の戻し方を db.on_rollback() に登録する。
+    """
+
+    TABLES = SQLiteStorage.TABLES
+    USER_COLUMNS = (
+        'guild_id', 'user_id', 'coins', 'total_wins', 'total_losses', 'biggest_win',
+        'bankruptcy_count', 'username', 'created_at', 'last_played',
+    )
+    JACKPOT_COLUMNS = ('guild_id', 'amount', 'last_winner', 'last_win_amount', 'last_win_date')
+    LEDGER_COLUMNS = ('id', 'guild_id', 'user_id', 'delta', 'balance', 'reason', 'created_at')
+    SNAPSHOT_COLUMNS = ('guild_id', 'user_id', 'balance', 'ledger_id', 'taken_at')
+
+    def __init__(self, db=None):
+        self.db = db
+        self._users = {}  # guild_id: {user_id: USER_COLUMNS のdict}
+        self._jackpots = {}  # guild_id: JACKPOT_COLUMNS のdict
+        self._ledger = deque()  # LEDGER_COLUMNS のタプル（id順）
+        self._snapshots = {}  # (guild_id, user_id): SNAPSHOT_COLUMNS のタプル
+        self._next_id = 1
+
+    def _on_rollback(self, callback, *args):
+        if self.db is not None:
+            self.db.on_rollback(callback, *args)
+
+    def _replace(self, name, value):
+        """属性ごと入れ替える（巻き戻す時は元のオブジェクトに戻す）"""
+        self._on_rollback(setattr, self, name, getattr(self, name))
+        setattr(self, name, value)
+
+    @staticmethod
+    def _now():
+        # SQLiteの CURRENT_TIMESTAMP と同じ形式（UTC）
+        return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
+
+    # ユーザー
+
+    def _user(self, guild_id, user_id):
+        """変更するユーザーのdict（変更前の値を巻き戻し用に覚えておく）。いなければNone"""
+        users = self._users.get(guild_id)
+        user = users.get(str(user_id)) if users else None
+        if user is not None:
+            self._on_rollback(users.__setitem__, str(user_id), dict(user))
+        return user
+
+    def get_user(self, conn, guild_id, user_id):
+        user = self._users.get(guild_id, {}).get(str(user_id))
+        return _user_dict([user[field] for field in USER_FIELDS]) if user else None
+
+    def create_user(self, conn, guild_id, user_id, coins):
+        users = self._users.get(guild_id)
+        if users is None:
+            users = self._users[guild_id] = {}
+            self._on_rollback(self._users.pop, guild_id, None)
+        now = self._now()
+        users[str(user_id)] = {
+            'guild_id': guild_id, 'user_id': str(user_id), 'coins': coins,
+            'total_wins': 0, 'total_losses': 0, 'biggest_win': 0, 'bankruptcy_count': 0,
+            'username': None, 'created_at': now, 'last_played': now,
+        }
+        self._on_rollback(users.pop, str(user_id), None)
+
+    def add_coins(self, conn, guild_id, user_id, delta, required=0):
+        user = self._users.get(guild_id, {}).get(str(user_id))
+        if user is None or user['coins'] < required:
+            return None
+        user = self._user(guild_id, user_id)
+        user['coins'] += delta
+        return user['coins']
+
+    def record_result(self, conn, guild_id, user_id, is_win, win_amount, username=None):
+        user = self._user(guild_id, user_id)
+        if user is None:
+            return
+        if is_win:
+            user['total_wins'] += 1
+        else:
+            user['total_losses'] += 1
+        user['biggest_win'] = max(user['biggest_win'], win_amount)
+        if username is not None:
+            user['username'] = username
+        user['last_played'] = self._now()
+
+    def count_bankruptcy(self, conn, guild_id, user_id):
+        user = self._users.get(guild_id, {}).get(str(user_id))
+        if user is None or user['coins'] != 0:
+            return False
+        self._user(guild_id, user_id)['bankruptcy_count'] += 1
+        return True
+
+    def set_usernames(self, conn, guild_id, names):
+        users = self._users.get(guild_id, {})
+        for user_id, name in names.items():
+            if str(user_id) in users:
+                self._user(guild_id, user_id)['username'] = name
+
+    # ジャックポット
+
+    def load_jackpot(self, conn, guild_id, base_amount):
+        jackpot = self._jackpots.get(guild_id)
+        if jackpot is None:
+            jackpot = self._jackpots[guild_id] = {
+                'guild_id': guild_id, 'amount': base_amount,
+                'last_winner': None, 'last_win_amount': 0, 'last_win_date': None,
+            }
+            self._on_rollback(self._jackpots.pop, guild_id, None)
+        return jackpot['amount'], jackpot['last_winner'], jackpot['last_win_amount'], jackpot['last_win_date']
+
+    def _update_jackpot(self, guild_id, **values):
+        jackpot = self._jackpots.get(guild_id)
+        if jackpot is not None:
+            self._on_rollback(self._jackpots.__setitem__, guild_id, dict(jackpot))
+            jackpot.update(values)
+
+    def save_jackpot(self, conn, guild_id, amount):
+        self._update_jackpot(guild_id, amount=amount)
+
+    def record_jackpot_win(self, conn, guild_id, amount, winner, win_amount, win_date):
+        self._update_jackpot(
+            guild_id, amount=amount, last_winner=winner, last_win_amount=win_amount, last_win_date=win_date
+        )
+
+    # 台帳
+
+    def append_ledger(self, conn, guild_id, user_id, delta, balance, reason, created_at):
+        row = (self._next_id, guild_id, str(user_id), delta, balance, reason, created_at)
+        self._next_id += 1
+        self._ledger.append(row)
+        self._on_rollback(self._ledger.pop)
+
+    def compact_ledger(self, conn, before, batch):
+        removed = []
+        while self._ledger and len(removed) < batch and self._ledger[0][6] < before:
+            removed.append(self._ledger.popleft())
+        if not removed:
+            return 0
+        taken_at = time.time()
+        latest = {(row[1], row[2]): row for row in removed}
+        previous = {key: self._snapshots.get(key) for key in latest}
+        for key, row in latest.items():
+            self._snapshots[key] = (row[1], row[2], row[4], row[0], taken_at)
+        self._on_rollback(self._uncompact, removed, previous)
+        return len(removed)
+
+    def _uncompact(self, removed, previous):
+        for key, snapshot in previous.items():
+            if snapshot is None:
+                self._snapshots.pop(key, None)
+            else:
+                self._snapshots[key] = snapshot
+        self._ledger.extendleft(reversed(removed))
+
+    # ランキング
+
+    def top_coins(self, conn, guild_id, limit):
+        users = self._users.get(guild_id, {}).values()
+        return [
+            (user['user_id'], user['coins'], user['total_wins'], user['total_losses'], user['username'])
+            for user in heapq.nlargest(limit, users, key=lambda user: user['coins'])
+        ]
+
+    def top_bankruptcy(self, conn, guild_id, limit):
+        users = [user for user in self._users.get(guild_id, {}).values() if user['bankruptcy_count'] > 0]
+        return [
+            (user['user_id'], user['bankruptcy_count'], user['coins'], user['username'])
+            for user in heapq.nlargest(limit, users, key=lambda user: user['bankruptcy_count'])
+        ]
+
+    # アーカイブ
+
+    def export_guild(self, conn, guild_id):
+        def table(columns, rows):
+            return {'columns': list(columns), 'rows': [list(row) for row in rows]}
+
+        users = self._users.get(guild_id, {}).values()
+        jackpot = self._jackpots.get(guild_id)
+        return {
+            'users': table(self.USER_COLUMNS, ([user[c] for c in self.USER_COLUMNS] for user in users)),
+            'jackpots': table(self.JACKPOT_COLUMNS, [[jackpot[c] for c in self.JACKPOT_COLUMNS]] if jackpot else []),
+            'coin_ledger': table(self.LEDGER_COLUMNS, (row for row in self._ledger if row[1] == guild_id)),
+            'coin_snapshots': table(
+                self.SNAPSHOT_COLUMNS, (row for key, row in self._snapshots.items() if key[0] == guild_id)
+            ),
+        }
+
+    def import_rows(self, conn, table, columns, rows):
+        rows = [dict(zip(columns, row)) for row in rows]
+        if table == 'users':
+            users = {guild_id: dict(guild_users) for guild_id, guild_users in self._users.items()}
+            now = self._now()
+            for row in rows:
+                user = {
+                    'coins': 1000, 'total_wins': 0, 'total_losses': 0, 'biggest_win': 0,
+                    'bankruptcy_count': 0, 'username': None, 'created_at': now, 'last_played': now,
+                }
+                user.update((c, row[c]) for c in self.USER_COLUMNS if c in row)
+                users.setdefault(user['guild_id'], {}).setdefault(str(user['user_id']), user)
+            self._replace('_users', users)
+        elif table == 'jackpots':
+            jackpots = dict(self._jackpots)
+            for row in rows:
+                jackpots.setdefault(row['guild_id'], {c: row.get(c) for c in self.JACKPOT_COLUMNS})
+            self._replace('_jackpots', jackpots)
+        elif table == 'coin_ledger':
+            ids = {row[0] for row in self._ledger}
+            merged = sorted(
+                list(self._ledger)
+                + [tuple(row[c] for c in self.LEDGER_COLUMNS) for row in rows if row['id'] not in ids]
+            )
+            self._replace('_ledger', deque(merged))
+            self._replace('_next_id', max(self._next_id, merged[-1][0] + 1 if merged else 1))
+        elif table == 'coin_snapshots':
+            snapshots = dict(self._snapshots)
+            for row in rows:
+                snapshots.setdefault(
+                    (row['guild_id'], row['user_id']), tuple(row[c] for c in self.SNAPSHOT_COLUMNS)
+                )
+            self._replace('_snapshots', snapshots)
+        else:
+            raise ValueError(f"MemoryStorage にないテーブルです: {table}")
+
+    def delete_guild(self, conn, guild_id):
+        self._replace('_users', {g: users for g, users in self._users.items() if g != guild_id})
+        self._replace('_jackpots', {g: jackpot for g, jackpot in self._jackpots.items() if g != guild_id})
+        self._replace('_ledger', deque(row for row in self._ledger if row[1] != guild_id))
+        self._replace('_snapshots', {key: row for key, row in self._snapshots.items() if key[0] != guild_id})
@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import os
+from types import MappingProxyType
+
+from utils.yaml_bundle import YamlBundle
+
+class Translation:
+    """フォールバックの順番が決まった翻訳の参照（コマンド1回分）"""
+
+    def __init__(self, tables):
+        self._tables = tables  # 優先順の言語ごとの表
+
+    def get(self, key, default=None):
+        for table in self._tables:
+            value = table.get(key)
+            if value is not None:
+                return value
+        return default
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+
+class TranslationCatalog:
+    """Bot全体で共有する翻訳カタログ
+
+    最初に参照された時に lang/*.yml を1回だけ読み込み、"info.server_title" のようなドット区切りの
+    キーに平坦化した読み取り専用の表にしておく。コマンドは表を引くだけでファイルは読まない。
+    言語は ギルドの言語 → ユーザーのロケール → en の順に探す。
+    ファイルが更新されたら reload_interval 秒ごとの確認で読み直し、表ごと差し替える。
+    bundle_path を指定するとパース済みのJSON（YamlBundle）を使い、YAMLのパースを省く。
+    """
+
+    DEFAULT = 'en'
+
+    def __init__(self, folder='lang', reload_interval=5.0, bundle_path=None):
+        self.folder = folder
+        self.reload_interval = reload_interval
+        self.bundle = YamlBundle(bundle_path) if bundle_path else None
+        self._tables = None  # lang: {key: 文字列}（未読み込みならNone）
+        self._mtimes = {}
+        self._task = None
+
+        # メトリクス
+        self.reloads = 0
+
+    @property
+    def tables(self):
+        if self._tables is None:
+            self.load()
+        return self._tables
+
+    @property
+    def languages(self):
+        return tuple(self.tables)
+
+    @staticmethod
+    def _flatten(data, prefix=''):
+        flat = {}
+        for key, value in (data or {}).items():
+            if isinstance(value, dict):
+                flat.update(TranslationCatalog._flatten(value, f"{prefix}{key}."))
+            else:
+                flat[f"{prefix}{key}"] = value
+        return flat
+
+    def _scan(self):
+        """言語ファイルごとの更新時刻"""
+        mtimes = {}
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if entry.name.endswith('.yml') and entry.is_file():
+                    mtimes[entry.name[:-4]] = entry.stat().st_mtime_ns
+        return mtimes
+
+    def load(self):
+        """すべての言語ファイルを読み込んで表を差し替える"""
+        mtimes = self._scan()
+        sources = {lang: os.path.join(self.folder, f"{lang}.yml") for lang in sorted(mtimes)}
+        data = (self.bundle or YamlBundle(None)).load(sources)
+        previous = self._tables or {}
+        tables = {}
+        for lang in sources:
+            if lang in data:
+                tables[lang] = MappingProxyType(self._flatten(data[lang]))
+            elif lang in previous:
+                # 壊れたファイルは読み込み済みの表を使い続ける
+                tables[lang] = previous[lang]
+        self._tables = MappingProxyType(tables)
+        self._mtimes = mtimes
+        logging.info(f"🌐 翻訳を読み込みました ({', '.join(tables)})")
+
+    def reload_if_changed(self):
+        """言語ファイルが追加・更新・削除されていれば読み直す（未読み込みなら何もしない）"""
+        if self._tables is None or self._scan() == self._mtimes:
+            return False
+        self.load()
+        self.reloads += 1
+        return True
+
+    @staticmethod
+    def normalize(locale):
+        """discord.Locale や 'en-US' を言語ファイルの名前 ('en') にする"""
+        if locale is None:
+            return None
+        return str(getattr(locale, 'value', locale)).split('-')[0].lower() or None
+
+    def chain(self, *langs):
+        """優先順に並べた言語（重複と未対応の言語を除き、最後に en）"""
+        chain = []
+        tables = self.tables
+        for lang in (*map(self.normalize, langs), self.DEFAULT):
+            if lang in tables and lang not in chain:
+                chain.append(lang)
+        return tuple(chain)
+
+    def translation(self, *langs):
+        """langs の順に探し、最後に en を探す Translation を返す"""
+        tables = self.tables
+        return Translation([tables[lang] for lang in self.chain(*langs)])
+
+    def get(self, key, *langs, default=None):
+        return self.translation(*langs).get(key, default)
+
+    def start(self):
+        if self._task is None and self.reload_interval:
+            self._task = asyncio.create_task(self._reload_loop(), name='translation-reload')
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _reload_loop(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                if await asyncio.to_thread(self.reload_if_changed):
+                    logging.info("🌐 言語ファイルの変更を検知して翻訳を読み直しました")
+            except Exception:
+                logging.error("翻訳の再読み込みに失敗しました", exc_info=True)
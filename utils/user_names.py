@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+import discord
+
+class UserNameResolver:
+    """ランキング表示用のユーザー名解決
+
+    ゲートウェイのキャッシュ → LRU/TTLキャッシュ → ユーザーごとに保存された
+    最後の名前 の順に探し、それでも見つからないユーザーだけを
+    同時実行数を制限しつつ並行して fetch_user する。
+    """
+
+    UNKNOWN = 'Unknown User'
+
+    def __init__(self, bot, write_queue, maxsize=1024, ttl=3600, concurrency=4):
+        self.bot = bot
+        self.write_queue = write_queue
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._cache = OrderedDict()  # user_id: (name, expires_at)
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._store_tasks = set()
+
+        # メトリクス
+        self.rest_calls = 0
+
+    def _cache_get(self, user_id):
+        entry = self._cache.get(user_id)
+        if entry is None:
+            return None
+        name, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._cache[user_id]
+            return None
+        self._cache.move_to_end(user_id)
+        return name
+
+    def _cache_put(self, user_id, name):
+        self._cache[user_id] = (name, time.monotonic() + self.ttl)
+        self._cache.move_to_end(user_id)
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+    async def _fetch(self, user_id):
+        async with self._semaphore:
+            self.rest_calls += 1
+            try:
+                user = await self.bot.fetch_user(user_id)
+            except discord.NotFound:
+                # 削除されたアカウントは次回も見つからないのでキャッシュする
+                return self.UNKNOWN
+            except discord.HTTPException as e:
+                logging.warning(f"ユーザー {user_id} の取得に失敗しました (status={e.status}): {e}")
+                return None
+            return user.name
+
+    async def resolve(self, guild_id, users):
+        """guild_id の経済圏の [(user_id, 保存済みの名前), ...] を受け取り、同じ順序で名前のリストを返す"""
+        users = [(int(user_id), stored) for user_id, stored in users]
+        names = {}
+        changed = {}
+        missing = []
+
+        for user_id, stored in users:
+            user = self.bot.get_user(user_id)
+            cached = self._cache_get(user_id)
+            name = user.name if user else (cached or stored)
+            if name is None:
+                missing.append(user_id)
+                continue
+            names[user_id] = name
+            self._cache_put(user_id, name)
+            # 名前が変わっていたら保存し直す（キャッシュ済みなら保存済み）
+            if name != stored and name != cached:
+                changed[user_id] = name
+
+        if missing:
+            fetched = await asyncio.gather(*(self._fetch(user_id) for user_id in missing))
+            for user_id, name in zip(missing, fetched):
+                if name is None:
+                    continue
+                names[user_id] = name
+                self._cache_put(user_id, name)
+                if name != self.UNKNOWN:
+                    changed[user_id] = name
+
+        if changed:
+            # 保存は返信を待たせずに裏で行う
+            task = asyncio.ensure_future(self.write_queue.submit(self._store_names, guild_id, changed))
+            self._store_tasks.add(task)
+            task.add_done_callback(self._stored)
+
+        return [names.get(user_id, self.UNKNOWN) for user_id, _ in users]
+
+    def _store_names(self, conn, guild_id, names):
+        self.write_queue.db.storage.set_usernames(conn, guild_id, names)
+
+    def _stored(self, task):
+        self._store_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logging.error("ユーザー名の保存に失敗しました", exc_info=task.exception())
@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import time
+
+from utils.command_metrics import record_db
+
+class WriteQueue:
+    """ゲーム結果の書き込みをまとめてコミットするキュー（グループコミット）
+
+    submit() された処理は最大 max_delay 秒、または max_batch 件たまるまで待たされ、
+    1つのトランザクションでまとめて実行・コミットされる。各処理はSAVEPOINTで
+    区切られるので、1件が失敗しても同じバッチの他の結果は巻き戻らない。
+    処理が Database.on_rollback() で登録したメモリ上の変更も、その件の失敗・バッチの失敗に合わせて戻る。
+    呼び出し側にはコミット完了後に結果が返るため、返ってきた結果は永続化済み。
+    """
+
+    def __init__(self, db, max_delay=0.005, max_batch=64):
+        self.db = db
+        self.max_delay = max_delay  # 結果がメモリ上に留まる最大時間（耐久性ウィンドウ）
+        self.max_batch = max_batch
+        self._pending = []  # (func, args, future)
+        self._has_items = asyncio.Event()
+        self._full = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task = None
+        self._closing = False
+
+        # メトリクス
+        self.submitted = 0
+        self.max_depth = 0
+        self.batches = 0
+        self.flushed = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    @property
+    def depth(self):
+        """コミット待ちの件数"""
+        return len(self._pending)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._worker(), name='write-queue')
+
+    async def close(self):
+        """ワーカーを止めて、残っている書き込みをすべてコミット
+
+        コミット中のバッチを途中で取り消すと、書き込みは反映されたのに submit() が
+        返らなくなるので、ワーカーにはフラグで止まるよう伝えて今のフラッシュを終えさせる。
+        """
+        if self._task is not None:
+            self._closing = True
+            self._has_items.set()
+            await self._task
+            self._task = None
+            self._closing = False
+        await self.flush()
+
+    async def submit(self, func, *args):
+        """func(conn, *args) をキューに積み、コミット後にその戻り値を返す"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((func, args, future))
+        self.submitted += 1
+        self.max_depth = max(self.max_depth, len(self._pending))
+
+        if self._task is None:
+            # ワーカー未起動（起動前・終了後）は即時コミット（DBの時間は Database 側で記録される）
+            await self.flush()
+            return await future
+
+        self._has_items.set()
+        if len(self._pending) >= self.max_batch:
+            self._full.set()
+        start = time.perf_counter()
+        try:
+            return await future
+        finally:
+            # コミットまで待った時間をコマンドのDB時間に含める
+            record_db(time.perf_counter() - start)
+
+    async def flush(self):
+        """キューに残っている書き込みをすべてコミット"""
+        async with self._lock:
+            while self._pending:
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+                await self._commit(batch)
+            self._has_items.clear()
+            self._full.clear()
+
+    async def _worker(self):
+        while not self._closing:
+            await self._has_items.wait()
+            if not self._closing:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_delay)
+                except asyncio.TimeoutError:
+                    pass
+            try:
+                await self.flush()
+            except Exception:
+                logging.error("書き込みキューのフラッシュに失敗しました", exc_info=True)
+
+    async def _commit(self, batch):
+        start = time.perf_counter()
+        try:
+            results = await self.db.transaction(self._apply, batch)
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            raise
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self.batches += 1
+            self.flushed += len(batch)
+            self.last_flush_ms = elapsed
+            self.max_flush_ms = max(self.max_flush_ms, elapsed)
+            self.total_flush_ms += elapsed
+
+        for (_, _, future), (ok, value) in zip(batch, results):
+            if future.done():
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def _apply(self, conn, batch):
+        results = []
+        for func, args, _ in batch:
+            mark = self.db.undo_mark()
+            conn.execute('SAVEPOINT write_item')
+            try:
+                value = func(conn, *args)
+            except Exception as e:
+                conn.execute('ROLLBACK TO write_item')
+                conn.execute('RELEASE write_item')
+                self.db.undo(mark)
+                results.append((False, e))
+            else:
+                conn.execute('RELEASE write_item')
+                results.append((True, value))
+        return results
+
+    def stats(self):
+        """キューの状態（深さ・フラッシュ時間など）を辞書で返す"""
+        return {
+            'depth': self.depth,
+            'max_depth': self.max_depth,
+            'submitted': self.submitted,
+            'batches': self.batches,
+            'flushed': self.flushed,
+            'avg_batch': self.flushed / self.batches if self.batches else 0.0,
+            'last_flush_ms': self.last_flush_ms,
+            'max_flush_ms': self.max_flush_ms,
+            'avg_flush_ms': self.total_flush_ms / self.batches if self.batches else 0.0,
+        }
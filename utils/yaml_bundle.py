@@ -0,0 +1,100 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+import yaml
+
+class YamlBundle:
+    """複数のYAMLファイルを読み込んだ結果を1つのJSONにまとめたキャッシュ
+
+    起動のたびにPyYAMLでパースする代わりに、前回パースした結果をJSONで保存しておき、
+    元のファイルが変わっていなければJSONだけを読む。変わったかどうかは
+    サイズと更新時刻で判定し、更新時刻だけが違う（git checkoutやデプロイで付け直された）
+    場合は内容のSHA-256を比べる。変わったファイルだけをパースし直してバンドルを書き直す。
+    JSONに保存するので、キーが文字列の辞書・リスト・文字列・数値だけのファイルに使う。
+    """
+
+    VERSION = 1
+
+    def __init__(self, path):
+        self.path = path  # Noneなら保存せず毎回パースする
+
+        # メトリクス
+        self.hits = 0       # バンドルから読んだファイル数
+        self.compiled = 0   # YAMLをパースしたファイル数
+
+    @staticmethod
+    def _digest(path):
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def _read(self):
+        if self.path is None:
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                bundle = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if bundle.get('version') != self.VERSION:
+            return {}
+        return bundle.get('files', {})
+
+    def load(self, sources):
+        """sources = {名前: YAMLのパス} を読み込んで {名前: データ} を返す
+
+        パースに失敗したファイルはログに出して結果から除く（次回もパースし直す）。
+        """
+        cached = self._read()
+        files = {}
+        rewrite = False
+        for name, source in sources.items():
+            stat = os.stat(source)
+            entry = cached.get(name)
+            if entry is not None and entry['source'] == source:
+                if entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+                    files[name] = entry
+                    self.hits += 1
+                    continue
+                if entry['size'] == stat.st_size and entry['sha256'] == self._digest(source):
+                    files[name] = dict(entry, mtime_ns=stat.st_mtime_ns)
+                    self.hits += 1
+                    rewrite = True
+                    continue
+            try:
+                with open(source, 'r', encoding='utf-8') as f:
+                    data = yaml.safe_load(f)
+            except yaml.YAMLError as e:
+                logging.error(f"YAMLエラー ({source}): {e}")
+                continue
+            files[name] = {
+                'source': source,
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+                'sha256': self._digest(source) if self.path else None,
+                'data': data,
+            }
+            self.compiled += 1
+            rewrite = True
+
+        if self.path is not None and (rewrite or files.keys() != cached.keys()):
+            self._write(files)
+        return {name: entry['data'] for name, entry in files.items()}
+
+    def _write(self, files):
+        """バンドルをアトミックに書き込む（書けない環境ではキャッシュなしで動く）"""
+        folder = os.path.dirname(self.path) or '.'
+        try:
+            os.makedirs(folder, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=folder, prefix='.bundle-', suffix='.json')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump({'version': self.VERSION, 'files': files}, f, ensure_ascii=False)
+                os.replace(tmp, self.path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        except OSError as e:
+            logging.warning(f"バンドル {self.path} を保存できませんでした: {e}")